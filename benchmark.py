@@ -1,137 +1,285 @@
-import time
-import statistics
-import requests
-import grpc
+import argparse
+import copy
 import os
+import sys
 
-from python_grpc_lab.generated import user_service_pb2, user_service_pb2_grpc
-
-import statistics
+from loadgen import LoadConfig, OperationMix, TargetSpec, run_ingest, run_load
+from loadgen.report import PERCENTILES, compare, load_results, summarize, summarize_run, write_results
 
 # Read host from environment variable, fallback to localhost
 REST_HOST = os.getenv("REST_HOST", "localhost")
 GRPC_HOST = os.getenv("GRPC_HOST", "localhost")
+SOCKET_HOST = os.getenv("SOCKET_HOST", "localhost")
 
 REST_URL = f"http://{REST_HOST}:5000/api/users"
 GRPC_TARGET = f"{GRPC_HOST}:50051"
+SOCKET_TARGET = f"{SOCKET_HOST}:8080"
+
+# Number of requests to send for benchmarking when no --duration is given
+N = 100
+
+TARGETS = {
+    "rest": ("REST", REST_URL),
+    "grpc": ("gRPC", GRPC_TARGET),
+    "socket": ("Socket", SOCKET_TARGET),
+}
 
-# Number of requests to send for benchmarking
-N = 100 
+# The socket lab only echoes messages, so it always runs this mix
+ECHO_MIX = OperationMix({"echo": 1})
 
-def summarize_results(label, times, errors=0):
+def summarize_results(label, histogram, errors=0, elapsed=None, message_size=None):
     """
     Summarize and print benchmark results.
 
     Args:
         label (str): A label for the test, e.g. "REST" or "gRPC".
-        times (list): A list of response times (in milliseconds).
+        histogram (Histogram): Response times (in nanoseconds).
         errors (int): Number of failed requests.
+        elapsed (float): Wall-clock length of the measured window (seconds).
+            Requests overlap when running concurrently, so throughput is
+            completed requests over this window, not over the sum of latencies.
+        message_size (int): Payload bytes per message, for socket echo runs;
+            adds the bandwidth to the report.
 
     Returns:
-        float: The average response time (ms), or None if no data.
+        dict: The summary (see loadgen.report.summarize), or None if no data.
     """
-    if not times:
-        print(f"\n{label} Results: No data")
+    if not histogram.total:
+        print(f"\n{label} Results: No data (errors: {errors})")
         return None
 
-    # Compute descriptive statistics
-    avg_time = statistics.mean(times)   # average response time
-    min_time = min(times)               # fastest response
-    max_time = max(times)               # slowest response
-    std_dev = statistics.stdev(times) if len(times) > 1 else 0  # variability
-    total_time = sum(times)             # total time for all requests
+    stats = summarize(histogram, errors, elapsed, message_size)
+    latency = stats["latency_ms"]
 
     # Print results in a nice format
     print(f"\n{label} Results:")
-    print(f"  Average response time: {avg_time:.2f} ms")
-    print(f"  Min: {min_time:.2f} ms")
-    print(f"  Max: {max_time:.2f} ms")
-    print(f"  Standard deviation: {std_dev:.2f} ms")
-    print(f"  Total time: {total_time:.2f} ms")
-    print(f"  Throughput: {(N / total_time) * 1000:.2f} requests/sec")
+    print(f"  Requests: {stats['count']}")
+    print(f"  Average response time: {latency['mean']:.2f} ms")
+    print(f"  Min: {latency['min']:.2f} ms")
+    for p in PERCENTILES:
+        print(f"  p{p:g}: {latency[f'p{p:g}']:.2f} ms")
+    print(f"  Max: {latency['max']:.2f} ms")
+    print(f"  Standard deviation: {latency['stdev']:.2f} ms")
+    print(f"  Elapsed time: {elapsed * 1000:.2f} ms")
+    if message_size is None:
+        print(f"  Throughput: {stats['throughput']:.2f} requests/sec")
+    else:
+        print(f"  Throughput: {stats['throughput']:.2f} messages/sec")
+        print(f"  Bandwidth: {stats['bytes_per_sec'] / 1e6:.2f} MB/sec each way "
+              f"({message_size} byte messages)")
     print(f"  Errors: {errors}")
 
-    return total_time 
+    return stats
+
+def run_benchmark(protocol, config, channels=1, pool_size=None, keep_alive=True, deadline=None,
+                  max_attempts=1, hedge_delay=None, compression=None):
+    """
+    Drive one service with the configured workload and print its results.
+
+    Args:
+        channels (int): gRPC channels per client process, used round robin.
+        pool_size (int): REST connections per client process (default: one
+            per worker).
+        keep_alive (bool): REST: reuse connections between requests.
+        deadline (float): gRPC: per-call deadline in seconds (None: no deadline).
+        max_attempts (int): gRPC: attempts per GetUser, retried on UNAVAILABLE
+            (1: no retries).
+        hedge_delay (float): gRPC: seconds before a GetUser still running is
+            sent again (None: no hedging).
+        compression (str): gRPC: compress requests with "gzip" or "deflate".
+
+    Returns:
+        dict: The run summary (see loadgen.report.summarize_run).
+    """
+    label, address = TARGETS[protocol]
+    message_size = None
+    if protocol == "socket":
+        config = copy.copy(config)
+        config.mix = ECHO_MIX
+        message_size = config.message_size
+    spec = TargetSpec(protocol, address, channels,
+                      pool_size=pool_size or config.concurrency, keep_alive=keep_alive, deadline=deadline,
+                      max_attempts=max_attempts, hedge_delay=hedge_delay, compression=compression)
+    result = run_load(spec, config)
+    if len(result.latencies) > 1:
+        for op in sorted(result.latencies):
+            summarize_results(f"{label} {op}", result.latencies[op], result.errors.get(op, 0),
+                              result.elapsed)
+    summarize_results(label, result.overall, result.error_count, result.elapsed, message_size)
+    if result.counters:
+        counters = result.counters
+        print(f"  Client: {counters['calls']} calls, {counters['retries']} retries, "
+              f"{counters['hedges']} hedges ({counters['hedge_wins']} won)")
+    return summarize_run(result, message_size)
 
-def benchmark_rest():
+def run_ingest_benchmark(protocol, users, batch_size, concurrency, pool_size=None, channels=1):
     """
-    Benchmark REST API by sending N POST requests to /api/users.
-    Records individual response times and errors for analysis.
+    Create `users` users one call at a time, then `batch_size` users per call,
+    and print the ingestion throughput of each.
+
+    Returns:
+        list: One IngestResult per batch size (single calls first).
     """
-    times = []   # store each request's response time (ms)
-    errors = 0   # count failed requests
-
-    for i in range(N):
-        start = time.time()  # start timer for this request
-        try:
-            # Send a POST request to create a new user
-            resp = requests.post(
-                REST_URL,
-                json={"name": f"user{i}", "email": f"user{i}@example.com"}
-            )
-            resp.raise_for_status()  # raise error if status_code != 200
-        except Exception:
-            errors += 1
-        end = time.time()  # stop timer
-
-        # Convert seconds to milliseconds and store
-        times.append((end - start) * 1000)
-
-    # Summarize statistics for REST benchmark
-    return summarize_results("REST", times, errors)
-
-
-def benchmark_grpc():
+    label, address = TARGETS[protocol]
+    spec = TargetSpec(protocol, address, channels, pool_size=pool_size or concurrency)
+    results = []
+    for size in sorted({1, batch_size}):
+        result = run_ingest(spec, users, size, concurrency)
+        latency = result.latencies
+        print(f"\n{label} ingest, {'single calls' if size == 1 else f'batches of {size}'}:")
+        print(f"  Users created: {result.created} in {latency.total} calls")
+        if latency.total:
+            print(f"  Call latency: p50 {latency.value_at_percentile(50) / 1e6:.2f} ms, "
+                  f"p99 {latency.value_at_percentile(99) / 1e6:.2f} ms")
+        print(f"  Elapsed time: {result.elapsed * 1000:.2f} ms")
+        print(f"  Throughput: {result.users_per_sec:.2f} users/sec")
+        print(f"  Errors: {result.errors}")
+        results.append(result)
+    if len(results) == 2 and results[0].users_per_sec:
+        print(f"\n{label}: batches of {batch_size} ingest "
+              f"{results[1].users_per_sec / results[0].users_per_sec:.2f}x faster than single calls")
+    return results
+
+def compare_files(baseline_path, candidate_path, threshold):
     """
-    Benchmark gRPC API by sending N CreateUser RPC calls.
-    Records individual response times and errors for analysis.
+    Print the differences between two JSON result files.
+
+    Returns:
+        bool: True if any metric regressed by more than `threshold` percent.
     """
-    times = []   # store each RPC's response time (ms)
-    errors = 0   # count failed calls
-
-    # Create a gRPC channel and stub (client proxy)
-    channel = grpc.insecure_channel(GRPC_TARGET)
-    stub = user_service_pb2_grpc.UserServiceStub(channel)
-
-    for i in range(N):
-        start = time.time()  # start timer for this call
-        try:
-            # Call gRPC CreateUser RPC with test data
-            stub.CreateUser(
-                user_service_pb2.CreateUserRequest(
-                    name=f"user{i}",
-                    email=f"user{i}@example.com"
-                )
-            )
-        except Exception:
-            errors += 1
-        end = time.time()  # stop timer
-
-        # Convert seconds to milliseconds and store
-        times.append((end - start) * 1000)
-
-    # Summarize statistics for gRPC benchmark
-    return summarize_results("gRPC", times, errors)
+    rows = compare(load_results(baseline_path), load_results(candidate_path), threshold)
+    print(f"=== Comparing {candidate_path} against {baseline_path} (threshold {threshold:g}%) ===")
+    print(f"{'service':<8} {'operation':<10} {'metric':<11} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for service, op, metric, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{service:<8} {op:<10} {metric:<11} {old:>12.3f} {new:>12.3f} {change:>+8.1f}%{flag}")
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"\n{regressions} regression(s)")
+    return regressions > 0
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="REST vs gRPC load generator")
+    parser.add_argument("--protocols", default="rest,grpc",
+                        help="comma-separated services to benchmark (rest, grpc, socket)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="number of concurrent workers (for socket: connections)")
+    parser.add_argument("--channels", type=int, default=1,
+                        help="gRPC: channels (HTTP/2 connections) shared round robin by the workers")
+    parser.add_argument("--http-pool", type=int,
+                        help="REST: keep-alive connections shared by the workers (default: --concurrency)")
+    parser.add_argument("--keep-alive", action=argparse.BooleanOptionalAction, default=True,
+                        help="REST: reuse HTTP connections (--no-keep-alive opens one per request)")
+    parser.add_argument("--deadline-ms", type=float,
+                        help="gRPC: per-call deadline; slower calls fail with DEADLINE_EXCEEDED")
+    parser.add_argument("--max-attempts", type=int, default=1,
+                        help="gRPC: attempts per GetUser, retried on UNAVAILABLE with backoff")
+    parser.add_argument("--hedge-ms", type=float,
+                        help="gRPC: send a GetUser again if it has not completed after this long")
+    parser.add_argument("--compression", choices=["gzip", "deflate"],
+                        help="gRPC: compress requests (responses are compressed as the server is "
+                             "configured; REST clients always accept gzip and deflate)")
+    parser.add_argument("--mode", choices=["threads", "asyncio", "processes"], default="threads",
+                        help="how workers run (asyncio uses aiohttp for REST and grpc.aio for gRPC)")
+    parser.add_argument("--loop", choices=["closed", "open"], default="closed",
+                        help="closed: send when the previous request completes; open: fixed --rate")
+    parser.add_argument("--rate", type=float,
+                        help="open loop: total requests/sec across all workers")
+    parser.add_argument("--duration", type=float,
+                        help="measure for this many seconds (default: send --requests requests)")
+    parser.add_argument("--requests", type=int, default=N,
+                        help="measured requests when no --duration is given")
+    parser.add_argument("--per-worker", type=int,
+                        help="measured requests per worker (for socket: messages per "
+                             "connection); overrides --requests")
+    parser.add_argument("--warmup", type=float, default=0.0,
+                        help="seconds of unmeasured load before measuring")
+    parser.add_argument("--mix", default="create=100",
+                        help='operation mix, e.g. "create=20,get=60,update=10,delete=10,list=1" '
+                             '(socket always sends echo messages)')
+    parser.add_argument("--message-size", type=int, default=64,
+                        help="socket: payload bytes per echo message")
+    parser.add_argument("--page-size", type=int, default=100,
+                        help='users per "list" response (REST: at most 1000)')
+    parser.add_argument("--ingest", type=int, metavar="N",
+                        help="instead of the mix, create N users one call at a time and then "
+                             "in batches, and compare their throughput (rest, grpc)")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="with --ingest: users per bulk call")
+    parser.add_argument("--output",
+                        help="write results to this file (.json, or .csv for CSV)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="compare two JSON result files instead of running a benchmark")
+    parser.add_argument("--threshold", type=float, default=5.0,
+                        help="with --compare: percent change that counts as a regression")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    print("=== REST vs gRPC Benchmark ===")
-    print(f"Running {N} CreateUser calls for both REST and gRPC...")
-    print("This test will measure total elapsed time for each approach.\n")
-    # Run benchmarks
-    rest_time = benchmark_rest()
-    grpc_time = benchmark_grpc()
-
-    # Print results
-    print(f"REST {N} calls took: {rest_time:.4f} ms")
-    print(f"gRPC {N} calls took: {grpc_time:.4f} ms")
-
-    if grpc_time < rest_time:
-        # gRPC is faster
-        print(f"gRPC is {(rest_time/grpc_time):.2f}x faster than REST")
-    elif rest_time < grpc_time:
-        # REST is faster
-        print(f"REST is {(grpc_time/rest_time):.2f}x faster than gRPC")
-    else:
-        # Tie (very rare, but safe to handle)
-        print("REST and gRPC took the same time")
+    args = parse_args()
+    if args.compare:
+        sys.exit(1 if compare_files(*args.compare, args.threshold) else 0)
+
+    if args.ingest:
+        for protocol in (p.strip() for p in args.protocols.split(",")):
+            print(f"=== {TARGETS[protocol][0]} Ingest Benchmark: {args.ingest} users, "
+                  f"{args.concurrency} workers ===")
+            run_ingest_benchmark(protocol, args.ingest, args.batch_size, args.concurrency,
+                                 args.http_pool, args.channels)
+        sys.exit(0)
+
+    if args.per_worker:
+        args.requests = args.per_worker * args.concurrency
+    config = LoadConfig(
+        OperationMix.parse(args.mix),
+        concurrency=args.concurrency,
+        mode=args.mode,
+        loop=args.loop,
+        rate=args.rate,
+        duration=args.duration,
+        requests=None if args.duration else args.requests,
+        warmup=args.warmup,
+        message_size=args.message_size,
+        page_size=args.page_size,
+    )
+    protocols = [p.strip() for p in args.protocols.split(",")]
+
+    print("=== " + " vs ".join(TARGETS[p][0] for p in protocols) + " Benchmark ===")
+    length = f"{args.duration:g}s" if args.duration else f"{args.requests} requests"
+    print(f"Mix: {config.mix} | {length} after {args.warmup:g}s warmup | "
+          f"{args.concurrency} {args.mode} workers, {args.loop} loop"
+          + (f" at {args.rate:g} req/s" if args.loop == "open" else "")
+          + f" | {args.channels} gRPC channel(s), REST keep-alive {'on' if args.keep_alive else 'off'}")
+
+    deadline = args.deadline_ms / 1000 if args.deadline_ms else None
+    hedge_delay = args.hedge_ms / 1000 if args.hedge_ms is not None else None
+    runs = {protocol: run_benchmark(protocol, config, args.channels, args.http_pool, args.keep_alive,
+                                    deadline, args.max_attempts, hedge_delay, args.compression)
+            for protocol in protocols}
+    if args.output:
+        write_results(args.output, vars(args), runs)
+        print(f"\nResults written to {args.output}")
+
+    rest_rps = runs["rest"]["overall"]["throughput"] if "rest" in runs else None
+    grpc_rps = runs["grpc"]["overall"]["throughput"] if "grpc" in runs else None
+    if rest_rps and grpc_rps:
+        # Print results
+        print(f"\nREST throughput: {rest_rps:.2f} requests/sec")
+        print(f"gRPC throughput: {grpc_rps:.2f} requests/sec")
+
+        if grpc_rps > rest_rps:
+            # gRPC is faster
+            print(f"gRPC is {(grpc_rps/rest_rps):.2f}x faster than REST")
+        elif rest_rps > grpc_rps:
+            # REST is faster
+            print(f"REST is {(rest_rps/grpc_rps):.2f}x faster than gRPC")
+        else:
+            # Tie (very rare, but safe to handle)
+            print("REST and gRPC had the same throughput")
+
+    socket_rps = runs["socket"]["overall"]["throughput"] if "socket" in runs else None
+    if socket_rps:
+        # Raw TCP is the floor every higher-level protocol builds on
+        print(f"\nRaw TCP baseline: {socket_rps:.2f} messages/sec")
+        for protocol, rps in (("rest", rest_rps), ("grpc", grpc_rps)):
+            if rps:
+                print(f"{TARGETS[protocol][0]} reaches {rps / socket_rps * 100:.1f}% of the "
+                      f"raw TCP round-trip rate ({socket_rps / rps:.2f}x the cost per request)")
@@ -0,0 +1,179 @@
+"""
+CPU against bandwidth for response compression, by response size.
+
+For each compression setting, starts the REST service (gunicorn, one
+worker) and the gRPC server with that setting, fills each with users, and
+then measures "list" requests of each size: the first N users, as
+GET /api/users?limit=N and ListUsers(page_size=N, limit=N). For every run
+it reports:
+
+    req/s            throughput (closed loop, --concurrency threads)
+    p50              median latency
+    wire B/req       bytes through the loopback interface per request, both
+                     directions, headers and TCP/IP overhead included
+    server/client    CPU time per request of the server processes and of
+    CPU us/req       this process (the client threads)
+
+Responses below the services' threshold (1 KiB by default) are sent
+uncompressed under every setting. The REST response cache is turned off,
+so each response is encoded and compressed again; with it on, repeated
+pages cost neither.
+
+Wire bytes and server CPU are read from /proc, so this runs on Linux only.
+
+Usage:
+    python benchmark_compression.py [--protocols rest,grpc] [--settings none,gzip,deflate]
+        [--sizes 1,10,100,1000] [--concurrency 4] [--duration 5]
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from loadgen import LoadConfig, OperationMix, TargetSpec, run_load
+from loadgen.report import summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIST_MIX = OperationMix({"list": 1})
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def loopback_bytes():
+    """Bytes received on the loopback interface so far (each byte sent over lo is received once)."""
+    with open("/proc/net/dev") as f:
+        for line in f:
+            name, _, fields = line.partition(":")
+            if name.strip() == "lo":
+                return int(fields.split()[0])
+    raise RuntimeError("No loopback interface in /proc/net/dev")
+
+
+def process_tree_cpu(pid):
+    """CPU seconds (user + system) used so far by `pid` and its descendants."""
+    tick = os.sysconf("SC_CLK_TCK")
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command name may contain spaces; fields after it are fixed
+                    fields = f.read().rpartition(")")[2].split()
+            except OSError:
+                continue
+            stats[int(entry)] = (int(fields[1]), int(fields[11]) + int(fields[12]))
+    total, pids = 0, {pid}
+    while pids:
+        total += sum(stats[p][1] for p in pids if p in stats)
+        pids = {p for p, (ppid, _) in stats.items() if ppid in pids}
+    return total / tick
+
+
+def start(command, cwd, env, port):
+    """Start a service and wait until it accepts connections on `port`."""
+    env = dict(os.environ, LOG_LEVEL="WARNING", **env)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [HERE, env.get("PYTHONPATH")]))
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return process
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                stop(process)
+                raise RuntimeError(f"{command[1]} did not start")
+            time.sleep(0.1)
+
+
+def stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def start_rest(setting, port):
+    encodings = "" if setting == "none" else setting
+    process = start([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning",
+                     "app:app"], os.path.join(HERE, "python-rest-lab"),
+                    {"REST_PORT": str(port), "REST_WORKERS": "1", "REST_COMPRESSION": encodings,
+                     "REST_CACHE_BYTES": "0"}, port)
+    return process, TargetSpec("rest", f"http://127.0.0.1:{port}/api/users")
+
+
+def start_grpc(setting, port):
+    process = start([sys.executable, "server.py"], os.path.join(HERE, "python_grpc_lab"),
+                    {"GRPC_PORT": str(port), "GRPC_COMPRESSION": setting, "GRPC_METRICS_PORT": "0"}, port)
+    return process, TargetSpec("grpc", f"127.0.0.1:{port}")
+
+
+SERVICES = {"rest": ("REST", start_rest), "grpc": ("gRPC", start_grpc)}
+
+
+def fill(spec, users):
+    target = spec.build()
+    try:
+        tag = time.time_ns()
+        for start_at in range(0, users, 1000):
+            batch = range(start_at, min(start_at + 1000, users))
+            target.create_batch([(f"user{i}", f"user{i}-{tag}@example.com") for i in batch])
+    finally:
+        target.close()
+
+
+def measure(spec, pid, size, args):
+    config = LoadConfig(LIST_MIX, concurrency=args.concurrency, duration=args.duration,
+                        warmup=args.warmup, page_size=size)
+    cpu, wire, client = process_tree_cpu(pid), loopback_bytes(), time.process_time()
+    result = run_load(spec, config)
+    cpu, wire, client = (process_tree_cpu(pid) - cpu, loopback_bytes() - wire,
+                         time.process_time() - client)
+    stats = summarize(result.overall, result.error_count, result.elapsed)
+    # Warmup requests also crossed the wire and used CPU; spread the totals
+    # over every request, at the measured rate
+    requests = stats["throughput"] * (config.duration + config.warmup) or 1
+    return stats, wire / requests, cpu / requests * 1e6, client / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response compression: CPU vs bandwidth by response size")
+    parser.add_argument("--protocols", default="rest,grpc", help="services to measure (rest, grpc)")
+    parser.add_argument("--settings", default="none,gzip,deflate", help="compression settings to compare")
+    parser.add_argument("--sizes", default="1,10,100,1000", help="users per response (REST: at most 1000)")
+    parser.add_argument("--concurrency", type=int, default=4, help="client threads")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds measured per run")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds before measuring")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    print(f"{args.concurrency} client threads; list requests of {args.sizes} users")
+    print(f"{'service':<8} {'setting':<8} {'users':>6} {'req/s':>8} {'p50 (ms)':>9} {'wire B/req':>11} "
+          f"{'server CPU us/req':>18} {'client CPU us/req':>18} {'errors':>7}")
+    for protocol in args.protocols.split(","):
+        label, start_service = SERVICES[protocol]
+        for setting in args.settings.split(","):
+            process, spec = start_service(setting, free_port())
+            try:
+                fill(spec, max(sizes))
+                for size in sizes:
+                    stats, wire, server_cpu, client_cpu = measure(spec, process.pid, size, args)
+                    print(f"{label:<8} {setting:<8} {size:>6} {stats['throughput']:>8.0f} "
+                          f"{stats['latency_ms']['p50']:>9.2f} {wire:>11.0f} {server_cpu:>18.0f} "
+                          f"{client_cpu:>18.0f} {stats['errors']:>7}")
+            finally:
+                stop(process)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""
+Load generator used by benchmark.py.
+
+    workload  - Create/Get/Update/Delete operation mix
+    targets   - REST and gRPC client adapters
+    runner    - threads/asyncio/process workers, open and closed loop
+    histogram - HDR-style latency histogram
+    report    - JSON/CSV results and regression comparison
+    ingest    - bulk vs single-call user ingestion
+"""
+
+from .histogram import Histogram
+from .ingest import IngestResult, run_ingest
+from .runner import LoadConfig, RunResult, run_load
+from .targets import TargetSpec
+from .workload import OperationMix
+
+__all__ = ["Histogram", "IngestResult", "LoadConfig", "OperationMix", "RunResult", "TargetSpec",
+           "run_ingest", "run_load"]
@@ -0,0 +1,101 @@
+"""
+HDR-style latency histogram.
+
+Values (integer nanoseconds) are recorded into log-linear buckets, the
+layout used by HdrHistogram: each power-of-two range is split into the same
+number of linear sub-buckets. Any recorded value is therefore reported with
+a fixed relative precision (3 significant figures by default), and memory
+stays bounded however many values are recorded. Counts are kept in a
+sparse dict, so histograms are cheap to pickle across worker processes,
+to merge, and to write to JSON.
+"""
+
+import math
+
+
+class Histogram:
+    def __init__(self, significant_figures=3):
+        if not 1 <= significant_figures <= 5:
+            raise ValueError("significant_figures must be between 1 and 5")
+        self.significant_figures = significant_figures
+        # Enough linear sub-buckets per power of two to resolve
+        # `significant_figures` decimal digits
+        sub_bucket_count = 2 ** math.ceil(math.log2(2 * 10 ** significant_figures))
+        self._half_count_magnitude = int(math.log2(sub_bucket_count)) - 1
+        self._half_count = sub_bucket_count // 2
+        self._sub_bucket_mask = sub_bucket_count - 1
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = None
+        self._sum = 0
+        self._sum_squares = 0
+
+    def _index(self, value):
+        bucket = (value | self._sub_bucket_mask).bit_length() - self._half_count_magnitude - 1
+        sub_bucket = value >> bucket
+        return ((bucket + 1) << self._half_count_magnitude) + sub_bucket - self._half_count
+
+    def _range(self, index):
+        """Return (lowest, highest) value that falls in counts[index]."""
+        bucket = (index >> self._half_count_magnitude) - 1
+        sub_bucket = (index & (self._half_count - 1)) + self._half_count
+        if bucket < 0:
+            sub_bucket -= self._half_count
+            bucket = 0
+        lowest = sub_bucket << bucket
+        return lowest, lowest + (1 << bucket) - 1
+
+    def record(self, value, count=1):
+        """Record an integer value (e.g. a latency in ns) `count` times."""
+        value = max(0, int(value))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        self._sum += value * count
+        self._sum_squares += value * value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.significant_figures != self.significant_figures:
+            raise ValueError("Cannot merge histograms with different precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self._sum += other._sum
+        self._sum_squares += other._sum_squares
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    @property
+    def mean(self):
+        return self._sum / self.total if self.total else 0.0
+
+    @property
+    def stdev(self):
+        if self.total < 2:
+            return 0.0
+        variance = (self._sum_squares - self._sum * self._sum / self.total) / (self.total - 1)
+        return math.sqrt(max(0.0, variance))
+
+    def value_at_percentile(self, percentile):
+        """
+        Smallest value that at least `percentile`% of recordings are at or
+        below, to within the histogram's precision.
+        """
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(percentile / 100 * self.total))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._range(index)[1], self.max)
+        return self.max
+
+    def __len__(self):
+        return self.total
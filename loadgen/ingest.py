@@ -0,0 +1,81 @@
+"""
+Bulk vs single-call ingestion.
+
+Creates `users` new users with `concurrency` worker threads, either one
+create() call per user (batch_size=1) or one create_batch() call per
+`batch_size` users, and reports users created per second. Comparing the
+two shows how much of a single create's cost is per-call overhead (request
+framing, routing, a store lock and commit) rather than per-user work.
+"""
+
+import threading
+import time
+import uuid
+
+from .histogram import Histogram
+
+
+class IngestResult:
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        # Latency of each call (ns), whatever its batch size
+        self.latencies = Histogram()
+        self.created = 0
+        self.errors = 0
+        self.elapsed = None
+
+    @property
+    def users_per_sec(self):
+        return self.created / self.elapsed if self.elapsed else 0.0
+
+
+def _batches(users, batch_size, run_id):
+    for start in range(0, users, batch_size):
+        yield [(f"ingest-{run_id}-{i}", f"ingest-{run_id}-{i}@example.com")
+               for i in range(start, min(start + batch_size, users))]
+
+
+def run_ingest(spec, users, batch_size=1, concurrency=1):
+    """
+    Create `users` users through `spec` and return an IngestResult.
+    """
+    target = spec.build()
+    result = IngestResult(batch_size)
+    batches = _batches(users, batch_size, uuid.uuid4().hex[:8])
+    lock = threading.Lock()
+
+    def work():
+        histogram, created, errors = Histogram(), 0, 0
+        while True:
+            with lock:
+                batch = next(batches, None)
+            if batch is None:
+                break
+            sent = time.perf_counter_ns()
+            try:
+                if batch_size == 1:
+                    target.create(*batch[0])
+                    count = 1
+                else:
+                    count = target.create_batch(batch)
+            except Exception:
+                errors += len(batch)
+                continue
+            histogram.record(time.perf_counter_ns() - sent)
+            created += count
+            errors += len(batch) - count
+        with lock:
+            result.latencies.merge(histogram)
+            result.created += created
+            result.errors += errors
+
+    threads = [threading.Thread(target=work) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result.elapsed = time.perf_counter() - start
+    target.close()
+    return result
+
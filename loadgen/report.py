@@ -0,0 +1,129 @@
+"""
+Machine-readable benchmark results.
+
+Runs are summarized into plain dicts that can be written as JSON (the
+format `compare` reads back) or as CSV, one row per service and operation.
+"""
+
+import csv
+import json
+import time
+
+# Percentiles reported for every latency histogram
+PERCENTILES = (50, 90, 99, 99.9)
+
+# Metrics checked by compare(), and whether a higher value is better
+COMPARED_METRICS = {
+    "throughput": True,
+    "p50": False,
+    "p99": False,
+    "p99.9": False,
+}
+
+CSV_FIELDS = ["service", "operation", "count", "errors", "throughput", "bytes_per_sec",
+              "mean", "min", "p50", "p90", "p99", "p99.9", "max"]
+
+
+def summarize(histogram, errors, elapsed, message_size=None):
+    """
+    Summarize one latency histogram (ns).
+
+    Throughput is completed requests over the wall-clock measured window,
+    which stays correct when requests overlap. With a `message_size`
+    (socket echo runs), bytes_per_sec is the payload bandwidth each way.
+    """
+    to_ms = 1e-6
+    latency = {"mean": histogram.mean * to_ms, "min": (histogram.min or 0) * to_ms}
+    for p in PERCENTILES:
+        latency[f"p{p:g}"] = histogram.value_at_percentile(p) * to_ms
+    latency["max"] = (histogram.max or 0) * to_ms
+    latency["stdev"] = histogram.stdev * to_ms
+    stats = {
+        "count": histogram.total,
+        "errors": errors,
+        "throughput": histogram.total / elapsed if elapsed else 0.0,
+        "latency_ms": latency,
+    }
+    if message_size is not None:
+        stats["bytes_per_sec"] = stats["throughput"] * message_size
+    return stats
+
+
+def summarize_run(result, message_size=None):
+    """
+    Summarize a RunResult: all operations combined, one entry per operation,
+    and the target's counters (gRPC calls, retries and hedges) if it kept any.
+    """
+    summary = {
+        "elapsed": result.elapsed,
+        "overall": summarize(result.overall, result.error_count, result.elapsed, message_size),
+        "operations": {
+            op: summarize(histogram, result.errors.get(op, 0), result.elapsed, message_size)
+            for op, histogram in sorted(result.latencies.items())
+        },
+    }
+    if result.counters:
+        summary["counters"] = dict(result.counters)
+    return summary
+
+
+def write_results(path, config, services):
+    """
+    Write `services` ({service: summarize_run(...)}) to `path`, as CSV if
+    the name ends in .csv and as JSON otherwise.
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            for service, run in services.items():
+                rows = [("all", run["overall"])] + list(run["operations"].items())
+                for op, stats in rows:
+                    row = {"service": service, "operation": op, "count": stats["count"],
+                           "errors": stats["errors"], "throughput": round(stats["throughput"], 3),
+                           "bytes_per_sec": round(stats["bytes_per_sec"], 1) if "bytes_per_sec" in stats else ""}
+                    for key in CSV_FIELDS[6:]:
+                        row[key] = round(stats["latency_ms"][key], 4)
+                    writer.writerow(row)
+        return
+
+    with open(path, "w") as f:
+        json.dump({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "config": config,
+            "services": services,
+        }, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _metric(stats, name):
+    return stats["throughput"] if name == "throughput" else stats["latency_ms"][name]
+
+
+def compare(baseline, candidate, threshold):
+    """
+    Diff two JSON result files.
+
+    Returns one row per (service, operation, metric) present in both, as
+    (service, operation, metric, old, new, change %, regressed). A metric has
+    regressed when it moved in the bad direction by more than `threshold` %.
+    """
+    rows = []
+    for service, new_run in candidate["services"].items():
+        old_run = baseline["services"].get(service)
+        if old_run is None:
+            continue
+        pairs = [("all", old_run["overall"], new_run["overall"])]
+        pairs += [(op, old_run["operations"][op], stats)
+                  for op, stats in new_run["operations"].items() if op in old_run["operations"]]
+        for op, old, new in pairs:
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                old_value, new_value = _metric(old, metric), _metric(new, metric)
+                change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+                worse = -change if higher_is_better else change
+                rows.append((service, op, metric, old_value, new_value, change, worse > threshold))
+    return rows
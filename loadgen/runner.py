@@ -0,0 +1,319 @@
+"""
+Load generator core.
+
+A run has a warmup period followed by a measured window that ends after a
+fixed duration or after a fixed number of requests. `concurrency` workers
+drive the target, as threads, asyncio tasks or separate processes.
+
+Two loop models are supported:
+  - closed loop: each worker sends its next request as soon as the previous
+    one completes, so the offered load adapts to the server's speed;
+  - open loop: requests are sent at a fixed total `rate`, whatever the
+    server's speed. Latency is measured from the time a request was
+    scheduled, so when the server falls behind, the queueing delay shows up
+    in the numbers instead of being hidden (coordinated omission).
+"""
+
+import asyncio
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from .histogram import Histogram
+
+# Seconds given to workers to start up before the run's shared epoch.
+# Worker processes take longer to spawn than threads or tasks.
+START_DELAY = {"threads": 0.2, "asyncio": 0.2, "processes": 2.0}
+
+
+class LoadConfig:
+    def __init__(self, mix, concurrency=1, mode="threads", loop="closed", rate=None,
+                 duration=None, requests=None, warmup=0.0, message_size=64, page_size=100):
+        if loop == "open" and not rate:
+            raise ValueError("Open-loop runs need a --rate")
+        if duration is None and requests is None:
+            raise ValueError("Set either a duration or a request count")
+        self.mix = mix
+        self.concurrency = concurrency
+        self.mode = mode
+        self.loop = loop
+        self.rate = rate
+        self.duration = duration
+        self.requests = requests
+        self.warmup = warmup
+        # Payload bytes of each "echo" message (socket lab)
+        self.message_size = message_size
+        # Users in each "list" response, to vary the response size
+        self.page_size = page_size
+        # Tags user names/emails so repeated runs never create the same user
+        self.run_id = uuid.uuid4().hex[:8]
+
+    def requests_for(self, index):
+        """Share of the measured request count handled by worker `index`."""
+        if self.requests is None:
+            return None
+        share, extra = divmod(self.requests, self.concurrency)
+        return share + (1 if index < extra else 0)
+
+
+class WorkerResult:
+    """
+    Per-operation latency histograms (ns) and error counts from the measured
+    window, plus the target's own counters (gRPC retries and hedges) for the
+    whole run.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(Histogram)
+        self.errors = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.finished_at = None
+
+    def merge(self, other):
+        for op, histogram in other.latencies.items():
+            self.latencies[op].merge(histogram)
+        for op, count in other.errors.items():
+            self.errors[op] += count
+        for name, count in other.counters.items():
+            self.counters[name] += count
+        if other.finished_at is not None:
+            self.finished_at = max(self.finished_at or 0, other.finished_at)
+
+    def __getstate__(self):
+        return {"latencies": dict(self.latencies), "errors": dict(self.errors),
+                "counters": dict(self.counters), "finished_at": self.finished_at}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.latencies.update(state["latencies"])
+        self.errors.update(state["errors"])
+        self.counters.update(state["counters"])
+        self.finished_at = state["finished_at"]
+
+
+class RunResult(WorkerResult):
+    """Merged results of all workers plus the length of the measured window."""
+
+    def __init__(self, config):
+        super().__init__()
+        self.config = config
+        self.elapsed = None
+
+    @property
+    def overall(self):
+        """Histogram of every operation combined."""
+        histogram = Histogram()
+        for op_histogram in self.latencies.values():
+            histogram.merge(op_histogram)
+        return histogram
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+
+class _WorkerState:
+    """
+    Pacing and bookkeeping shared by the sync and async worker loops.
+
+    All deadlines are integer nanoseconds on the perf_counter_ns clock;
+    `epoch` (wall clock) is converted once so workers in different processes agree on when the
+    warmup ends.
+    """
+
+    def __init__(self, config, index, epoch):
+        self.config = config
+        self.index = index
+        self.rng = random.Random()
+        self.ids = []
+        self.seq = 0
+        self.payload = b"x" * config.message_size
+        self.result = WorkerResult()
+
+        start = time.perf_counter_ns() + int((epoch - time.time()) * 1e9)
+        self.start = start
+        self.measure_at = start + int(config.warmup * 1e9)
+        self.end_at = self.measure_at + int(config.duration * 1e9) if config.duration else None
+        self.remaining = config.requests_for(index)
+
+        self.interval = None
+        if config.loop == "open":
+            # Each worker sends rate/concurrency requests per second, staggered
+            self.interval = config.concurrency / config.rate * 1e9
+            self.next_send = start + self.interval * index / config.concurrency
+
+    def next_request(self):
+        """
+        Return (delay, scheduled_at) for the next request, or None when the
+        worker is done. `delay` is how many seconds to sleep before sending.
+        """
+        now = time.perf_counter_ns()
+        if self.end_at is not None and now >= self.end_at:
+            return None
+        if self.remaining is not None and now >= self.measure_at and self.remaining <= 0:
+            return None
+        if self.interval is None:
+            return max(0, self.start - now) / 1e9, max(now, self.start)
+        scheduled = int(self.next_send)
+        self.next_send += self.interval
+        return max(0, scheduled - now) / 1e9, scheduled
+
+    def next_operation(self):
+        op = self.config.mix.pick(self.rng, have_users=bool(self.ids))
+        self.seq += 1
+        if op == "create":
+            name = f"lg-{self.config.run_id}-{self.index}-{self.seq}"
+            return op, (name, f"{name}@example.com")
+        if op == "get":
+            return op, (self.rng.choice(self.ids),)
+        if op == "update":
+            return op, (self.rng.choice(self.ids), f"renamed-{self.seq}")
+        if op == "list":
+            return op, (self.config.page_size,)
+        if op == "echo":
+            return op, (self.payload,)
+        return op, (self.ids.pop(self.rng.randrange(len(self.ids))),)
+
+    def record(self, op, scheduled, sent, completed, value, ok):
+        if op == "create" and ok:
+            self.ids.append(value)
+        if scheduled < self.measure_at:
+            return  # warmup
+        if self.remaining is not None:
+            self.remaining -= 1
+        # Open loop: count from the scheduled time, including any queueing
+        started = scheduled if self.interval is not None else sent
+        if ok:
+            self.result.latencies[op].record(completed - started)
+        else:
+            self.result.errors[op] += 1
+
+    def finish(self):
+        # Wall clock, so finish times from different processes can be compared
+        self.result.finished_at = time.time()
+        return self.result
+
+
+def _sync_worker(target, config, index, epoch):
+    state = _WorkerState(config, index, epoch)
+    while True:
+        step = state.next_request()
+        if step is None:
+            break
+        delay, scheduled = step
+        if delay:
+            time.sleep(delay)
+        op, args = state.next_operation()
+        value, ok = None, True
+        sent = time.perf_counter_ns()
+        try:
+            value = getattr(target, op)(*args)
+        except Exception:
+            ok = False
+        state.record(op, scheduled, sent, time.perf_counter_ns(), value, ok)
+    return state.finish()
+
+
+async def _async_worker(target, config, index, epoch):
+    state = _WorkerState(config, index, epoch)
+    while True:
+        step = state.next_request()
+        if step is None:
+            break
+        delay, scheduled = step
+        if delay:
+            await asyncio.sleep(delay)
+        op, args = state.next_operation()
+        value, ok = None, True
+        sent = time.perf_counter_ns()
+        try:
+            value = await getattr(target, op)(*args)
+        except Exception:
+            ok = False
+        state.record(op, scheduled, sent, time.perf_counter_ns(), value, ok)
+    return state.finish()
+
+
+def _add_counters(target, result):
+    """Add the target's counters, if it keeps any, to `result`."""
+    counters = getattr(target, "counters", None)
+    if counters is None:
+        return
+    for name, count in counters().items():
+        result.counters[name] += count
+
+
+def _process_worker(spec, config, index, epoch):
+    target = spec.build()
+    try:
+        result = _sync_worker(target, config, index, epoch)
+        _add_counters(target, result)
+        return result
+    finally:
+        target.close()
+
+
+def _run_threads(spec, config, epoch):
+    target = spec.build()
+    results = [None] * config.concurrency
+
+    def work(index):
+        results[index] = _sync_worker(target, config, index, epoch)
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(config.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    _add_counters(target, results[0])
+    target.close()
+    return results
+
+
+def _run_asyncio(spec, config, epoch):
+    async def main():
+        target = spec.build_async()
+        try:
+            results = await asyncio.gather(
+                *(_async_worker(target, config, i, epoch) for i in range(config.concurrency))
+            )
+            _add_counters(target, results[0])
+            return results
+        finally:
+            await target.close()
+
+    return asyncio.run(main())
+
+
+def _run_processes(spec, config, epoch):
+    with ProcessPoolExecutor(max_workers=config.concurrency) as pool:
+        jobs = [pool.submit(_process_worker, spec, config, i, epoch) for i in range(config.concurrency)]
+        return [job.result() for job in jobs]
+
+
+RUNNERS = {
+    "threads": _run_threads,
+    "asyncio": _run_asyncio,
+    "processes": _run_processes,
+}
+
+
+def run_load(spec, config):
+    """
+    Drive `spec` with the workload in `config` and return a RunResult.
+    """
+    epoch = time.time() + START_DELAY[config.mode]
+    results = RUNNERS[config.mode](spec, config, epoch)
+
+    run = RunResult(config)
+    for result in results:
+        run.merge(result)
+    measure_start = epoch + config.warmup
+    if config.duration:
+        run.elapsed = config.duration
+    else:
+        run.elapsed = max(run.finished_at - measure_start, 1e-9)
+    return run
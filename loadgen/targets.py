@@ -0,0 +1,341 @@
+"""
+Protocol adapters for the load generator.
+
+Each target exposes the same four operations, so the runner can drive any
+protocol with the same workload:
+
+    create(name, email) -> user id
+    get(user_id)
+    update(user_id, name)
+    delete(user_id)
+    list(count)       (the first page of `count` users)
+
+REST and gRPC targets also create users in bulk, for the ingest benchmark:
+
+    create_batch(users) -> number of users created  (users: [(name, email), ...])
+
+The socket lab has no users; its targets expose a single operation instead:
+
+    echo(payload)  (checks that the reply is the payload in uppercase)
+
+Operations raise on any failure; the runner counts that as an error.
+"""
+
+import asyncio
+import socket
+import struct
+import threading
+
+import requests
+import requests.adapters
+
+from python_grpc_lab.channel_pool import AsyncChannelPool, ChannelPool
+from python_grpc_lab.generated import user_service_pb2, user_service_pb2_grpc
+from python_grpc_lab.resilience import AsyncResilientClient, ResilientClient
+
+
+class RestTarget:
+    """
+    Drives the Flask service over HTTP/1.1 with JSON bodies.
+
+    Calls share one requests.Session whose connection pool holds up to
+    `pool_size` keep-alive connections; a worker that finds them all busy
+    waits for one instead of opening a throwaway connection. With
+    keep_alive=False every request asks the server to close its connection
+    (`Connection: close`), so each one pays for a new TCP handshake.
+    """
+
+    def __init__(self, url, pool_size=10, keep_alive=True):
+        self.url = url
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, pool_block=True
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def create(self, name, email):
+        resp = self.session.post(self.url, json={"name": name, "email": email})
+        resp.raise_for_status()
+        return resp.json()["id"]
+
+    def create_batch(self, users):
+        resp = self.session.post(f"{self.url}:batch",
+                                 json=[{"name": name, "email": email} for name, email in users])
+        resp.raise_for_status()
+        return resp.json()["succeeded"]
+
+    def get(self, user_id):
+        self.session.get(f"{self.url}/{user_id}").raise_for_status()
+
+    def update(self, user_id, name):
+        self.session.put(f"{self.url}/{user_id}", json={"name": name}).raise_for_status()
+
+    def delete(self, user_id):
+        self.session.delete(f"{self.url}/{user_id}").raise_for_status()
+
+    def list(self, count):
+        # Compressed responses are decoded by requests, which accepts gzip and deflate
+        self.session.get(self.url, params={"limit": count}).raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncRestTarget:
+    """
+    aiohttp version of RestTarget for the asyncio concurrency mode: one
+    ClientSession whose connector holds up to `pool_size` connections.
+    """
+
+    def __init__(self, url, pool_size=10, keep_alive=True):
+        try:
+            import aiohttp
+        except ImportError:
+            raise ValueError("The asyncio mode for REST needs aiohttp (pip install aiohttp)") from None
+        self.url = url
+        self._aiohttp = aiohttp
+        self._connector_args = {"limit": pool_size, "force_close": not keep_alive}
+        self._session = None
+
+    @property
+    def session(self):
+        # Created on first use, inside the running event loop
+        if self._session is None:
+            connector = self._aiohttp.TCPConnector(**self._connector_args)
+            self._session = self._aiohttp.ClientSession(connector=connector,
+                                                        raise_for_status=True)
+        return self._session
+
+    async def create(self, name, email):
+        async with self.session.post(self.url, json={"name": name, "email": email}) as resp:
+            return (await resp.json())["id"]
+
+    async def get(self, user_id):
+        async with self.session.get(f"{self.url}/{user_id}") as resp:
+            await resp.read()
+
+    async def update(self, user_id, name):
+        async with self.session.put(f"{self.url}/{user_id}", json={"name": name}) as resp:
+            await resp.read()
+
+    async def delete(self, user_id):
+        async with self.session.delete(f"{self.url}/{user_id}") as resp:
+            await resp.read()
+
+    async def list(self, count):
+        async with self.session.get(self.url, params={"limit": count}) as resp:
+            await resp.read()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class GrpcTarget:
+    """
+    Drives the gRPC service through a pool of blocking channels; each call
+    goes out on the next channel in round-robin order. Calls go through a
+    ResilientClient: with a `deadline` (seconds), a call that takes longer
+    fails with DEADLINE_EXCEEDED; with max_attempts > 1, GetUser is retried
+    on UNAVAILABLE; and with a `hedge_delay` (seconds), a GetUser still
+    running after that long is sent again. `compression` ("gzip",
+    "deflate") compresses requests; responses follow the server's setting.
+    """
+
+    def __init__(self, target, channels=1, deadline=None, max_attempts=1, hedge_delay=None,
+                 compression=None):
+        pool = ChannelPool(target, size=channels, compression=compression)
+        self.client = ResilientClient(pool, user_service_pb2_grpc.UserServiceStub, timeout=deadline,
+                                      max_attempts=max_attempts, hedge_delay=hedge_delay)
+
+    def create(self, name, email):
+        return self.client.CreateUser(
+            user_service_pb2.CreateUserRequest(name=name, email=email)
+        ).id
+
+    def create_batch(self, users):
+        request = user_service_pb2.BatchCreateUsersRequest(users=[
+            user_service_pb2.CreateUserRequest(name=name, email=email) for name, email in users
+        ])
+        return len(self.client.BatchCreateUsers(request).users)
+
+    def get(self, user_id):
+        self.client.GetUser(user_service_pb2.UserRequest(id=user_id))
+
+    def update(self, user_id, name):
+        self.client.UpdateUser(user_service_pb2.UpdateUserRequest(id=user_id, name=name))
+
+    def delete(self, user_id):
+        self.client.DeleteUser(user_service_pb2.UserRequest(id=user_id))
+
+    def list(self, count):
+        # One page of `count` users, as REST's GET /api/users?limit=count
+        for _ in self.client.ListUsers(user_service_pb2.ListUsersRequest(page_size=count, limit=count)):
+            pass
+
+    def counters(self):
+        """Calls, retries and hedges so far (see ResilientClient.counters)."""
+        return self.client.counters()
+
+    def close(self):
+        self.client.close()
+
+
+class AsyncGrpcTarget:
+    """grpc.aio version of GrpcTarget for the asyncio concurrency mode."""
+
+    def __init__(self, target, channels=1, deadline=None, max_attempts=1, hedge_delay=None,
+                 compression=None):
+        pool = AsyncChannelPool(target, size=channels, compression=compression)
+        self.client = AsyncResilientClient(pool, user_service_pb2_grpc.UserServiceStub, timeout=deadline,
+                                           max_attempts=max_attempts, hedge_delay=hedge_delay)
+
+    async def create(self, name, email):
+        response = await self.client.CreateUser(
+            user_service_pb2.CreateUserRequest(name=name, email=email)
+        )
+        return response.id
+
+    async def get(self, user_id):
+        await self.client.GetUser(user_service_pb2.UserRequest(id=user_id))
+
+    async def update(self, user_id, name):
+        await self.client.UpdateUser(user_service_pb2.UpdateUserRequest(id=user_id, name=name))
+
+    async def delete(self, user_id):
+        await self.client.DeleteUser(user_service_pb2.UserRequest(id=user_id))
+
+    async def list(self, count):
+        async for _ in self.client.ListUsers(user_service_pb2.ListUsersRequest(page_size=count, limit=count)):
+            pass
+
+    def counters(self):
+        return self.client.counters()
+
+    async def close(self):
+        await self.client.close()
+
+
+# Same wire format as python-socket-lab/framing.py: a 4-byte big-endian
+# length, then the payload
+FRAME_HEADER = struct.Struct("!I")
+
+
+class SocketTarget:
+    """
+    Drives the socket lab's uppercase-echo server over raw TCP.
+
+    Every worker thread gets its own persistent connection, opened on its
+    first message, and sends one frame at a time. The reply to an N-byte
+    message is always N bytes, so it is received into a preallocated buffer
+    without parsing.
+    """
+
+    def __init__(self, address):
+        host, _, port = address.rpartition(":")
+        self.address = (host, int(port))
+        self._local = threading.local()
+        self._sockets = []
+        self._lock = threading.Lock()
+
+    def _connection(self, size):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection(self.address)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self._sockets.append(sock)
+            conn = self._local.conn = [sock, bytearray(0)]
+        if len(conn[1]) != FRAME_HEADER.size + size:
+            conn[1] = bytearray(FRAME_HEADER.size + size)
+        return conn
+
+    def echo(self, payload):
+        sock, buf = self._connection(len(payload))
+        sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+        view, received = memoryview(buf), 0
+        while received < len(buf):
+            nbytes = sock.recv_into(view[received:])
+            if not nbytes:
+                raise ConnectionError("socket server closed the connection")
+            received += nbytes
+        if view[FRAME_HEADER.size:] != payload.upper():
+            raise ValueError("socket server replied with the wrong payload")
+
+    def close(self):
+        with self._lock:
+            for sock in self._sockets:
+                sock.close()
+            self._sockets.clear()
+
+
+class AsyncSocketTarget:
+    """asyncio version of SocketTarget: one connection per worker task."""
+
+    def __init__(self, address):
+        host, _, port = address.rpartition(":")
+        self.host, self.port = host, int(port)
+        self._streams = {}
+
+    async def echo(self, payload):
+        task = asyncio.current_task()
+        streams = self._streams.get(task)
+        if streams is None:
+            streams = self._streams[task] = await asyncio.open_connection(self.host, self.port)
+        reader, writer = streams
+        writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+        reply = await reader.readexactly(FRAME_HEADER.size + len(payload))
+        if reply[FRAME_HEADER.size:] != payload.upper():
+            raise ValueError("socket server replied with the wrong payload")
+
+    async def close(self):
+        for _, writer in self._streams.values():
+            writer.close()
+        self._streams.clear()
+
+
+class TargetSpec:
+    """
+    Picklable description of a target, so worker processes can build their
+    own client instead of sharing one across a fork.
+    """
+
+    def __init__(self, protocol, address, channels=1, pool_size=10, keep_alive=True, deadline=None,
+                 max_attempts=1, hedge_delay=None, compression=None):
+        self.protocol = protocol
+        self.address = address
+        # gRPC: channels (connections) per client, shared round robin by its workers,
+        # the per-call deadline in seconds (None: wait forever), attempts per
+        # GetUser, the delay before a GetUser is hedged (None: never), and the
+        # compression of requests (None: the channel default, none)
+        self.channels = channels
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.hedge_delay = hedge_delay
+        self.compression = compression
+        # REST: connection pool size and whether connections are reused
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+
+    def build(self):
+        if self.protocol == "rest":
+            return RestTarget(self.address, self.pool_size, self.keep_alive)
+        if self.protocol == "grpc":
+            return GrpcTarget(self.address, self.channels, self.deadline, self.max_attempts,
+                              self.hedge_delay, self.compression)
+        if self.protocol == "socket":
+            return SocketTarget(self.address)
+        raise ValueError(f"Unknown protocol: {self.protocol}")
+
+    def build_async(self):
+        if self.protocol == "rest":
+            return AsyncRestTarget(self.address, self.pool_size, self.keep_alive)
+        if self.protocol == "grpc":
+            return AsyncGrpcTarget(self.address, self.channels, self.deadline, self.max_attempts,
+                                   self.hedge_delay, self.compression)
+        if self.protocol == "socket":
+            return AsyncSocketTarget(self.address)
+        raise ValueError(f"The asyncio mode is not available for {self.protocol}")
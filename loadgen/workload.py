@@ -0,0 +1,50 @@
+OPERATIONS = ("create", "get", "update", "delete", "list", "echo")
+
+
+class OperationMix:
+    """
+    Weighted mix of Create/Get/Update/Delete/List operations, or of "echo"
+    for the socket lab. "list" reads one page of LoadConfig.page_size users.
+
+    Parsed from a spec such as "create=20,get=60,update=10,delete=10".
+    Weights are relative and need not add up to 100.
+    """
+
+    def __init__(self, weights):
+        unknown = set(weights) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unknown operation(s) in mix: {', '.join(sorted(unknown))}")
+        self.weights = {op: w for op, w in weights.items() if w > 0}
+        if not self.weights:
+            raise ValueError("Operation mix needs at least one positive weight")
+        self._ops = list(self.weights)
+        self._cumulative = []
+        total = 0
+        for op in self._ops:
+            total += self.weights[op]
+            self._cumulative.append(total)
+        self._total = total
+
+    @classmethod
+    def parse(cls, spec):
+        weights = {}
+        for part in spec.split(","):
+            op, _, weight = part.partition("=")
+            weights[op.strip()] = float(weight) if weight else 1.0
+        return cls(weights)
+
+    def pick(self, rng, have_users=True):
+        """
+        Pick the next operation. Get/update/delete need an existing user,
+        so the worker creates one first when it has none yet.
+        """
+        roll = rng.random() * self._total
+        for op, bound in zip(self._ops, self._cumulative):
+            if roll < bound:
+                break
+        if op in ("get", "update", "delete") and not have_users:
+            return "create"
+        return op
+
+    def __str__(self):
+        return ",".join(f"{op}={weight:g}" for op, weight in self.weights.items())
@@ -0,0 +1,38 @@
+"""
+In-process metrics shared by the REST, gRPC and socket services.
+
+Each service records request counts, latencies and in-flight requests into
+a Registry and exposes it in the Prometheus text format: REST on its own
+/metrics route, gRPC and the socket server through start_http_server() or
+a periodic dump of Registry.render() to the log.
+
+    from metrics import REGISTRY
+    latency = REGISTRY.histogram("op_seconds", "Time per op", ["op"])
+    latency.labels("get").observe(0.0004)
+    print(REGISTRY.render())
+
+There is no dependency on prometheus_client: the services need counters,
+gauges and histograms, and the text format is simple to write.
+"""
+
+from .core import DEFAULT_BUCKETS, Counter, Gauge, Histogram, Registry
+from .exposition import CONTENT_TYPE, start_http_server
+from .logs import LogSampler, configure_logging
+from .store import InstrumentedStore
+
+# The default registry of this process
+REGISTRY = Registry()
+
+__all__ = [
+    "CONTENT_TYPE",
+    "DEFAULT_BUCKETS",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "Registry",
+    "REGISTRY",
+    "InstrumentedStore",
+    "LogSampler",
+    "configure_logging",
+    "start_http_server",
+]
@@ -0,0 +1,45 @@
+"""
+Serve a Registry over HTTP, for services that do not already speak HTTP.
+
+    start_http_server(9464, registry)   # GET http://host:9464/metrics
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def start_http_server(port, registry, host="0.0.0.0"):
+    """
+    Serve `registry` at /metrics from a daemon thread.
+
+    Args:
+        port (int): port to listen on.
+        registry (Registry): the metrics to expose.
+        host (str): interface to bind.
+
+    Returns:
+        ThreadingHTTPServer: the running server; call shutdown() to stop it.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would drown the service's own log
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,52 @@
+"""
+Timing for UserStore operations.
+
+InstrumentedStore wraps a store and records how long each operation takes
+and which ones fail, per operation name. The number of stored users is
+read from len(store) when the metrics are scraped, so it costs nothing on
+the request path. Everything else passes through to the wrapped store.
+"""
+
+import time
+
+# Operations that run to completion inside the call. Generators
+# (iter_users, find_users) do their work while the caller consumes them, so
+# timing the call would only measure their creation; they pass through.
+TIMED_OPERATIONS = ("create", "create_many", "get", "get_by_email", "update", "update_many",
+                    "delete", "delete_many", "list_users")
+
+
+class InstrumentedStore:
+    """A UserStore proxy that reports operation timings to a Registry."""
+
+    def __init__(self, store, registry):
+        self.store = store
+        duration = registry.histogram(
+            "user_store_operation_seconds", "Time spent in UserStore operations", ["operation"])
+        errors = registry.counter(
+            "user_store_operation_errors_total", "UserStore operations that raised", ["operation", "error"])
+        registry.gauge("user_store_users", "Users in the store", function=lambda: len(store))
+        for name in TIMED_OPERATIONS:
+            setattr(self, name, _timed(getattr(store, name), duration.labels(name), errors, name))
+
+    def __getattr__(self, name):
+        return getattr(self.store, name)
+
+    def __len__(self):
+        return len(self.store)
+
+
+def _timed(method, histogram, errors, name):
+    def call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception as e:
+            errors.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    call.__name__ = name
+    call.__doc__ = method.__doc__
+    return call
@@ -1,9 +1,52 @@
-from flask import Flask, jsonify, request
+import os
+import time
+
+from flask import Flask, Response, g, jsonify, request, url_for
 
 from functools import wraps
+from compression import Compressor, parse_encodings
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, LogSampler, configure_logging
 from models import User
+from response_cache import ResponseCache
+from serializer import encode_array, install as install_json
+from user_store import DuplicateEmailError
 
 app = Flask(__name__)
+# orjson for app.json when available (REST_JSON=auto|orjson|stdlib)
+JSON_BACKEND = install_json(app)
+
+# Largest page GET /api/users returns when a limit is given
+MAX_PAGE_SIZE = 1000
+USER_FIELDS = ("id", "name", "email")
+NDJSON = "application/x-ndjson"
+# Most items one /api/users:batch request may carry
+MAX_BATCH_SIZE = 10000
+
+# Encoded GET responses, keyed by ETag (REST_CACHE_BYTES=0 turns it off)
+response_cache = ResponseCache(int(os.getenv("REST_CACHE_BYTES", 32 * 1024 * 1024)))
+
+# Response compression, off unless REST_COMPRESSION lists encodings ("gzip,deflate")
+compressor = Compressor(parse_encodings(os.getenv("REST_COMPRESSION", "")),
+                        min_size=int(os.getenv("REST_COMPRESS_MIN_BYTES", "1024")),
+                        level=int(os.getenv("REST_COMPRESS_LEVEL", "6")))
+
+# Request metrics, served at /metrics. Each gunicorn worker process keeps its
+# own, so with several workers a scrape reports whichever worker answers it.
+log = configure_logging("rest")
+sample_log = LogSampler()
+http_requests = REGISTRY.counter(
+    "http_requests_total", "Requests handled", ["route", "method", "status"])
+http_latency = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time from routing to a finished response", ["route", "method"])
+http_in_flight = REGISTRY.gauge("http_requests_in_flight", "Requests being handled")
+http_compressed = REGISTRY.counter(
+    "http_responses_compressed_total", "Responses sent compressed", ["encoding"])
+REGISTRY.counter("http_response_cache_hits_total", "GETs answered from the response cache",
+                 function=lambda: response_cache.hits)
+REGISTRY.counter("http_response_cache_misses_total", "GETs that had to build their body",
+                 function=lambda: response_cache.misses)
+REGISTRY.gauge("http_response_cache_bytes", "Bytes of cached response bodies",
+               function=lambda: response_cache.size)
 
 def user_required(f):
     @wraps(f)
@@ -14,44 +57,229 @@ def user_required(f):
         return f(user, *args, **kwargs)
     return wrapper
 
+@app.before_request
+def start_request_timer():
+    # Registered first: Flask skips the remaining before_request hooks once
+    # one of them returns a response (e.g. a 415 from check_json_header)
+    g.request_start = time.perf_counter()
+    http_in_flight.inc()
+
+@app.after_request
+def record_request(response):
+    # Also runs for the 500 response of an unhandled exception. Streamed
+    # (NDJSON) bodies are timed until the response starts, not until it ends.
+    elapsed = time.perf_counter() - g.request_start
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    http_requests.labels(route, request.method, response.status_code).inc()
+    http_latency.labels(route, request.method).observe(elapsed)
+    if response.content_encoding:
+        http_compressed.labels(response.content_encoding).inc()
+    if sample_log():
+        log.info("%s %s -> %d in %.2f ms", request.method, request.path, response.status_code,
+                 elapsed * 1000)
+    return response
+
+@app.after_request
+def compress_response(response):
+    # Registered after record_request, so it runs before it (Flask runs
+    # after_request hooks in reverse order)
+    compressor.apply(response, request.accept_encodings)
+    return response
+
+@app.teardown_request
+def finish_request(exc):
+    http_in_flight.dec()
+
 @app.before_request
 def check_json_header():
-    if request.method in ["POST", "PUT"]:
-        if request.content_type != "application/json":
+    if request.path.endswith(":batch"):
+        # Batch bodies may also be NDJSON, and DELETE carries a body too
+        if request.mimetype not in ("application/json", NDJSON):
+            return jsonify({
+                "error": "Unsupported Media Type",
+                "message": f"Batch requests accept 'Content-Type: application/json' or '{NDJSON}'"
+            }), 415
+    elif request.method in ["POST", "PUT"]:
+        if request.mimetype != "application/json":
             return jsonify({
                 "error": "Unsupported Media Type",
                 "message": "The server only accepts 'Content-Type: application/json'"
             }), 415
 
+def is_decimal(value):
+    # ASCII digits only: str.isdigit() also accepts "²", which int() rejects
+    return value.isascii() and value.isdecimal()
+
+def parse_list_query(args):
+    """
+    Read the GET /api/users query string. Raises ValueError on bad input.
+
+    limit         page size (1..MAX_PAGE_SIZE); omitted: no limit
+    after         cursor: only users with a larger id (default 0)
+    fields        comma-separated subset of id,name,email
+    name_prefix   only users whose name starts with this
+    email_prefix  only users whose email starts with this
+    format        "ndjson" to stream one JSON object per line
+    """
+    query = {
+        "name_prefix": args.get("name_prefix") or None,
+        "email_prefix": args.get("email_prefix") or None,
+        "limit": None,
+        "after": 0,
+        "fields": None,
+    }
+    if "limit" in args:
+        if not is_decimal(args["limit"]) or not 1 <= int(args["limit"]) <= MAX_PAGE_SIZE:
+            raise ValueError(f"limit must be an integer between 1 and {MAX_PAGE_SIZE}")
+        query["limit"] = int(args["limit"])
+    if "after" in args:
+        if not is_decimal(args["after"]):
+            raise ValueError("after must be a user id")
+        query["after"] = int(args["after"])
+    if "fields" in args:
+        fields = [f.strip() for f in args["fields"].split(",") if f.strip()]
+        unknown = [f for f in fields if f not in USER_FIELDS]
+        if not fields or unknown:
+            raise ValueError(f"fields must be a comma-separated subset of {','.join(USER_FIELDS)}")
+        query["fields"] = fields
+    return query
+
+def json_response(body, status=200):
+    # Body is JSON bytes from the serializer; the newline matches jsonify
+    return Response(body + b"\n", status=status, mimetype="application/json")
+
+def conditional_response(etag, key, build):
+    """
+    Answer a GET whose representation is identified by `etag` (unquoted).
+
+    If-None-Match with that ETag gets a bodiless 304. Otherwise the body is
+    served from the response cache, or built with build() and cached.
+    build() returns (JSON bytes, extra headers), or None for a 404.
+    Callers must compute `etag` before reading any data, so a body is never
+    older than the versions in its ETag.
+
+    Bodies are cached as sent: compressed for clients that accept the
+    compressor's encoding, so a cache hit costs no compression either.
+    """
+    encoding = compressor.negotiate(request.accept_encodings)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        entry = response_cache.get((key, etag, encoding))
+        if entry is None:
+            entry = build()
+            if entry is None:
+                return jsonify({"error": "User not found"}), 404
+            body, headers = entry
+            body += b"\n"  # as json_response
+            if encoding and compressor.worth_compressing(body):
+                body = compressor.compress(body, encoding)
+                headers = [*headers, ("Content-Encoding", encoding)]
+            entry = (body, headers)
+            response_cache.put((key, etag, encoding), *entry)
+        body, headers = entry
+        response = Response(body, mimetype="application/json")
+        response.headers.extend(headers)
+    # Weak when the body may be compressed (see compression.py)
+    response.set_etag(etag, weak=encoding is not None)
+    # Clients may keep the response but must revalidate it before reuse
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def collection_etag(suffix=""):
+    # Changes with any write to any user, in any worker process
+    return f"{User.storeUid()}-{User.storeVersion()}{suffix}"
+
 @app.route('/api/users', methods=['GET'])
 def get_users():
-# Return list of all users
-    users = [user.to_dict() for user in User.getAllUsers()]
-    return jsonify(users)
+# Return users: optionally a page (limit/after cursor), filtered by name/email
+# prefix, reduced to some fields, or streamed as NDJSON.
+# ?email= looks up the single user with that email instead.
+    if "email" in request.args:
+        def find_by_email():
+            user = User.findByEmail(request.args["email"])
+            return (user.to_json(), ()) if user else None
+        return conditional_response(collection_etag(), request.full_path, find_by_email)
+
+    try:
+        query = parse_list_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": "Invalid query", "message": str(e)}), 400
+
+    fields = query["fields"]
+
+    def find_users():
+        return User.findUsers(query["after"], query["limit"], query["name_prefix"], query["email_prefix"])
+
+    if request.args.get("format") == "ndjson" or request.accept_mimetypes.best == NDJSON:
+        # Stream one user per line straight from the store: memory use stays
+        # constant however many users are exported. Never cached, but still
+        # answers If-None-Match
+        etag = collection_etag("-ndjson")
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            users = find_users()
+
+            def generate():
+                for user in users:
+                    yield user.to_json(fields) + b"\n"
+            response = Response(generate(), mimetype=NDJSON)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def build_page():
+        page = []
+        last_id = None
+        for user in find_users():
+            page.append(user.to_json(fields))
+            last_id = user.id
+        headers = []
+        if query["limit"] is not None and len(page) == query["limit"]:
+            # A full page: point the client at the next one
+            next_args = request.args.to_dict()
+            next_args["after"] = last_id
+            headers.append(("Link", f'<{url_for("get_users", **next_args)}>; rel="next"'))
+            headers.append(("X-Next-Cursor", str(last_id)))
+        return encode_array(page), headers
+
+    return conditional_response(collection_etag(), request.full_path, build_page)
 
 @app.route('/api/users/<id>', methods=['GET'])
 @user_required
 def get_user(user):
-# Return specific user
-    return jsonify(user.to_dict())
+# Return specific user; the ETag follows the user's own version
+    etag = f"{User.storeUid()}-u{user.id}.{user.version}"
+    return conditional_response(etag, ("user", user.id), lambda: (user.to_json(), ()))
 
 @app.route('/api/users', methods=['POST'])
 def create_user():
 # Create new user from request data
     data = request.get_json()
-    if not data or "name" not in data or "email" not in data:
+    if not isinstance(data, dict) or "name" not in data or "email" not in data:
         return jsonify({"error": "Invalid data"}), 400
-    new_user = User(data["name"], data["email"])
-    return jsonify(new_user.to_dict()), 201
+    if not isinstance(data["name"], str) or not isinstance(data["email"], str):
+        return jsonify({"error": "Invalid data", "message": "Name and email must be strings"}), 400
+    try:
+        new_user = User(data["name"], data["email"])
+    except DuplicateEmailError:
+        return jsonify({"error": "Email already exists"}), 409
+    return json_response(new_user.to_json(), 201)
 
 @app.route('/api/users/<id>', methods=['PUT'])
 @user_required
 def update_user(user):
 # Update existing user
     data = request.get_json()
-    if not data:
+    if not data or not isinstance(data, dict):
          return jsonify({"error": "No update data provided"}), 400
-    user.update_user(name=data.get("name"), email=data.get("email"))
+    if any(data.get(key) is not None and not isinstance(data[key], str) for key in ("name", "email")):
+        return jsonify({"error": "Invalid data", "message": "Name and email must be strings"}), 400
+    try:
+        user.update_user(name=data.get("name"), email=data.get("email"))
+    except DuplicateEmailError:
+        return jsonify({"error": "Email already exists"}), 409
     return jsonify({"message": "The user data has updated"})
 
 @app.route('/api/users/<id>', methods=['DELETE'])
@@ -60,5 +288,133 @@ def delete_user(user):
     user.delete()
     return jsonify({"message": "The user is deleted"})
 
+def read_batch():
+    """
+    Parse a batch body: a JSON array, or NDJSON with one item per line.
+    Returns (items, error response); exactly one of them is None.
+    """
+    try:
+        if request.mimetype == NDJSON:
+            items = [app.json.loads(line) for line in request.get_data(as_text=True).splitlines()
+                     if line.strip()]
+        else:
+            items = app.json.loads(request.get_data(as_text=True))
+    except ValueError:
+        return None, (jsonify({"error": "Invalid data", "message": "Body is not valid JSON"}), 400)
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": "Invalid data", "message": "Expected a non-empty array of items"}), 400)
+    if len(items) > MAX_BATCH_SIZE:
+        return None, (jsonify({"error": "Payload Too Large",
+                               "message": f"A batch holds at most {MAX_BATCH_SIZE} items"}), 413)
+    return items, None
+
+def batch_response(results):
+    """
+    Report one result per item, in request order: {"index", "status", and
+    "user" or "error"}. The response itself is 200 even if some items failed.
+    """
+    failed = sum(1 for result in results if result["status"] >= 400)
+    if request.args.get("format") == "ndjson" or request.accept_mimetypes.best == NDJSON:
+        body = "".join(app.json.dumps(result) + "\n" for result in results)
+        return Response(body, mimetype=NDJSON)
+    return jsonify({"succeeded": len(results) - failed, "failed": failed, "results": results})
+
+def item_id(item):
+    # Batch update/delete items name their user by id: {"id": 3} (or a bare 3 for deletes)
+    value = item.get("id") if isinstance(item, dict) else item
+    if isinstance(value, str) and is_decimal(value):
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    return None
+
+def invalid_fields(item, required):
+    """
+    Why a batch item's name/email can't be used, or None if they can. Both
+    must be strings; creates need both, updates at least one non-empty.
+    """
+    values = [item.get("name"), item.get("email")]
+    if None in values if required else not any(values):
+        return "Invalid data"
+    if any(value is not None and not isinstance(value, str) for value in values):
+        return "Name and email must be strings"
+    return None
+
+@app.route('/api/users:batch', methods=['POST'])
+def create_users_batch():
+# Create many users in one pass: [{"name": ..., "email": ...}, ...]
+    items, error = read_batch()
+    if error:
+        return error
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        problem = invalid_fields(item, required=True) if isinstance(item, dict) else "Invalid data"
+        if problem:
+            results[index] = {"index": index, "status": 400, "error": problem}
+        else:
+            valid.append(index)
+    created = User.createMany((items[i]["name"], items[i]["email"]) for i in valid)
+    for index, user in zip(valid, created):
+        if user is None:
+            results[index] = {"index": index, "status": 409, "error": "Email already exists"}
+        else:
+            results[index] = {"index": index, "status": 201, "user": user.to_dict()}
+    return batch_response(results)
+
+@app.route('/api/users:batch', methods=['PUT'])
+def update_users_batch():
+# Update many users in one pass: [{"id": ..., "name": ..., "email": ...}, ...]
+    items, error = read_batch()
+    if error:
+        return error
+    results = [None] * len(items)
+    valid, updates = [], []
+    for index, item in enumerate(items):
+        user_id = item_id(item) if isinstance(item, dict) else None
+        problem = "Invalid data" if user_id is None else invalid_fields(item, required=False)
+        if problem:
+            results[index] = {"index": index, "status": 400, "error": problem}
+            continue
+        valid.append(index)
+        updates.append((user_id, item.get("name"), item.get("email")))
+    for index, result in zip(valid, User.updateMany(updates)):
+        if result is None:
+            results[index] = {"index": index, "status": 404, "error": "User not found"}
+        elif isinstance(result, DuplicateEmailError):
+            results[index] = {"index": index, "status": 409, "error": "Email already exists"}
+        else:
+            results[index] = {"index": index, "status": 200, "user": result.to_dict()}
+    return batch_response(results)
+
+@app.route('/api/users:batch', methods=['DELETE'])
+def delete_users_batch():
+# Delete many users in one pass: [1, 2, 3] or [{"id": 1}, ...]
+    items, error = read_batch()
+    if error:
+        return error
+    results = [None] * len(items)
+    valid, user_ids = [], []
+    for index, item in enumerate(items):
+        user_id = item_id(item)
+        if user_id is None:
+            results[index] = {"index": index, "status": 400, "error": "Invalid data"}
+            continue
+        valid.append(index)
+        user_ids.append(user_id)
+    for index, deleted in zip(valid, User.deleteMany(user_ids)):
+        if deleted:
+            results[index] = {"index": index, "status": 200}
+        else:
+            results[index] = {"index": index, "status": 404, "error": "User not found"}
+    return batch_response(results)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+# Prometheus text exposition: request, store and response cache metrics
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
+    # Werkzeug development server, for local work only: production runs under
+    # gunicorn (see gunicorn.conf.py). The debugger is off unless FLASK_DEBUG=1.
+    app.run(host="0.0.0.0", port=int(os.getenv("REST_PORT", "5000")), threaded=True)
@@ -0,0 +1,76 @@
+"""
+Micro-benchmark for the in-memory User store in models.py.
+
+Grows the store from 1k to 1M users and, at each size, reports the average
+latency of the operations the REST handlers perform per request:
+findById, create, update_user and delete.
+
+The backend comes from the USER_STORE environment variable (see user_store).
+
+Usage:
+    PYTHONPATH=.. python benchmark_models.py [--sizes 1000,10000,100000,1000000] [--ops 10000]
+"""
+
+import argparse
+import random
+import time
+
+from models import User
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+def fill_to(size):
+    """Create users until the store holds `size` users."""
+    for i in range(len(User.getAllUsers()), size):
+        User(f"user{i}", f"user{i}@example.com")
+
+
+def time_per_op(fn, args):
+    """Call fn(arg) for every arg and return the mean latency in microseconds."""
+    start = time.perf_counter_ns()
+    for arg in args:
+        fn(arg)
+    elapsed = time.perf_counter_ns() - start
+    return elapsed / len(args) / 1000
+
+
+def measure(ops):
+    """Measure one round of operations against the current store contents."""
+    ids = [u.id for u in User.getAllUsers()]
+    sample = [random.choice(ids) for _ in range(ops)]
+
+    find_us = time_per_op(User.findById, sample)
+    update_us = time_per_op(
+        lambda user_id: User.findById(user_id).update_user(name="renamed"), sample
+    )
+
+    # Create and then delete the same number of users so the size stays stable
+    created = []
+    create_us = time_per_op(
+        lambda i: created.append(User(f"tmp{i}", f"tmp{i}@example.com")), range(ops)
+    )
+    delete_us = time_per_op(lambda user: user.delete(), created)
+
+    return find_us, create_us, update_us, delete_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description="models.User store micro-benchmark")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated store sizes to measure")
+    parser.add_argument("--ops", type=int, default=10_000,
+                        help="operations per measurement")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+
+    print(f"{'users':>10} {'find (us)':>10} {'create (us)':>12} {'update (us)':>12} {'delete (us)':>12}")
+    for size in sizes:
+        fill_to(size)
+        find_us, create_us, update_us, delete_us = measure(args.ops)
+        print(f"{size:>10} {find_us:>10.3f} {create_us:>12.3f} {update_us:>12.3f} {delete_us:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Micro-benchmark for the GET /api/users response body.
+
+Grows the store from 1k to 100k users and, at each size, reports how long
+it takes to turn the full user list into a response:
+
+  jsonify        the old path: to_dict() per user + jsonify, stdlib encoder
+  orjson         to_dict() per user + jsonify through the orjson provider
+  uncached       serializer.encode_user without its per-user cache
+  cached         serializer.encode_user with every user already cached
+  GET            the whole endpoint through Flask's test client
+
+The backend comes from the USER_STORE environment variable (see user_store).
+
+Usage:
+    PYTHONPATH=.. python benchmark_serializer.py [--sizes 1000,10000,100000] [--repeat 5]
+"""
+
+import argparse
+import time
+
+from flask import Flask, jsonify
+
+import serializer
+from app import app
+from models import User
+from user_store import UserRecord
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+
+def fill_to(size):
+    """Create users until the store holds `size` users."""
+    for i in range(len(User.getAllUsers()), size):
+        User(f"user{i}", f"user{i}@example.com")
+
+
+def best_ms(fn, repeat, setup=lambda: None):
+    """Run fn(setup()) `repeat` times and return the fastest run in milliseconds."""
+    best = None
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter_ns()
+        fn(arg)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / 1e6
+
+
+def measure(repeat):
+    """Time each way of encoding the current store contents."""
+    users = User.getAllUsers()
+
+    stdlib_app = Flask("stdlib")
+    with stdlib_app.app_context():
+        jsonify_ms = best_ms(lambda _: jsonify([u.to_dict() for u in users]), repeat)
+    orjson_ms = None
+    if serializer.orjson is not None:
+        orjson_app = Flask("orjson")
+        serializer.install(orjson_app, "orjson")
+        with orjson_app.app_context():
+            orjson_ms = best_ms(lambda _: jsonify([u.to_dict() for u in users]), repeat)
+
+    # Fresh copies of the records have nothing cached yet
+    uncached_ms = best_ms(
+        lambda records: serializer.encode_array([serializer.encode_user(r) for r in records]),
+        repeat, setup=lambda: [UserRecord(u.id, u.name, u.email) for u in users],
+    )
+    serializer.encode_array([u.to_json() for u in users])
+    cached_ms = best_ms(lambda _: serializer.encode_array([u.to_json() for u in users]), repeat)
+
+    client = app.test_client()
+    get_ms = best_ms(lambda _: client.get("/api/users"), repeat)
+
+    return jsonify_ms, orjson_ms, uncached_ms, cached_ms, get_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GET /api/users serialization benchmark")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma-separated store sizes to measure")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="runs per measurement; the fastest is reported")
+    args = parser.parse_args()
+
+    sizes = sorted(int(s) for s in args.sizes.split(","))
+
+    print(f"JSON backend for the app: {serializer.install(Flask('probe'))}")
+    print(f"{'users':>10} {'jsonify (ms)':>13} {'orjson (ms)':>12} {'uncached (ms)':>14} "
+          f"{'cached (ms)':>12} {'GET (ms)':>10}")
+    for size in sizes:
+        fill_to(size)
+        jsonify_ms, orjson_ms, uncached_ms, cached_ms, get_ms = measure(args.repeat)
+        orjson_col = f"{orjson_ms:>12.2f}" if orjson_ms is not None else f"{'n/a':>12}"
+        print(f"{size:>10} {jsonify_ms:>13.2f} {orjson_col} {uncached_ms:>14.2f} "
+              f"{cached_ms:>12.2f} {get_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
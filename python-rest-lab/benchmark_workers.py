@@ -0,0 +1,126 @@
+"""
+REST throughput as gunicorn goes from 1 worker process to one per CPU core.
+
+For each worker count, starts `gunicorn -c gunicorn.conf.py app:app` with
+that many workers on a fresh shared store (USER_STORE=ipc://..., so every
+worker sees the same users), then measures POST (create) and GET
+throughput with the load generator. Before the load, it checks that users
+created through one worker can be read back through the others: each
+request goes over a new connection, so they land on different workers.
+
+Usage:
+    PYTHONPATH=.. python benchmark_workers.py [--workers 1,2,4] [--duration 10]
+        [--concurrency 16] [--store ipc]
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from loadgen import LoadConfig, OperationMix, TargetSpec, run_load
+from loadgen.report import summarize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VISIBILITY_USERS = 50
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers, port, store_url, threads):
+    """Start gunicorn and wait until it accepts connections."""
+    env = dict(os.environ, REST_WORKERS=str(workers), REST_PORT=str(port), REST_THREADS=str(threads),
+               USER_STORE=store_url, LOG_LEVEL="WARNING")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.path.dirname(HERE), env.get("PYTHONPATH")]))
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+                                "--log-level", "warning", "app:app"],
+                               cwd=HERE, env=env, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/api/users/0", timeout=1)
+            return process
+        except requests.ConnectionError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                stop_gunicorn(process)
+                raise RuntimeError(f"gunicorn with {workers} worker(s) did not start")
+            time.sleep(0.1)
+
+
+def stop_gunicorn(process):
+    # SIGTERM is a graceful shutdown: gunicorn.conf.py then stops the store server
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def check_shared(url):
+    """Create users and read them back, one connection per request. Returns how many were missing."""
+    headers = {"Connection": "close"}
+    ids = []
+    for i in range(VISIBILITY_USERS):
+        email = f"shared-{time.time_ns()}-{i}@example.com"
+        resp = requests.post(url, json={"name": "shared", "email": email}, headers=headers)
+        resp.raise_for_status()
+        ids.append(resp.json()["id"])
+    return sum(requests.get(f"{url}/{user_id}", headers=headers).status_code != 200 for user_id in ids)
+
+
+def throughput(url, mix, args):
+    config = LoadConfig(OperationMix.parse(mix), concurrency=args.concurrency, mode="processes",
+                        duration=args.duration, warmup=args.warmup)
+    result = run_load(TargetSpec("rest", url), config)
+    op = mix.partition("=")[0]
+    stats = summarize(result.latencies[op], result.errors.get(op, 0), result.elapsed)
+    return stats["throughput"], stats["latency_ms"]["p99"], result.error_count
+
+
+def main():
+    cores = multiprocessing.cpu_count()
+    parser = argparse.ArgumentParser(description="REST throughput by gunicorn worker count")
+    parser.add_argument("--workers", default=",".join(str(w) for w in range(1, cores + 1)),
+                        help=f"comma-separated worker counts (default: 1 to {cores})")
+    parser.add_argument("--store", default="ipc", choices=["ipc", "memory"],
+                        help="ipc: one store server shared by all workers (default); "
+                             "memory: a private memory:// store per worker, for comparison")
+    parser.add_argument("--threads", type=int, default=8, help="threads per worker")
+    parser.add_argument("--concurrency", type=int, default=16, help="client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per run")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds before measuring")
+    args = parser.parse_args()
+
+    print(f"{cores} CPU core(s); {args.concurrency} client processes run on the same machine")
+    print(f"{'workers':>7} {'POST/sec':>10} {'POST p99 (ms)':>14} {'GET/sec':>10} "
+          f"{'GET p99 (ms)':>13} {'errors':>7} {'missing':>8}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            store_url = f"ipc://{tmp}/user-store.sock" if args.store == "ipc" else "memory://"
+            port = free_port()
+            process = start_gunicorn(workers, port, store_url, args.threads)
+            try:
+                url = f"http://127.0.0.1:{port}/api/users"
+                missing = check_shared(url)
+                post, post_p99, post_errors = throughput(url, "create=1", args)
+                get, get_p99, get_errors = throughput(url, "get=1", args)
+            finally:
+                stop_gunicorn(process)
+        print(f"{workers:>7} {post:>10.0f} {post_p99:>14.2f} {get:>10.0f} {get_p99:>13.2f} "
+              f"{post_errors + get_errors:>7} {missing:>5}/{VISIBILITY_USERS}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+gzip/deflate compression of response bodies.
+
+The client lists the encodings it accepts in Accept-Encoding; the server
+compresses with the one it prefers (by q-value, then in the order of
+`encodings`), and only bodies of at least `min_size` bytes: below about a
+kilobyte the header and the CPU cost more than the bytes saved. "deflate"
+is the zlib format, as HTTP defines it, not raw deflate.
+
+Bodies are compressed whole. A streamed body (the NDJSON export) has no
+size up front, so it is always compressed when the client accepts it,
+through one compressor that emits output as it fills.
+
+A compressed response has a different body from the identity one, so its
+ETag is made weak, as nginx does: If-None-Match still matches it with the
+weak comparison conditional GETs use, but it is no longer a byte-for-byte
+validator. Responses that could be compressed carry Vary: Accept-Encoding,
+so shared caches keep the two forms apart.
+"""
+
+import zlib
+
+# zlib window bits for each content coding
+_WBITS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+
+def parse_encodings(spec):
+    """Encodings from a comma-separated list such as "gzip,deflate"; "" or "off" disables."""
+    encodings = tuple(e.strip().lower() for e in spec.split(",") if e.strip())
+    if encodings in ((), ("off",), ("none",), ("identity",)):
+        return ()
+    unknown = [e for e in encodings if e not in _WBITS]
+    if unknown:
+        raise ValueError(f"Unsupported encoding(s): {', '.join(unknown)} (use gzip, deflate)")
+    return encodings
+
+
+class Compressor:
+    """Negotiates and applies response compression (see module docstring)."""
+
+    def __init__(self, encodings=("gzip", "deflate"), min_size=1024, level=6):
+        self.encodings = tuple(encodings)
+        self.min_size = min_size
+        self.level = level
+
+    @property
+    def enabled(self):
+        return bool(self.encodings)
+
+    def negotiate(self, accept_encodings):
+        """
+        The encoding to use for a client sending `accept_encodings` (a
+        werkzeug Accept, i.e. request.accept_encodings), or None.
+        """
+        best, best_quality = None, 0
+        for encoding in self.encodings:
+            quality = accept_encodings[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, body, encoding):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, _WBITS[encoding])
+        return compressor.compress(body) + compressor.flush()
+
+    def compress_stream(self, chunks, encoding):
+        """Compress an iterable of byte chunks, yielding output as the compressor emits it."""
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, _WBITS[encoding])
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    def worth_compressing(self, body):
+        return len(body) >= self.min_size
+
+    def apply(self, response, accept_encodings):
+        """
+        Compress `response` in place if it qualifies and the client accepts
+        an encoding. Returns the encoding used, or None.
+        """
+        if not self.enabled or response.direct_passthrough:
+            return None
+        if response.status_code == 304:
+            response.vary.add("Accept-Encoding")  # as the full response would
+            return None
+        if response.status_code < 200 or response.status_code in (204, 206):
+            return None
+        response.vary.add("Accept-Encoding")
+        if "Content-Encoding" in response.headers:
+            return None  # already compressed (e.g. a cached body)
+        encoding = self.negotiate(accept_encodings)
+        if encoding is None:
+            return None
+        if response.is_streamed:
+            response.response = self.compress_stream(response.response, encoding)
+        else:
+            body = response.get_data()
+            if not self.worth_compressing(body):
+                return None
+            response.set_data(self.compress(body, encoding))
+        response.headers["Content-Encoding"] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return encoding
@@ -0,0 +1,74 @@
+"""
+Production serving for the REST service: gunicorn with the gthread worker.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Every setting can be overridden through the environment:
+
+    REST_PORT        listen port (default 5000)
+    REST_WORKERS     worker processes (default: see below)
+    REST_THREADS     threads per worker (default 8)
+    REST_KEEPALIVE   seconds an idle keep-alive connection is held open (default 5)
+    REST_BACKLOG     listen backlog (default 2048)
+    REST_TIMEOUT     seconds before a silent worker is restarted (default 30)
+
+Each worker process gets its own copy of the store. The in-memory backend is
+therefore only consistent with a single worker, so that is the default for
+memory:// stores. SQLite databases are shared through the file, and an
+ipc:// store through its store server, so they default to one worker per
+CPU core.
+
+With USER_STORE=ipc:///path/to.sock, the master starts the store server
+(python -m user_store.store_server) before forking the workers, unless one is already
+listening there, and stops it on exit. It serves USER_STORE_BACKEND
+(default memory://).
+"""
+
+import multiprocessing
+import os
+from urllib.parse import urlsplit
+
+
+def _default_workers():
+    if os.getenv("USER_STORE", "memory://").startswith("memory://"):
+        return 1
+    return multiprocessing.cpu_count()
+
+
+bind = f"0.0.0.0:{os.getenv('REST_PORT', '5000')}"
+worker_class = "gthread"
+workers = int(os.getenv("REST_WORKERS") or _default_workers())
+threads = int(os.getenv("REST_THREADS", "8"))
+keepalive = int(os.getenv("REST_KEEPALIVE", "5"))
+backlog = int(os.getenv("REST_BACKLOG", "2048"))
+timeout = int(os.getenv("REST_TIMEOUT", "30"))
+
+# The app (and its store) is imported in each worker after the fork, so a
+# SQLite connection is never shared between processes
+preload_app = False
+accesslog = None
+errorlog = "-"
+
+_store_server = None
+
+
+def on_starting(server):
+    global _store_server
+    url = os.getenv("USER_STORE", "")
+    if url.startswith("ipc://"):
+        from user_store.ipc import start_server
+        _store_server = start_server(urlsplit(url).path, os.getenv("USER_STORE_BACKEND", "memory://"))
+
+
+def on_exit(server):
+    if _store_server is not None:
+        _store_server.terminate()
+        _store_server.wait()
+
+
+def when_ready(server):
+    print(f"REST service on {bind}: {workers} gthread worker(s) x {threads} threads, "
+          f"keep-alive {keepalive}s")
+    if workers > 1 and os.getenv("USER_STORE", "memory://").startswith("memory://"):
+        print("WARNING: memory:// stores are per process; with several workers each "
+              "one sees a different set of users. Use REST_WORKERS=1, or a sqlite:// or ipc:// store.")
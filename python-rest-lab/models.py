@@ -1,42 +1,103 @@
+from metrics import REGISTRY, InstrumentedStore
+from serializer import encode_user
+from user_store import UserRecord, create_store, normalize_email
+
+
 class User:
-    __userList = []
+    # A thin handle on a store record, created per request: no instance dict
+    __slots__ = ("__record",)
+
+    # Shared storage engine (see user_store). The backend is picked with the
+    # USER_STORE environment variable and defaults to an in-memory dict.
+    # Operation timings and the store size go to the /metrics endpoint.
+    __store = InstrumentedStore(create_store(), REGISTRY)
+
     def __init__(self, name, email):
-        if User.__userList:  # check if the user list is empty
-            last_id = User.__userList[-1].id
-        else:
-            last_id = 0
-        self.__id = last_id + 1
-        self.name = name
-        self.email = email
-        User.__userList.append(self)
+        self.__record = User.__store.create(name, email)
+    @classmethod
+    def _from_record(cls, record):
+        user = cls.__new__(cls)
+        user.__record = record
+        return user
     def __repr__(self):
-        return f"id={self.__id}, name={self.name}, email={self.email}"
+        return repr(self.__record)
     @classmethod
     def getAllUsers(cls):
-        return list(cls.__userList)
+        return [cls._from_record(record) for record in cls.__store.list_users()]
+    @classmethod
+    def findUsers(cls, after=0, limit=None, name_prefix=None, email_prefix=None):
+        # Lazy: users are read from the store as the caller iterates
+        for record in cls.__store.find_users(after, limit, name_prefix, email_prefix):
+            yield cls._from_record(record)
     @property
     def id(self):
-        return self.__id
+        return self.__record.id
+    @property
+    def name(self):
+        return self.__record.name
+    @property
+    def email(self):
+        return self.__record.email
+    @property
+    def version(self):
+        # Goes up by one on every update_user
+        return self.__record.version
+    @classmethod
+    def storeVersion(cls):
+        # Changes after every create, update and delete
+        return cls.__store.version()
+    @classmethod
+    def storeUid(cls):
+        # Identifies the data the versions count from (see UserStore.uid)
+        return cls.__store.uid
     @classmethod
     def findById(cls, user_id):
-        for u in cls.__userList:
-            if u.id == user_id:
-                return u
-        return None
+        record = cls.__store.get(user_id)
+        return cls._from_record(record) if record else None
+    @classmethod
+    def findByEmail(cls, email):
+        # O(1) through the store's email index; case-insensitive
+        record = cls.__store.get_by_email(email)
+        return cls._from_record(record) if record else None
+    @classmethod
+    def createMany(cls, users):
+        # Create (name, email) pairs in one pass. Returns one entry per pair:
+        # the new User, or None if its email was already taken (or repeated)
+        users = list(users)
+        records = iter(cls.__store.create_many(users, skip_duplicates=True))
+        # Records come back in input order, minus the skipped duplicates
+        record = next(records, None)
+        results = []
+        for name, email in users:
+            if record is not None and normalize_email(record.email) == normalize_email(email):
+                results.append(cls._from_record(record))
+                record = next(records, None)
+            else:
+                results.append(None)
+        return results
+    @classmethod
+    def updateMany(cls, updates):
+        # (id, name, email) updates in one pass; one entry per update: the
+        # updated User, None if not found, or a DuplicateEmailError
+        return [
+            cls._from_record(result) if isinstance(result, UserRecord) else result
+            for result in cls.__store.update_many(updates)
+        ]
+    @classmethod
+    def deleteMany(cls, user_ids):
+        # One bool per id: True if the user existed
+        return cls.__store.delete_many(user_ids)
     def delete(self):
-        User.__userList.remove(self)
-    
+        User.__store.delete(self.id)
+
     def update_user(self, name=None, email=None):
-        if name is not None:
-            self.name = name
-        if email is not None:
-            self.email = email
-    
+        record = User.__store.update(self.id, name=name, email=email)
+        if record is not None:
+            self.__record = record
+
     def to_dict(self):
-        return {
-            "id": self.__id,
-            "name": self.name,
-            "email": self.email
-        }
-    
-    
\ No newline at end of file
+        return self.__record.to_dict()
+
+    def to_json(self, fields=None):
+        # JSON bytes without building a dict; cached until the user changes
+        return encode_user(self.__record, fields)
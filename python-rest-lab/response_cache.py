@@ -0,0 +1,56 @@
+"""
+In-process LRU cache of encoded GET responses.
+
+Entries are keyed by the request and the ETag it was built for. ETags carry
+the store's versions, so a write never invalidates anything: requests after
+it look up a new key, and the stale entries age out of the LRU.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    LRU of (body, headers) pairs, bounded by the total size of the bodies.
+    Bodies bigger than a quarter of the budget are not cached. Thread-safe.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, headers=()):
+        if len(body) * 4 > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = (body, tuple(headers))
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (old_body, _) = self._entries.popitem(last=False)
+                self._bytes -= len(old_body)
+
+    @property
+    def size(self):
+        # Bytes of cached bodies
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
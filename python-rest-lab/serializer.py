@@ -0,0 +1,88 @@
+"""
+Fast JSON encoding for REST responses.
+
+Users are the bulk of every response body, so they skip the generic path
+(`to_dict()` + `jsonify`) entirely:
+
+  - encode_user() writes a user straight from its UserRecord into the same
+    bytes Flask would produce (keys sorted, ASCII only), with no dict in
+    between. The C string escaper from the json module does the work.
+  - The full encoding is cached on the record. The cache is checked against
+    the record's current name and email on every read, so an update (which
+    assigns new strings) invalidates it without any bookkeeping.
+  - encode_array() joins encoded users into a JSON array.
+
+Everything else still goes through `app.json`. The backend is picked with the
+REST_JSON environment variable: "orjson" for orjson, "stdlib" for Flask's
+default provider, or "auto" (the default) for orjson when it is installed.
+"""
+
+import os
+from json.encoder import encode_basestring_ascii
+
+from flask.json.provider import DefaultJSONProvider, _default
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Flask sorts keys, so fields are always written in this order
+SORTED_FIELDS = ("email", "id", "name")
+
+
+def encode_user(record, fields=None):
+    """Return `record` as JSON bytes, reduced to `fields` if given."""
+    if fields is None:
+        cached = getattr(record, "_json", None)
+        name, email = record.name, record.email
+        if cached is not None and cached[0] is name and cached[1] is email:
+            return cached[2]
+        encoded = (
+            f'{{"email":{encode_basestring_ascii(email)},"id":{record.id},'
+            f'"name":{encode_basestring_ascii(name)}}}'
+        ).encode()
+        record._json = (name, email, encoded)
+        return encoded
+    parts = []
+    for field in SORTED_FIELDS:
+        if field in fields:
+            value = record.id if field == "id" else encode_basestring_ascii(getattr(record, field))
+            parts.append(f'"{field}":{value}')
+    return ("{" + ",".join(parts) + "}").encode()
+
+
+def encode_array(encoded):
+    """Join already-encoded JSON values (bytes) into a JSON array."""
+    return b"[" + b",".join(encoded) + b"]"
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, with the default provider's output rules."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SORT_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(obj)
+        body = orjson.dumps(obj, default=_default,
+                            option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def install(app, backend=None):
+    """Set up `app.json` for the chosen backend and return the backend's name."""
+    backend = backend or os.getenv("REST_JSON", "auto")
+    if backend not in ("auto", "orjson", "stdlib"):
+        raise ValueError(f"Unknown REST_JSON backend: {backend}")
+    if backend == "orjson" and orjson is None:
+        raise ValueError("REST_JSON=orjson needs orjson (pip install orjson)")
+    if backend == "stdlib" or orjson is None:
+        return "stdlib"
+    app.json = OrjsonProvider(app)
+    return "orjson"
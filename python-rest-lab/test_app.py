@@ -0,0 +1,196 @@
+import itertools
+import os
+
+import pytest
+
+# A fresh in-memory store for the app under test, whatever the shell sets
+os.environ["USER_STORE"] = "memory://"
+
+from app import app  # noqa: E402
+
+_emails = itertools.count()
+
+
+def new_email():
+    return f"user{next(_emails)}-{os.getpid()}@example.com"
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def create(client, name="alice", email=None):
+    response = client.post("/api/users", json={"name": name, "email": email or new_email()})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_create_rejects_non_string_fields(client):
+    for body in ({"name": "a", "email": 123}, {"name": ["a"], "email": new_email()},
+                 {"name": "a", "email": None}):
+        response = client.post("/api/users", json=body)
+        assert response.status_code == 400
+        assert response.get_json()["message"] == "Name and email must be strings"
+
+
+def test_create_rejects_non_object_body(client):
+    assert client.post("/api/users", json=["a", "b"]).status_code == 400
+
+
+def test_create_duplicate_email_is_case_insensitive(client):
+    email = new_email()
+    create(client, email=email)
+    response = client.post("/api/users", json={"name": "b", "email": f"  {email.upper()}"})
+    assert response.status_code == 409
+
+
+def test_update_rejects_non_string_fields(client):
+    user = create(client)
+    response = client.put(f"/api/users/{user['id']}", json={"email": 123})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Name and email must be strings"
+    assert client.get(f"/api/users/{user['id']}").get_json()["email"] == user["email"]
+
+
+def test_update_changes_only_given_fields(client):
+    user = create(client)
+    email = new_email()
+    assert client.put(f"/api/users/{user['id']}", json={"email": email}).status_code == 200
+    assert client.get(f"/api/users/{user['id']}").get_json() == {**user, "email": email}
+
+
+def batch(client, method, items):
+    response = client.open("/api/users:batch", method=method, json=items)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_batch_create_reports_each_item(client):
+    taken = create(client)["email"]
+    email = new_email()
+    body = batch(client, "POST", [
+        {"name": "a", "email": email},
+        {"name": "b", "email": taken},
+        {"name": "c"},
+        {"name": "d", "email": 123},
+        "not an object",
+        {"name": "e", "email": email.upper()},
+    ])
+    assert [r["status"] for r in body["results"]] == [201, 409, 400, 400, 400, 409]
+    assert [r["index"] for r in body["results"]] == list(range(6))
+    assert body["results"][3]["error"] == "Name and email must be strings"
+    assert (body["succeeded"], body["failed"]) == (1, 5)
+    assert body["results"][0]["user"]["email"] == email
+
+
+def test_batch_update_reports_each_item(client):
+    user = create(client)
+    other = create(client)
+    body = batch(client, "PUT", [
+        {"id": user["id"], "name": "renamed"},
+        {"id": str(other["id"]), "email": user["email"]},
+        {"id": "²", "name": "x"},
+        {"id": user["id"], "email": 123},
+        {"id": user["id"]},
+        {"id": True, "name": "x"},
+        {"id": 10**9, "name": "x"},
+    ])
+    assert [r["status"] for r in body["results"]] == [200, 409, 400, 400, 400, 400, 404]
+    assert body["results"][0]["user"]["name"] == "renamed"
+    assert body["results"][3]["error"] == "Name and email must be strings"
+
+
+def test_batch_delete_accepts_ids_and_objects(client):
+    first, second = create(client), create(client)
+    body = batch(client, "DELETE", [first["id"], {"id": str(second["id"])}, first["id"], "²", -1])
+    assert [r["status"] for r in body["results"]] == [200, 200, 404, 400, 400]
+    assert client.get(f"/api/users/{second['id']}").status_code == 404
+
+
+def test_batch_rejects_bad_bodies(client):
+    assert client.post("/api/users:batch", data="[", content_type="application/json").status_code == 400
+    assert client.post("/api/users:batch", json=[]).status_code == 400
+    assert client.post("/api/users:batch", json={"name": "a"}).status_code == 400
+
+
+def test_batch_accepts_ndjson(client):
+    lines = "".join(f'{{"name": "n{i}", "email": "{new_email()}"}}\n' for i in range(3))
+    response = client.post("/api/users:batch?format=ndjson", data=lines, content_type="application/x-ndjson")
+    assert response.status_code == 200
+    assert [r["status"] for r in map(app.json.loads, response.get_data(as_text=True).splitlines())] == [201] * 3
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=1001", "limit=abc", "limit=²", "limit=-1",
+                                   "after=x", "after=²", "fields=id,password"])
+def test_list_rejects_bad_query(client, query):
+    response = client.get(f"/api/users?{query}")
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body["error"] == "Invalid query"
+    assert body["message"].startswith(query.split("=")[0])
+
+
+def test_list_pages_with_cursor(client):
+    prefix = f"pager{os.getpid()}-{next(_emails)}-"
+    ids = [create(client, name=f"{prefix}{i}")["id"] for i in range(5)]
+    seen, after = [], 0
+    while True:
+        response = client.get(f"/api/users?limit=2&name_prefix={prefix}&after={after}")
+        assert response.status_code == 200
+        page = response.get_json()
+        seen += [user["id"] for user in page]
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            break
+        assert after == str(page[-1]["id"])
+        assert f"after={after}" in response.headers["Link"]
+    assert seen == ids
+
+
+def test_user_etag_and_304(client):
+    user = create(client)
+    url = f"/api/users/{user['id']}"
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    cached = client.get(url, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+    assert cached.headers["ETag"] == etag
+
+    client.put(url, json={"name": "changed"})
+    changed = client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.get_json()["name"] == "changed"
+    assert changed.headers["ETag"] != etag
+
+
+def test_collection_etag_changes_on_write(client):
+    etag = client.get("/api/users?limit=1").headers["ETag"]
+    assert client.get("/api/users?limit=1", headers={"If-None-Match": etag}).status_code == 304
+    create(client)
+    assert client.get("/api/users?limit=1", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_ndjson_export_answers_if_none_match(client):
+    create(client)
+    response = client.get("/api/users?format=ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    again = client.get("/api/users?format=ndjson", headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+
+
+def test_content_type_parameters_are_accepted(client):
+    user = {"name": "a", "email": new_email()}
+    response = client.post("/api/users", data=app.json.dumps(user),
+                           content_type="application/json; charset=utf-8")
+    assert response.status_code == 201
+    response = client.post("/api/users:batch", data=app.json.dumps([{"name": "b", "email": new_email()}]),
+                           content_type="application/json; charset=utf-8")
+    assert response.get_json()["succeeded"] == 1
+    response = client.post("/api/users:batch", data=f'{{"name": "c", "email": "{new_email()}"}}\n',
+                           content_type="application/x-ndjson; charset=utf-8")
+    assert response.get_json()["succeeded"] == 1
+    assert client.post("/api/users:batch", data="[]", content_type="text/plain").status_code == 415
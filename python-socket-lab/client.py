@@ -1,40 +1,52 @@
 # Create Socket connection to server
 # Create input/output streams
-# Send message to server
-# Wait for response
+# Send messages to server as length-prefixed frames (see framing.py)
+# Wait for each response
 # Print server response
 # Close connection
 
 import os, socket
 
+from framing import FramedSocket
+
 # Configuration retrieved from environment variables
 HOST = os.getenv("APP") or "127.0.0.1"   # Default to localhost
 PORT = 8080  # Port number for socket server
 
-def run_test_case(test_name: str, payload: str, override_host=None, override_port=None):
+def run_test_case(test_name: str, payloads, override_host=None, override_port=None, pipeline=False):
     """
-    Run a single test case with given payload.
+    Run a single test case: send every payload over one connection.
+    With pipeline=True all payloads are sent before any reply is read.
     Focus only on socket-level errors (not payload validation).
     """
     host = override_host or HOST
     port = override_port or PORT
+    if isinstance(payloads, str):
+        payloads = [payloads]
 
     print(f"\n--- {test_name} ---")
     try:
-        # 1. Create socket and attempt connection
+        # 1. Create socket and attempt connection (reused for every payload)
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         client_socket.connect((host, port))
+        conn = FramedSocket(client_socket)
         print(f"SUCCESS: Connection established to {host}:{port}")
 
-        # 2. Send message (any string is accepted by server)
-        print(f"Sending: {payload!r}")
-        client_socket.send(payload.encode())
-
-        # 3. Wait for server response
         try:
-            response = client_socket.recv(1024).decode()
-            print("Server response:", response)
-        
+            if pipeline:
+                # 2. Send every message at once, then 3. read the replies in order
+                print(f"Pipelining {len(payloads)} messages")
+                conn.send_frames([payload.encode() for payload in payloads])
+                for payload in payloads:
+                    show_response(payload, conn.recv_frame())
+            else:
+                for payload in payloads:
+                    # 2. Send message (any string is accepted by server)
+                    print(f"Sending: {shorten(payload)!r}")
+                    conn.send_frame(payload.encode())
+                    # 3. Wait for server response
+                    show_response(payload, conn.recv_frame())
+
         except ConnectionResetError:
             print("SOCKET ERROR: Connection was reset by the server.")
         except UnicodeDecodeError:
@@ -61,6 +73,18 @@ def run_test_case(test_name: str, payload: str, override_host=None, override_por
             except Exception:
                 pass
 
+def shorten(text, limit=60):
+    return text if len(text) <= limit else f"{text[:limit]}... ({len(text)} chars)"
+
+def show_response(payload, response):
+    if response is None:
+        print("SOCKET ERROR: Server closed the connection before replying.")
+        return
+    response = response.decode()
+    print("Server response:", shorten(response))
+    if payload and response != payload.upper():
+        print("ERROR: Response does not match the uppercased message.")
+
 if __name__ == "__main__":
     # testing list
     test_cases = [
@@ -68,6 +92,9 @@ if __name__ == "__main__":
         ("2. Empty String", ""),                      # send empty string, and check how server reponses
         ("3. Wrong Port (simulate ConnectionRefused)", "test", None, 9999),  # testing by useing a wrong port
         ("4. Bad Hostname (simulate gaierror)", "test", "no_such_host", 8080), # testing by useing a wrong host
+        ("5. Several Messages, One Connection", ["first", "second", "third"]),
+        ("6. Pipelined Messages", [f"message {i}" for i in range(10)], None, None, True),
+        ("7. Large Message (over 1 KiB)", "a" * 100_000),
     ]
 
     for case in test_cases:
@@ -0,0 +1,147 @@
+# Length-prefixed framing for the socket protocol.
+#
+# Every message, in both directions, is a 4-byte big-endian length followed
+# by that many bytes of payload:
+#
+#     +----------------+---------------------+
+#     | length (u32 BE)| payload (length B)  |
+#     +----------------+---------------------+
+#
+# A connection carries any number of frames, and a client may pipeline:
+# send several requests before reading the replies, which come back in the
+# same order. Messages can be any size up to MAX_FRAME_SIZE, no matter how
+# TCP splits or merges them on the way.
+
+import struct
+from collections import deque
+
+HEADER = struct.Struct("!I")
+# Largest payload accepted; a bigger length prefix is treated as a protocol error
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# Initial receive buffer; it grows to fit the largest frame seen
+BUFFER_SIZE = 64 * 1024
+
+
+class FrameError(Exception):
+    """The peer sent something that is not a valid frame."""
+
+
+def encode_frame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+
+class FrameBuffer:
+    """
+    Reassembles frames from partial reads.
+
+    Data is received straight into one preallocated bytearray through
+    writable() (for socket.recv_into, or asyncio's BufferedProtocol), and
+    complete frames are cut out of it with pop_frames(). Leftover bytes of a
+    partial frame are moved to the front, and the buffer only grows when a
+    single frame does not fit.
+    """
+
+    def __init__(self, size=BUFFER_SIZE, max_frame_size=MAX_FRAME_SIZE):
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+        self.max_frame_size = max_frame_size
+
+    def writable(self):
+        """Return a memoryview of the free space to receive into."""
+        if self._end == len(self._buf):
+            self._reserve(len(self._buf) - self._start + 1)
+        return self._view[self._end:]
+
+    def advance(self, nbytes):
+        """Mark `nbytes` received into the last writable() view as filled."""
+        self._end += nbytes
+
+    @property
+    def pending(self):
+        """Bytes of an incomplete frame waiting for the rest of it."""
+        return self._end - self._start
+
+    def pop_frames(self):
+        """Return the payloads of every complete frame received so far."""
+        frames = []
+        while True:
+            available = self._end - self._start
+            if available < HEADER.size:
+                break
+            (length,) = HEADER.unpack_from(self._buf, self._start)
+            if length > self.max_frame_size:
+                raise FrameError(f"frame of {length} bytes exceeds the {self.max_frame_size} byte limit")
+            if available < HEADER.size + length:
+                # Make room for the whole frame now, so the rest of it is
+                # received in as few reads as possible
+                self._reserve(HEADER.size + length)
+                break
+            start = self._start + HEADER.size
+            frames.append(bytes(self._view[start:start + length]))
+            self._start = start + length
+        if self._start == self._end:
+            self._start = self._end = 0
+        return frames
+
+    def _reserve(self, size):
+        """Make sure a frame of `size` bytes fits from the current start."""
+        if len(self._buf) - self._start >= size:
+            return
+        pending = self._end - self._start
+        if size > len(self._buf):
+            # A new buffer, since a bytearray with exported views cannot resize
+            buf = bytearray(max(size, 2 * len(self._buf)))
+            buf[:pending] = self._view[self._start:self._end]
+            self._buf, self._view = buf, memoryview(buf)
+        else:
+            self._buf[:pending] = self._buf[self._start:self._end]
+        self._start, self._end = 0, pending
+
+
+class FramedSocket:
+    """Sends and receives frames over a blocking socket."""
+
+    def __init__(self, sock, buffer_size=BUFFER_SIZE):
+        self.sock = sock
+        self._buffer = FrameBuffer(buffer_size)
+        self._frames = deque()
+
+    def send_frame(self, payload):
+        self.sock.sendall(encode_frame(payload))
+
+    def send_frames(self, payloads):
+        """Send several frames with one sendall (pipelining)."""
+        self.sock.sendall(b"".join(encode_frame(payload) for payload in payloads))
+
+    def recv_frames(self):
+        """
+        Block until at least one frame is complete and return all that are.
+        Returns [] when the peer closed the connection between frames.
+        """
+        if self._frames:
+            frames = list(self._frames)
+            self._frames.clear()
+            return frames
+        while True:
+            nbytes = self.sock.recv_into(self._buffer.writable())
+            if not nbytes:
+                if self._buffer.pending:
+                    raise ConnectionError("connection closed in the middle of a frame")
+                return []
+            self._buffer.advance(nbytes)
+            frames = self._buffer.pop_frames()
+            if frames:
+                return frames
+
+    def recv_frame(self):
+        """Return the next frame's payload, or None if the peer closed the connection."""
+        if not self._frames:
+            self._frames.extend(self.recv_frames())
+            if not self._frames:
+                return None
+        return self._frames.popleft()
+
+    def close(self):
+        self.sock.close()
@@ -4,75 +4,381 @@
 # Listen for connections
 # While True:
 # - Accept client connection
-# - Receive data from client
+# - Receive length-prefixed frames from client (see framing.py)
 # - Process data
-# - Send response back
-# - Close connection
+# - Send responses back, in order
+# - Close connection once the client closes it or goes idle
+#
+# Three ways of serving connections (--mode / SOCKET_SERVER_MODE):
+# - serial:  the loop above, one client at a time (the original server)
+# - threads: the accept loop hands each client to a thread pool
+# - asyncio: event loop (asyncio protocol) serving thousands of clients at once
+#
+# Connection, message and error counts are kept in the shared metrics
+# registry and written to the log every --stats-interval seconds, on SIGUSR1
+# and at shutdown (or served over HTTP with --metrics-port).
 
+import argparse
+import asyncio
+import logging
+import os
+import signal
 import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
-try:
-    # 1. Create TCP/IP socket
-    server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+from framing import HEADER, FrameBuffer, FrameError, FramedSocket, encode_frame
+from metrics import REGISTRY, LogSampler, configure_logging, start_http_server
 
-    # 2. Bind to all available network interfaces (so other containers/hosts can connect)
-    server_socket.bind(("0.0.0.0", 8080))
+# create a warining message if the client didn't sent data or sent an empty sting.
+WARNING_MSG = "You didn't send any data or sent an empty string"
 
-    # 3. Listen for incoming connections
-    server_socket.listen(3)
-    print("Server listening on port 8080")
-except OSError as e:
-    print(f"FATAL ERROR during startup: {e}")
-    print("Check if port 8080 is already in use or if you have permission.")
-    exit(1)
+log = logging.getLogger("socket")
+# Stats dumps are asked for explicitly, so they are logged even with --quiet
+stats_log = logging.getLogger("socket.stats")
+stats_log.setLevel(logging.INFO)
+# Received messages are logged one in every 1/LOG_SAMPLE_RATE
+sample_log = LogSampler()
 
-# 4. Accept connections in a loop
-while True:
+connections = REGISTRY.counter("socket_connections_total", "Connections accepted")
+open_connections = REGISTRY.gauge("socket_connections_open", "Connections being served")
+
+
+class TrafficStats:
+    """
+    Message and byte totals. They change on every read, so they are updated
+    together under one lock and exported through function-backed counters,
+    instead of as three counters with a lock each.
+    """
+
+    def __init__(self):
+        self.messages = 0
+        self.received = 0
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def add(self, messages, received, sent):
+        with self._lock:
+            self.messages += messages
+            self.received += received
+            self.sent += sent
+
+
+traffic = TrafficStats()
+REGISTRY.counter("socket_messages_total", "Request frames answered", function=lambda: traffic.messages)
+REGISTRY.counter("socket_received_bytes_total", "Bytes read from clients",
+                 function=lambda: traffic.received)
+REGISTRY.counter("socket_sent_bytes_total", "Bytes written to clients", function=lambda: traffic.sent)
+# One observation per read: every complete frame in it is decoded and answered
+handling = REGISTRY.histogram("socket_handling_seconds", "Time to answer the frames of one read")
+errors = REGISTRY.counter("socket_errors_total", "Connections that ended in an error", ["error"])
+
+
+def parse_args(argv=None):
+    """
+    Server options. Every flag can also be set through an environment
+    variable, which is how docker-compose configures the container.
+    """
+    parser = argparse.ArgumentParser(description="Uppercase echo socket server")
+    parser.add_argument("--mode", choices=["serial", "threads", "asyncio"],
+                        default=os.getenv("SOCKET_SERVER_MODE", "asyncio"),
+                        help="serial: one client at a time, threads: thread pool, asyncio: event loop")
+    parser.add_argument("--port", type=int, default=int(os.getenv("SOCKET_PORT", "8080")))
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("SOCKET_MAX_WORKERS", "32")),
+                        help="threads mode: clients served at the same time")
+    parser.add_argument("--idle-timeout", type=float, default=float(os.getenv("SOCKET_IDLE_TIMEOUT", "3.0")),
+                        help="seconds a connection may sit idle before it is closed")
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("SOCKET_BACKLOG", "1024")),
+                        help="pending connections the kernel queues before refusing new ones")
+    parser.add_argument("--quiet", action="store_true", default=os.getenv("SOCKET_QUIET") == "1",
+                        help="only log warnings and errors, whatever LOG_LEVEL says (for benchmarks)")
+    parser.add_argument("--stats-interval", type=float,
+                        default=float(os.getenv("SOCKET_STATS_INTERVAL", "60")),
+                        help="seconds between metrics dumps to the log (0: only on SIGUSR1 and at shutdown)")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv("SOCKET_METRICS_PORT", "0")),
+                        help="also serve Prometheus metrics at http://host:PORT/metrics (default: off)")
+    return parser.parse_args(argv)
+
+
+def respond(payload):
+    """Reply to one request frame: the text in uppercase, or the warning if empty."""
+    if not payload:
+        return WARNING_MSG.encode()
+    return payload.decode().upper().encode()
+
+
+def describe(payload):
+    text = payload.decode(errors="replace")
+    return text if len(text) <= 100 else f"{text[:100]}... ({len(payload)} bytes)"
+
+
+def frame_bytes(payloads):
+    return sum(map(len, payloads)) + HEADER.size * len(payloads)
+
+
+def log_received(frames):
+    # Checked once per read, so a quiet server skips the sampler entirely
+    if log.isEnabledFor(logging.INFO):
+        for payload in frames:
+            if sample_log():
+                log.info("Received: %s", describe(payload))
+
+
+def record_read(frames, received, sent, start):
+    """Count the frames answered for one read, the bytes read and written, and the time taken."""
+    traffic.add(len(frames), received, sent)
+    handling.observe(time.perf_counter() - start)
+
+
+def dump_stats():
+    stats_log.info("Stats:\n%s", REGISTRY.render().rstrip())
+
+
+def stop_on_sigterm(signum, frame):
+    raise KeyboardInterrupt
+
+
+def start_stats(args):
+    """Dump the metrics every --stats-interval seconds and on SIGUSR1; serve them if asked."""
+    if args.metrics_port:
+        start_http_server(args.metrics_port, REGISTRY)
+        log.info("Metrics at http://0.0.0.0:%d/metrics", args.metrics_port)
+    # docker stop sends SIGTERM: shut down as on Ctrl+C, so the final stats are logged
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
+    # The signal handler only wakes the stats thread, which does the logging
+    requested = threading.Event()
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: requested.set())
+
+    def dump_on_request():
+        while True:
+            requested.wait(args.stats_interval if args.stats_interval > 0 else None)
+            requested.clear()
+            dump_stats()
+    threading.Thread(target=dump_on_request, name="stats", daemon=True).start()
+
+
+def handle_client(client_socket, client_addr, args):
+    """Serve one persistent connection on a blocking socket (serial and threads modes)."""
+    log.debug("Connection from %s", client_addr)
+    connections.inc()
+    open_connections.inc()
+
+    # - Receive frames until the client closes the connection or goes idle
+    client_socket.settimeout(args.idle_timeout)
+    conn = FramedSocket(client_socket)
+    served = 0
     try:
-        # - Accept client connection
+        while True:
+            try:
+                frames = conn.recv_frames()
+            except socket.timeout:
+                if not served:
+                    log.warning("Client %s timed out waiting for data.", client_addr)
+                    errors.labels("no_data").inc()
+                    conn.send_frame(WARNING_MSG.encode())
+                else:
+                    log.debug("Closing idle connection from %s", client_addr)
+                break
+            if not frames:
+                if not served:
+                    log.warning("Client %s sent nothing (closed connection).", client_addr)
+                    errors.labels("no_data").inc()
+                break
+            start = time.perf_counter()
+            log_received(frames)
+            # Pipelined requests are answered with a single send
+            replies = [respond(payload) for payload in frames]
+            conn.send_frames(replies)
+            record_read(frames, frame_bytes(frames), frame_bytes(replies), start)
+            served += len(frames)
+
+    except FrameError as e:
+        log.warning("Client %s sent an invalid frame (%s).", client_addr, e)
+        errors.labels("invalid_frame").inc()
+    except ConnectionResetError:
+        log.warning("Client %s forcibly closed the connection.", client_addr)
+        errors.labels("reset").inc()
+    except UnicodeDecodeError:
+        log.warning("Received data from %s was not valid text (UnicodeDecodeError).", client_addr)
+        errors.labels("not_text").inc()
+    except Exception as e:
+        log.error("Error handling client %s: %s", client_addr, e)
+        errors.labels(type(e).__name__).inc()
+
+    finally:
+        # - Close connection
+        client_socket.close()
+        open_connections.dec()
+
+
+def serve_serial(server_socket, args):
+    # 4. Accept connections in a loop, one client at a time. Kept as the
+    # baseline: a slow client stalls everyone queued behind it.
+    while True:
         client_socket, client_addr = server_socket.accept()
-        print(f"Connection from {client_addr}")
+        handle_client(client_socket, client_addr, args)
+
+
+def serve_threads(server_socket, args):
+    # 4. Accept connections in a loop and let the pool serve them, so up to
+    # max_workers clients (slow ones included) are handled at the same time
+    with ThreadPoolExecutor(max_workers=args.max_workers) as pool:
+        while True:
+            client_socket, client_addr = server_socket.accept()
+            pool.submit(handle_client, client_socket, client_addr, args)
 
-        # - Receive data from client
-        client_socket.settimeout(3.0)  # wait for 3 secs
-        warning_msg = "You didn't send any data or sent an empty string" # create a warining message if the client didn't sent data or sent an empty sting.
+
+class EchoProtocol(asyncio.BufferedProtocol):
+    """
+    Serves one persistent connection on the event loop (asyncio mode).
+
+    The loop reads straight into the connection's FrameBuffer
+    (get_buffer/buffer_updated), so no bytes objects are created for
+    partial reads. Every complete frame is answered in order, and pipelined
+    requests that arrive together are answered with a single write.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.buffer = FrameBuffer()
+        self.served = 0
+        self._unrecorded = 0
+        self.transport = None
+        self.client_addr = None
+        self._loop = None
+        self._last_active = 0.0
+        self._idle_timer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.client_addr = transport.get_extra_info("peername")
+        log.debug("Connection from %s", self.client_addr)
+        connections.inc()
+        open_connections.inc()
+        self._loop = asyncio.get_running_loop()
+        self._last_active = self._loop.time()
+        self._idle_timer = self._loop.call_later(self.args.idle_timeout, self._check_idle)
+
+    def get_buffer(self, sizehint):
+        return self.buffer.writable()
+
+    def buffer_updated(self, nbytes):
+        self.buffer.advance(nbytes)
+        self._last_active = self._loop.time()
+        start = time.perf_counter()
         try:
-            data = client_socket.recv(1024).decode()
-
-            if not data:
-                print(f"WARNING: Client {client_addr} sent nothing (closed connection).")
-                client_socket.send(warning_msg.encode())
-                continue
-            else:
-                print(f"Received: {data}")
-                response = data.upper()
-                client_socket.send(response.encode())
-
-        except socket.timeout:
-            print(f"WARNING: Client {client_addr} timed out waiting for data.")
-            client_socket.send(warning_msg.encode())
-        except ConnectionResetError:
-            print(f"WARNING: Client {client_addr} forcibly closed the connection.")
+            frames = self.buffer.pop_frames()
+            log_received(frames)
+            replies = [respond(payload) for payload in frames]
+        except FrameError as e:
+            log.warning("Client %s sent an invalid frame (%s).", self.client_addr, e)
+            errors.labels("invalid_frame").inc()
+            self.transport.close()
+            return
         except UnicodeDecodeError:
-            print(f"WARNING: Received data from {client_addr} was not valid text (UnicodeDecodeError).")
-        except Exception as e:
-            print(f"ERROR handling client {client_addr}: {e}")
+            log.warning("Received data from %s was not valid text (UnicodeDecodeError).", self.client_addr)
+            errors.labels("not_text").inc()
+            self.transport.close()
+            return
+        if replies:
+            data = b"".join(encode_frame(reply) for reply in replies)
+            self.transport.write(data)
+            record_read(frames, self._unrecorded + nbytes, len(data), start)
+            self._unrecorded = 0
+            self.served += len(replies)
+        else:
+            # Part of a frame: counted with the read that completes it
+            self._unrecorded += nbytes
+
+    def eof_received(self):
+        if not self.served and not self.buffer.pending:
+            log.warning("Client %s sent nothing (closed connection).", self.client_addr)
+            errors.labels("no_data").inc()
+        # Returning False closes the transport once pending replies are sent
+        return False
 
-        finally:
-            # Add delay to prevent race condition/ConnectionResetError
-            time.sleep(0.1)
-            # - Close connection
-            client_socket.close()
+    def pause_writing(self):
+        # The client is not reading its replies: stop reading its requests
+        self.transport.pause_reading()
 
+    def resume_writing(self):
+        self.transport.resume_reading()
+
+    def connection_lost(self, exc):
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        open_connections.dec()
+        if isinstance(exc, ConnectionResetError):
+            log.warning("Client %s forcibly closed the connection.", self.client_addr)
+            errors.labels("reset").inc()
+
+    def _check_idle(self):
+        # One timer per connection, pushed back instead of rescheduled on every read
+        idle_for = self._loop.time() - self._last_active
+        if idle_for < self.args.idle_timeout:
+            self._idle_timer = self._loop.call_later(self.args.idle_timeout - idle_for, self._check_idle)
+            return
+        self._idle_timer = None
+        if not self.served:
+            log.warning("Client %s timed out waiting for data.", self.client_addr)
+            errors.labels("no_data").inc()
+            self.transport.write(encode_frame(WARNING_MSG.encode()))
+        else:
+            log.debug("Closing idle connection from %s", self.client_addr)
+        # - Close connection
+        self.transport.close()
+
+
+async def serve_asyncio(server_socket, args):
+    # 4. The event loop accepts and serves every connection concurrently;
+    # an idle client only costs a socket and its buffer
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: EchoProtocol(args), sock=server_socket)
+    async with server:
+        await server.serve_forever()
+
+
+def main(args=None):
+    args = args or parse_args()
+    configure_logging("socket", "WARNING" if args.quiet else None)
+    try:
+        # 1. Create TCP/IP socket
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        # 2. Bind to all available network interfaces (so other containers/hosts can connect)
+        server_socket.bind(("0.0.0.0", args.port))
+
+        # 3. Listen for incoming connections
+        server_socket.listen(args.backlog)
+        log.info("Server listening on port %d (%s mode)", args.port, args.mode)
+    except OSError as e:
+        log.critical("FATAL ERROR during startup: %s", e)
+        log.critical("Check if port %d is already in use or if you have permission.", args.port)
+        exit(1)
+
+    start_stats(args)
+
+    try:
+        if args.mode == "asyncio":
+            asyncio.run(serve_asyncio(server_socket, args))
+        elif args.mode == "threads":
+            serve_threads(server_socket, args)
+        else:
+            serve_serial(server_socket, args)
     except KeyboardInterrupt:
         # press Ctrl+C to terminate the server
-        print("\nServer shutdown requested.")
-        break
+        log.info("Server shutdown requested.")
     except Exception as e:
-        # handle the other error except for accept() 
-        print(f"Unexpected error in main loop: {e}")
-        break
+        # handle the other error except for accept()
+        log.error("Unexpected error in main loop: %s", e)
+
+    server_socket.close()
+    dump_stats()
+    log.info("Server shut down cleanly.")
+
 
-server_socket.close()
-print("Server shut down cleanly.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
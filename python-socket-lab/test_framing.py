@@ -0,0 +1,74 @@
+import socket
+
+import pytest
+
+from framing import FrameBuffer, FrameError, FramedSocket, encode_frame
+
+
+def feed(buffer, data, chunk_size):
+    """Receive `data` into `buffer` in reads of at most `chunk_size` bytes; return the frames popped."""
+    frames = []
+    while data:
+        view = buffer.writable()
+        nbytes = min(len(view), chunk_size, len(data))
+        view[:nbytes] = data[:nbytes]
+        buffer.advance(nbytes)
+        data = data[nbytes:]
+        frames += buffer.pop_frames()
+    return frames
+
+
+PAYLOADS = [b"", b"a", b"hello world", bytes(range(256)) * 40]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000, 1 << 20])
+def test_frames_survive_any_split(chunk_size):
+    buffer = FrameBuffer(size=64)
+    data = b"".join(encode_frame(p) for p in PAYLOADS)
+    assert feed(buffer, data, chunk_size) == PAYLOADS
+    assert buffer.pending == 0
+
+
+def test_partial_frame_waits_for_the_rest():
+    buffer = FrameBuffer(size=16)
+    frame = encode_frame(b"x" * 10)
+    assert feed(buffer, frame[:2], 100) == []
+    assert buffer.pending == 2
+    assert feed(buffer, frame[2:9], 100) == []
+    assert buffer.pending == 9
+    assert feed(buffer, frame[9:] + encode_frame(b"y")[:3], 100) == [b"x" * 10]
+    assert buffer.pending == 3
+
+
+def test_buffer_grows_for_a_large_frame():
+    buffer = FrameBuffer(size=8)
+    payload = b"z" * 100_000
+    assert feed(buffer, encode_frame(payload), 4096) == [payload]
+
+
+def test_oversized_frame_is_rejected():
+    buffer = FrameBuffer(max_frame_size=10)
+    with pytest.raises(FrameError):
+        feed(buffer, encode_frame(b"x" * 11), 100)
+
+
+def test_framed_socket_pipelines_and_detects_eof():
+    left, right = socket.socketpair()
+    with left, right:
+        client, server = FramedSocket(left), FramedSocket(right, buffer_size=16)
+        client.send_frames([b"one", b"", b"three" * 10])
+        assert [server.recv_frame() for _ in range(3)] == [b"one", b"", b"three" * 10]
+        left.sendall(encode_frame(b"last"))
+        left.shutdown(socket.SHUT_WR)
+        assert server.recv_frame() == b"last"
+        assert server.recv_frame() is None
+
+
+def test_framed_socket_eof_mid_frame_is_an_error():
+    left, right = socket.socketpair()
+    with left, right:
+        server = FramedSocket(right)
+        left.sendall(encode_frame(b"truncated")[:6])
+        left.shutdown(socket.SHUT_WR)
+        with pytest.raises(ConnectionError):
+            server.recv_frame()
@@ -0,0 +1,129 @@
+"""
+Latency past saturation, with and without the admission interceptor.
+
+Runs the real UserService on a sync gRPC server in this process, with both
+interceptors, and drives it with the load generator in open loop: requests
+are sent at a fixed rate whether or not earlier ones have completed, and
+latency counts from when each was due. Every store call first waits
+--service-ms, as a remote database would, so the server (and not the CPU
+the client shares with it) sets the capacity: about
+max_workers / service time requests per second.
+
+Below capacity both servers behave the same. Past it, an unlimited server
+queues every request it gets, so latency grows with the queue, and once
+the queue wait passes the client deadline, requests expire in it ("expired":
+dropped by the deadline check instead of run). With --max-in-flight, the
+excess is rejected at once with RESOURCE_EXHAUSTED and the latency of the
+requests that are served stays bounded.
+
+Usage:
+    PYTHONPATH=.. python benchmark_admission.py [--rates 0.5,1,1.5,2] [--max-in-flight 8]
+        [--service-ms 10] [--max-workers 4] [--deadline-ms 500] [--duration 10]
+"""
+
+import argparse
+import time
+from concurrent import futures
+
+import grpc
+
+import server
+from generated import user_service_pb2_grpc
+from interceptors import AdmissionInterceptor, MetricsInterceptor
+from loadgen import LoadConfig, OperationMix, TargetSpec, run_load
+from loadgen.report import summarize
+from metrics import Registry
+from user_store import create_store
+
+
+class DelayedStore:
+    """A store whose every call waits `delay` seconds first, like a store across the network."""
+
+    def __init__(self, store, delay):
+        self.store = store
+        self.delay = delay
+
+    def __getattr__(self, name):
+        method = getattr(self.store, name)
+
+        def call(*args, **kwargs):
+            time.sleep(self.delay)
+            return method(*args, **kwargs)
+        return call
+
+
+def start_server(args, max_in_flight):
+    """Start a sync UserService server on a free port. Returns (server, port, registry)."""
+    registry = Registry()
+    grpc_server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=args.max_workers),
+        interceptors=[MetricsInterceptor(registry, server.log),
+                      AdmissionInterceptor(registry, max_in_flight,
+                                           min_deadline=args.min_deadline_ms / 1000)],
+    )
+    user_service_pb2_grpc.add_UserServiceServicer_to_server(server.UserService(), grpc_server)
+    port = grpc_server.add_insecure_port("localhost:0")
+    grpc_server.start()
+    return grpc_server, port, registry
+
+
+def shed_counts(registry):
+    """RPCs rejected by the admission interceptor, by reason."""
+    counts = {}
+    for line in registry.render().splitlines():
+        if line.startswith("grpc_server_shed_total{"):
+            reason = line.split('reason="')[1].split('"')[0]
+            counts[reason] = counts.get(reason, 0) + int(float(line.rsplit(" ", 1)[1]))
+    return counts
+
+
+def run(args, rate, max_in_flight):
+    grpc_server, port, registry = start_server(args, max_in_flight)
+    try:
+        config = LoadConfig(OperationMix.parse(args.mix), concurrency=args.concurrency, mode="asyncio",
+                            loop="open", rate=rate, duration=args.duration, warmup=args.warmup)
+        spec = TargetSpec("grpc", f"localhost:{port}", deadline=args.deadline_ms / 1000)
+        result = run_load(spec, config)
+    finally:
+        grpc_server.stop(0)
+    stats = summarize(result.overall, result.error_count, result.elapsed)
+    return stats, shed_counts(registry)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gRPC latency past saturation, with load shedding")
+    parser.add_argument("--rates", default="0.5,1,1.5,2",
+                        help="offered load, as multiples of the server's capacity")
+    parser.add_argument("--max-in-flight", type=int, default=8,
+                        help="admission limit for the shedding runs (default: 2 x --max-workers)")
+    parser.add_argument("--service-ms", type=float, default=10.0, help="time each store call takes")
+    parser.add_argument("--max-workers", type=int, default=4, help="server handler threads")
+    parser.add_argument("--deadline-ms", type=float, default=500.0, help="client deadline per call")
+    parser.add_argument("--min-deadline-ms", type=float, default=0.0,
+                        help="admission interceptor: shed calls with less time left than this")
+    parser.add_argument("--mix", default="get=100", help="operation mix (see benchmark.py)")
+    parser.add_argument("--concurrency", type=int, default=256,
+                        help="asyncio client tasks; must exceed what the server admits")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per run")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds before measuring")
+    args = parser.parse_args()
+
+    server.store = DelayedStore(create_store(), args.service_ms / 1000)
+    capacity = args.max_workers / (args.service_ms / 1000)
+    print(f"Capacity: {args.max_workers} threads / {args.service_ms:g} ms = {capacity:.0f} req/s; "
+          f"deadline {args.deadline_ms:g} ms; mix {args.mix}")
+    print(f"{'offered':>8} {'server':<16} {'served/s':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'errors':>7} {'shed':>6} {'expired':>8}")
+    for multiple in (float(r) for r in args.rates.split(",")):
+        rate = capacity * multiple
+        for max_in_flight in (None, args.max_in_flight):
+            stats, shed = run(args, rate, max_in_flight)
+            label = f"max-in-flight {max_in_flight}" if max_in_flight else "unlimited"
+            latency = stats["latency_ms"]
+            print(f"{rate:>8.0f} {label:<16} {stats['throughput']:>9.0f} {latency['p50']:>9.1f} "
+                  f"{latency['p99']:>9.1f} {stats['errors']:>7} {shed.get('in_flight', 0):>6} "
+                  f"{shed.get('deadline', 0):>8}")
+
+
+if __name__ == "__main__":
+    main()
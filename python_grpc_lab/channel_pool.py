@@ -0,0 +1,116 @@
+"""
+Reusable gRPC client channels.
+
+A single channel multiplexes every call over one HTTP/2 connection, which
+caps a busy client at one TCP socket and at the server's concurrent-stream
+limit. ChannelPool opens `size` channels to the same target, each on its own
+connection, and hands them out round robin together with cached stubs:
+
+    with ChannelPool("localhost:50051", size=4) as pool:
+        stub = pool.stub(user_service_pb2_grpc.UserServiceStub)
+        stub.GetUser(...)
+
+With `compression` ("gzip" or "deflate"), every request sent on the pool's
+channels is compressed; stub calls can still override it with their own
+compression= argument. Responses are compressed (or not) by the server.
+
+The pool does not import the generated code, so it works both from this
+directory (client.py) and as python_grpc_lab.channel_pool (the load generator).
+"""
+
+import itertools
+import threading
+
+import grpc
+
+# Tuned defaults, merged with any options passed to the pool
+DEFAULT_OPTIONS = {
+    # Without this, channels with identical options share one subchannel
+    # (one TCP connection), which would defeat the pool
+    "grpc.use_local_subchannel_pool": 1,
+    # Detect dead connections while calls are in flight
+    "grpc.keepalive_time_ms": 60000,
+    "grpc.keepalive_timeout_ms": 20000,
+    "grpc.keepalive_permit_without_calls": 0,
+    # Large enough for a ListUsers page of MAX_PAGE_SIZE users (default: 4 MiB)
+    "grpc.max_receive_message_length": 64 * 1024 * 1024,
+    "grpc.max_send_message_length": 64 * 1024 * 1024,
+}
+
+# Compression algorithms by name, for command-line flags
+COMPRESSION = {
+    "none": grpc.Compression.NoCompression,
+    "gzip": grpc.Compression.Gzip,
+    "deflate": grpc.Compression.Deflate,
+}
+
+
+class ChannelPool:
+    """
+    Round-robin pool of channels to one target. Thread-safe: channel() and
+    stub() can be called from any number of threads.
+    """
+
+    def __init__(self, target, size=1, options=None, compression=None):
+        self.target = target
+        self.size = max(1, size)
+        self.compression = COMPRESSION.get(compression, compression)
+        merged = dict(DEFAULT_OPTIONS)
+        merged.update(dict(options or ()))
+        self.options = list(merged.items())
+        self._channels = [self._open() for _ in range(self.size)]
+        # next() on itertools.count is atomic, so round robin needs no lock
+        self._next = itertools.count()
+        self._stubs = {}
+        self._lock = threading.Lock()
+
+    def _open(self):
+        return grpc.insecure_channel(self.target, options=self.options, compression=self.compression)
+
+    def _index(self):
+        return next(self._next) % self.size
+
+    def channel(self):
+        """Return the next channel in round-robin order."""
+        return self._channels[self._index()]
+
+    def stub(self, stub_class):
+        """
+        Return a `stub_class` stub bound to the next channel. Stubs are cached
+        per channel, so this costs a dict lookup after the first call.
+        """
+        key = (stub_class, self._index())
+        stub = self._stubs.get(key)
+        if stub is None:
+            with self._lock:
+                stub = self._stubs.get(key)
+                if stub is None:
+                    stub = self._stubs[key] = stub_class(self._channels[key[1]])
+        return stub
+
+    def close(self):
+        for channel in self._channels:
+            channel.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncChannelPool(ChannelPool):
+    """grpc.aio version of ChannelPool; create it inside the event loop."""
+
+    def _open(self):
+        return grpc.aio.insecure_channel(self.target, options=self.options, compression=self.compression)
+
+    async def close(self):
+        for channel in self._channels:
+            await channel.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
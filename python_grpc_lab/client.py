@@ -1,5 +1,10 @@
-import grpc, os
+import grpc, os, uuid
+from channel_pool import ChannelPool
 from generated import user_service_pb2, user_service_pb2_grpc 
+from resilience import ResilientClient
+
+# Every call gets a deadline, so a stalled server cannot hang the client
+TIMEOUT = float(os.getenv("GRPC_TIMEOUT", "5"))
 
 def handle_rpc_error(e: grpc.RpcError, context: str = ""):
     """
@@ -21,12 +26,17 @@ def run():
     # Initialize new_user outside the try block to prevent UnboundLocalError 
     # if the first CreateUser call fails.
     new_user = None
+    # Emails must be unique, so tag this run's users
+    tag = uuid.uuid4().hex[:8]
     
     print(f"Attempting to connect to gRPC server at: {connect}\n")
     
     try:
-        with grpc.insecure_channel(connect) as channel:
-            stub = user_service_pb2_grpc.UserServiceStub(channel)
+        # A pool of one channel, with the same tuned options as the load generator;
+        # reads are retried on UNAVAILABLE and every call has a TIMEOUT deadline
+        pool = ChannelPool(connect)
+        with ResilientClient(pool, user_service_pb2_grpc.UserServiceStub, timeout=TIMEOUT,
+                             max_attempts=3) as stub:
 
             # ----------------------------------------------------------------------
             # 1. CreateUser SUCCESS Case (Necessary for subsequent tests)
@@ -34,7 +44,7 @@ def run():
             try:
                 print("--- 1. CreateUser (SUCCESS) ---")
                 new_user = stub.CreateUser(
-                    user_service_pb2.CreateUserRequest(name="Tan", email="Tan@example.com")
+                    user_service_pb2.CreateUserRequest(name="Tan", email=f"Tan-{tag}@example.com")
                 )
                 print("Created User:", new_user)
 
@@ -56,6 +66,19 @@ def run():
                     print("SUCCESS: Server correctly returned INVALID_ARGUMENT for missing data.")
                 handle_rpc_error(e, "CreateUser (ERROR)")
 
+            # 1c. CreateUser ERROR Case (ALREADY_EXISTS)
+            # Test: Reuse the first user's email with different letter case.
+            try:
+                print("\n--- 1c. CreateUser (ERROR: Duplicate Email) ---")
+                stub.CreateUser(
+                    user_service_pb2.CreateUserRequest(name="Copy", email=f"TAN-{tag}@example.com")
+                )
+                print("ERROR: Expected ALREADY_EXISTS but call succeeded.")
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.ALREADY_EXISTS:
+                    print("SUCCESS: Server correctly returned ALREADY_EXISTS for a duplicate email.")
+                handle_rpc_error(e, "CreateUser (ERROR)")
+
 
             # ----------------------------------------------------------------------
             # 2. GetUser SUCCESS Case
@@ -68,6 +91,16 @@ def run():
             except grpc.RpcError as e:
                 handle_rpc_error(e, "GetUser (SUCCESS)")
                 
+            # 2a. GetUserByEmail SUCCESS Case (case-insensitive lookup)
+            try:
+                print("\n--- 2a. GetUserByEmail (SUCCESS) ---")
+                user = stub.GetUserByEmail(
+                    user_service_pb2.GetUserByEmailRequest(email=f"tan-{tag}@EXAMPLE.com")
+                )
+                print("Fetched User:", user)
+            except grpc.RpcError as e:
+                handle_rpc_error(e, "GetUserByEmail (SUCCESS)")
+
             # 2b. GetUser ERROR Case (NOT_FOUND)
             # Test: Request a user ID that does not exist in the server's list.
             try:
@@ -86,7 +119,7 @@ def run():
             try:
                 print("\n--- 3. UpdateUser (SUCCESS) ---")
                 updated_user = stub.UpdateUser(
-                    user_service_pb2.UpdateUserRequest(id=new_user.id, name="Hsuan-Yu Tan", email="Tan@new.com")
+                    user_service_pb2.UpdateUserRequest(id=new_user.id, name="Hsuan-Yu Tan", email=f"Tan-{tag}@new.com")
                 )
                 print("Updated User:", updated_user)
             except grpc.RpcError as e:
@@ -128,6 +161,45 @@ def run():
                     print("SUCCESS: Server correctly returned NOT_FOUND when deleting an already deleted user.")
                 handle_rpc_error(e, "DeleteUser (ERROR)")
 
+
+            # ----------------------------------------------------------------------
+            # 5. BatchCreateUsers / BatchGetUsers
+            # ----------------------------------------------------------------------
+            try:
+                print("\n--- 5. BatchCreateUsers + BatchGetUsers (SUCCESS) ---")
+                created = stub.BatchCreateUsers(
+                    user_service_pb2.BatchCreateUsersRequest(users=[
+                        user_service_pb2.CreateUserRequest(name=f"batch{i}", email=f"batch{i}-{tag}@example.com")
+                        for i in range(3)
+                    ])
+                )
+                print("Created IDs:", [user.id for user in created.users])
+                fetched = stub.BatchGetUsers(
+                    user_service_pb2.BatchGetUsersRequest(ids=[user.id for user in created.users] + ["9999"])
+                )
+                print("Fetched IDs:", [user.id for user in fetched.users], "Not found:", list(fetched.not_found_ids))
+            except grpc.RpcError as e:
+                handle_rpc_error(e, "BatchCreateUsers/BatchGetUsers")
+
+            # ----------------------------------------------------------------------
+            # 6. ImportUsers (client streaming) and ListUsers (server streaming)
+            # ----------------------------------------------------------------------
+            try:
+                print("\n--- 6. ImportUsers + ListUsers (SUCCESS) ---")
+                chunks = (
+                    user_service_pb2.BatchCreateUsersRequest(users=[
+                        user_service_pb2.CreateUserRequest(name=f"import{c}-{i}", email=f"import{c}-{i}-{tag}@example.com")
+                        for i in range(100)
+                    ])
+                    for c in range(5)
+                )
+                result = stub.ImportUsers(chunks)
+                print(f"Imported: {result.created} created, {result.rejected} rejected")
+                pages = list(stub.ListUsers(user_service_pb2.ListUsersRequest(page_size=200)))
+                print(f"Listed {sum(len(page.users) for page in pages)} users in {len(pages)} pages")
+            except grpc.RpcError as e:
+                handle_rpc_error(e, "ImportUsers/ListUsers")
+
     except Exception as e:
         # Catch connection errors (e.g., if the server is not running)
         print(f"\nFATAL CONNECTION ERROR: {e}")
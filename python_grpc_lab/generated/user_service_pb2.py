@@ -24,23 +24,37 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12user_service.proto\"\x19\n\x0bUserRequest\x12\n\n\x02id\x18\x01 \x01(\t\"0\n\x11\x43reateUserRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\"<\n\x11UpdateUserRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\"/\n\x04User\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\"\x07\n\x05\x45mpty2\xa3\x01\n\x0bUserService\x12\x1e\n\x07GetUser\x12\x0c.UserRequest\x1a\x05.User\x12\'\n\nCreateUser\x12\x12.CreateUserRequest\x1a\x05.User\x12\'\n\nUpdateUser\x12\x12.UpdateUserRequest\x1a\x05.User\x12\"\n\nDeleteUser\x12\x0c.UserRequest\x1a\x06.Emptyb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x12user_service.proto\x12\tgenerated\"\x19\n\x0bUserRequest\x12\n\n\x02id\x18\x01 \x01(\t\"&\n\x15GetUserByEmailRequest\x12\r\n\x05\x65mail\x18\x01 \x01(\t\"0\n\x11\x43reateUserRequest\x12\x0c\n\x04name\x18\x01 \x01(\t\x12\r\n\x05\x65mail\x18\x02 \x01(\t\"<\n\x11UpdateUserRequest\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\"/\n\x04User\x12\n\n\x02id\x18\x01 \x01(\t\x12\x0c\n\x04name\x18\x02 \x01(\t\x12\r\n\x05\x65mail\x18\x03 \x01(\t\"\x07\n\x05\x45mpty\"*\n\x08UserList\x12\x1e\n\x05users\x18\x01 \x03(\x0b\x32\x0f.generated.User\"F\n\x17\x42\x61tchCreateUsersRequest\x12+\n\x05users\x18\x01 \x03(\x0b\x32\x1c.generated.CreateUserRequest\"#\n\x14\x42\x61tchGetUsersRequest\x12\x0b\n\x03ids\x18\x01 \x03(\t\"N\n\x15\x42\x61tchGetUsersResponse\x12\x1e\n\x05users\x18\x01 \x03(\x0b\x32\x0f.generated.User\x12\x15\n\rnot_found_ids\x18\x02 \x03(\t\"4\n\x10ListUsersRequest\x12\x11\n\tpage_size\x18\x01 \x01(\x05\x12\r\n\x05limit\x18\x02 \x01(\x05\"8\n\x13ImportUsersResponse\x12\x0f\n\x07\x63reated\x18\x01 \x01(\x05\x12\x10\n\x08rejected\x18\x02 \x01(\x05\x32\xef\x04\n\x0bUserService\x12\x32\n\x07GetUser\x12\x16.generated.UserRequest\x1a\x0f.generated.User\x12;\n\nCreateUser\x12\x1c.generated.CreateUserRequest\x1a\x0f.generated.User\x12;\n\nUpdateUser\x12\x1c.generated.UpdateUserRequest\x1a\x0f.generated.User\x12\x36\n\nDeleteUser\x12\x16.generated.UserRequest\x1a\x10.generated.Empty\x12\x43\n\x0eGetUserByEmail\x12 .generated.GetUserByEmailRequest\x1a\x0f.generated.User\x12K\n\x10\x42\x61tchCreateUsers\x12\".generated.BatchCreateUsersRequest\x1a\x13.generated.UserList\x12R\n\rBatchGetUsers\x12\x1f.generated.BatchGetUsersRequest\x1a .generated.BatchGetUsersResponse\x12?\n\tListUsers\x12\x1b.generated.ListUsersRequest\x1a\x13.generated.UserList0\x01\x12S\n\x0bImportUsers\x12\".generated.BatchCreateUsersRequest\x1a\x1e.generated.ImportUsersResponse(\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'user_service_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_USERREQUEST']._serialized_start=22
-  _globals['_USERREQUEST']._serialized_end=47
-  _globals['_CREATEUSERREQUEST']._serialized_start=49
-  _globals['_CREATEUSERREQUEST']._serialized_end=97
-  _globals['_UPDATEUSERREQUEST']._serialized_start=99
-  _globals['_UPDATEUSERREQUEST']._serialized_end=159
-  _globals['_USER']._serialized_start=161
-  _globals['_USER']._serialized_end=208
-  _globals['_EMPTY']._serialized_start=210
-  _globals['_EMPTY']._serialized_end=217
-  _globals['_USERSERVICE']._serialized_start=220
-  _globals['_USERSERVICE']._serialized_end=383
+  _globals['_USERREQUEST']._serialized_start=33
+  _globals['_USERREQUEST']._serialized_end=58
+  _globals['_GETUSERBYEMAILREQUEST']._serialized_start=60
+  _globals['_GETUSERBYEMAILREQUEST']._serialized_end=98
+  _globals['_CREATEUSERREQUEST']._serialized_start=100
+  _globals['_CREATEUSERREQUEST']._serialized_end=148
+  _globals['_UPDATEUSERREQUEST']._serialized_start=150
+  _globals['_UPDATEUSERREQUEST']._serialized_end=210
+  _globals['_USER']._serialized_start=212
+  _globals['_USER']._serialized_end=259
+  _globals['_EMPTY']._serialized_start=261
+  _globals['_EMPTY']._serialized_end=268
+  _globals['_USERLIST']._serialized_start=270
+  _globals['_USERLIST']._serialized_end=312
+  _globals['_BATCHCREATEUSERSREQUEST']._serialized_start=314
+  _globals['_BATCHCREATEUSERSREQUEST']._serialized_end=384
+  _globals['_BATCHGETUSERSREQUEST']._serialized_start=386
+  _globals['_BATCHGETUSERSREQUEST']._serialized_end=421
+  _globals['_BATCHGETUSERSRESPONSE']._serialized_start=423
+  _globals['_BATCHGETUSERSRESPONSE']._serialized_end=501
+  _globals['_LISTUSERSREQUEST']._serialized_start=503
+  _globals['_LISTUSERSREQUEST']._serialized_end=555
+  _globals['_IMPORTUSERSRESPONSE']._serialized_start=557
+  _globals['_IMPORTUSERSRESPONSE']._serialized_end=613
+  _globals['_USERSERVICE']._serialized_start=616
+  _globals['_USERSERVICE']._serialized_end=1239
 # @@protoc_insertion_point(module_scope)
@@ -35,25 +35,50 @@ class UserServiceStub(object):
             channel: A grpc.Channel.
         """
         self.GetUser = channel.unary_unary(
-                '/UserService/GetUser',
+                '/generated.UserService/GetUser',
                 request_serializer=user__service__pb2.UserRequest.SerializeToString,
                 response_deserializer=user__service__pb2.User.FromString,
                 _registered_method=True)
         self.CreateUser = channel.unary_unary(
-                '/UserService/CreateUser',
+                '/generated.UserService/CreateUser',
                 request_serializer=user__service__pb2.CreateUserRequest.SerializeToString,
                 response_deserializer=user__service__pb2.User.FromString,
                 _registered_method=True)
         self.UpdateUser = channel.unary_unary(
-                '/UserService/UpdateUser',
+                '/generated.UserService/UpdateUser',
                 request_serializer=user__service__pb2.UpdateUserRequest.SerializeToString,
                 response_deserializer=user__service__pb2.User.FromString,
                 _registered_method=True)
         self.DeleteUser = channel.unary_unary(
-                '/UserService/DeleteUser',
+                '/generated.UserService/DeleteUser',
                 request_serializer=user__service__pb2.UserRequest.SerializeToString,
                 response_deserializer=user__service__pb2.Empty.FromString,
                 _registered_method=True)
+        self.GetUserByEmail = channel.unary_unary(
+                '/generated.UserService/GetUserByEmail',
+                request_serializer=user__service__pb2.GetUserByEmailRequest.SerializeToString,
+                response_deserializer=user__service__pb2.User.FromString,
+                _registered_method=True)
+        self.BatchCreateUsers = channel.unary_unary(
+                '/generated.UserService/BatchCreateUsers',
+                request_serializer=user__service__pb2.BatchCreateUsersRequest.SerializeToString,
+                response_deserializer=user__service__pb2.UserList.FromString,
+                _registered_method=True)
+        self.BatchGetUsers = channel.unary_unary(
+                '/generated.UserService/BatchGetUsers',
+                request_serializer=user__service__pb2.BatchGetUsersRequest.SerializeToString,
+                response_deserializer=user__service__pb2.BatchGetUsersResponse.FromString,
+                _registered_method=True)
+        self.ListUsers = channel.unary_stream(
+                '/generated.UserService/ListUsers',
+                request_serializer=user__service__pb2.ListUsersRequest.SerializeToString,
+                response_deserializer=user__service__pb2.UserList.FromString,
+                _registered_method=True)
+        self.ImportUsers = channel.stream_unary(
+                '/generated.UserService/ImportUsers',
+                request_serializer=user__service__pb2.BatchCreateUsersRequest.SerializeToString,
+                response_deserializer=user__service__pb2.ImportUsersResponse.FromString,
+                _registered_method=True)
 
 
 class UserServiceServicer(object):
@@ -83,6 +108,41 @@ class UserServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GetUserByEmail(self, request, context):
+        """O(1) lookup through the email index; case-insensitive
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchCreateUsers(self, request, context):
+        """Bulk operations: one round trip for many users
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchGetUsers(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListUsers(self, request, context):
+        """Streams every user in pages of page_size
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ImportUsers(self, request_iterator, context):
+        """Client streams chunks of users to create; one response at the end.
+        Unlike BatchCreateUsers, invalid or duplicate entries are skipped
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_UserServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -106,11 +166,36 @@ def add_UserServiceServicer_to_server(servicer, server):
                     request_deserializer=user__service__pb2.UserRequest.FromString,
                     response_serializer=user__service__pb2.Empty.SerializeToString,
             ),
+            'GetUserByEmail': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetUserByEmail,
+                    request_deserializer=user__service__pb2.GetUserByEmailRequest.FromString,
+                    response_serializer=user__service__pb2.User.SerializeToString,
+            ),
+            'BatchCreateUsers': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchCreateUsers,
+                    request_deserializer=user__service__pb2.BatchCreateUsersRequest.FromString,
+                    response_serializer=user__service__pb2.UserList.SerializeToString,
+            ),
+            'BatchGetUsers': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchGetUsers,
+                    request_deserializer=user__service__pb2.BatchGetUsersRequest.FromString,
+                    response_serializer=user__service__pb2.BatchGetUsersResponse.SerializeToString,
+            ),
+            'ListUsers': grpc.unary_stream_rpc_method_handler(
+                    servicer.ListUsers,
+                    request_deserializer=user__service__pb2.ListUsersRequest.FromString,
+                    response_serializer=user__service__pb2.UserList.SerializeToString,
+            ),
+            'ImportUsers': grpc.stream_unary_rpc_method_handler(
+                    servicer.ImportUsers,
+                    request_deserializer=user__service__pb2.BatchCreateUsersRequest.FromString,
+                    response_serializer=user__service__pb2.ImportUsersResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
-            'UserService', rpc_method_handlers)
+            'generated.UserService', rpc_method_handlers)
     server.add_generic_rpc_handlers((generic_handler,))
-    server.add_registered_method_handlers('UserService', rpc_method_handlers)
+    server.add_registered_method_handlers('generated.UserService', rpc_method_handlers)
 
 
  # This class is part of an EXPERIMENTAL API.
@@ -131,7 +216,7 @@ class UserService(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/UserService/GetUser',
+            '/generated.UserService/GetUser',
             user__service__pb2.UserRequest.SerializeToString,
             user__service__pb2.User.FromString,
             options,
@@ -158,7 +243,7 @@ class UserService(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/UserService/CreateUser',
+            '/generated.UserService/CreateUser',
             user__service__pb2.CreateUserRequest.SerializeToString,
             user__service__pb2.User.FromString,
             options,
@@ -185,7 +270,7 @@ class UserService(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/UserService/UpdateUser',
+            '/generated.UserService/UpdateUser',
             user__service__pb2.UpdateUserRequest.SerializeToString,
             user__service__pb2.User.FromString,
             options,
@@ -212,7 +297,7 @@ class UserService(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/UserService/DeleteUser',
+            '/generated.UserService/DeleteUser',
             user__service__pb2.UserRequest.SerializeToString,
             user__service__pb2.Empty.FromString,
             options,
@@ -224,3 +309,138 @@ class UserService(object):
             timeout,
             metadata,
             _registered_method=True)
+
+    @staticmethod
+    def GetUserByEmail(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/generated.UserService/GetUserByEmail',
+            user__service__pb2.GetUserByEmailRequest.SerializeToString,
+            user__service__pb2.User.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BatchCreateUsers(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/generated.UserService/BatchCreateUsers',
+            user__service__pb2.BatchCreateUsersRequest.SerializeToString,
+            user__service__pb2.UserList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BatchGetUsers(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/generated.UserService/BatchGetUsers',
+            user__service__pb2.BatchGetUsersRequest.SerializeToString,
+            user__service__pb2.BatchGetUsersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListUsers(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/generated.UserService/ListUsers',
+            user__service__pb2.ListUsersRequest.SerializeToString,
+            user__service__pb2.UserList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ImportUsers(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/generated.UserService/ImportUsers',
+            user__service__pb2.BatchCreateUsersRequest.SerializeToString,
+            user__service__pb2.ImportUsersResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
@@ -0,0 +1,395 @@
+"""
+Server interceptors for the gRPC user service.
+
+MetricsInterceptor (sync server) and AsyncMetricsInterceptor (grpc.aio
+server) record, per RPC method:
+
+    grpc_server_handled_total{grpc_method, grpc_code}   finished RPCs by status code
+    grpc_server_handling_seconds{grpc_method}           time from the handler's start to its end
+    grpc_server_in_flight                               RPCs being handled
+
+Streaming RPCs are timed until their last message, and one in every N RPCs
+is logged (see metrics.LogSampler).
+
+AdmissionInterceptor and AsyncAdmissionInterceptor keep an overloaded
+server from doing work nobody will use:
+
+    deadlines   an RPC whose client deadline has passed by the time its
+                handler would start (e.g. after waiting in the thread pool
+                queue), or is closer than min_deadline seconds, fails with
+                DEADLINE_EXCEEDED without running
+    max_in_flight
+                RPCs admitted and not finished, queued or running, across
+                all methods; past it, new RPCs fail fast with RESOURCE_EXHAUSTED
+    method_limits
+                the same, per method ({"ListUsers": 2}), so a slow method
+                cannot take every slot
+
+Rejections are counted in grpc_server_shed_total{grpc_method, reason}.
+List the admission interceptor after the metrics one, so that shed RPCs
+are recorded with their status code.
+
+CompressionInterceptor and AsyncCompressionInterceptor complement a server
+created with a default compression algorithm: response messages smaller
+than min_size bytes are sent uncompressed, since compressing a single user
+costs CPU and saves nothing.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+import weakref
+
+import grpc
+
+from metrics import LogSampler
+
+
+class _RpcMetrics:
+    """The metrics both interceptors record into."""
+
+    def __init__(self, registry, log):
+        self.handled = registry.counter(
+            "grpc_server_handled_total", "RPCs completed on the server", ["grpc_method", "grpc_code"])
+        self.latency = registry.histogram(
+            "grpc_server_handling_seconds", "Time to handle an RPC", ["grpc_method"])
+        self.in_flight = registry.gauge("grpc_server_in_flight", "RPCs being handled")
+        self.log = log
+        self.sample_log = LogSampler()
+
+    def start(self):
+        self.in_flight.inc()
+        return time.perf_counter()
+
+    def finish(self, method, start, context, error=None):
+        """Record one RPC. The code is the one the handler set, else derived from `error`."""
+        elapsed = time.perf_counter() - start
+        self.in_flight.dec()
+        code = context.code()
+        if code is None:
+            if error is None:
+                code = grpc.StatusCode.OK
+            elif isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+                code = grpc.StatusCode.CANCELLED
+            else:
+                code = grpc.StatusCode.UNKNOWN
+        self.handled.labels(method, code.name).inc()
+        self.latency.labels(method).observe(elapsed)
+        if self.sample_log():
+            self.log.info("%s -> %s in %.2f ms", method, code.name, elapsed * 1000)
+
+
+def _rebuild(handler, wrap, method):
+    """A copy of the RpcMethodHandler `handler` with its behavior wrapped by `wrap`."""
+    if handler.unary_unary:
+        factory, behavior = grpc.unary_unary_rpc_method_handler, handler.unary_unary
+    elif handler.unary_stream:
+        factory, behavior = grpc.unary_stream_rpc_method_handler, handler.unary_stream
+    elif handler.stream_unary:
+        factory, behavior = grpc.stream_unary_rpc_method_handler, handler.stream_unary
+    else:
+        factory, behavior = grpc.stream_stream_rpc_method_handler, handler.stream_stream
+    streaming = bool(handler.response_streaming)
+    return factory(
+        wrap(behavior, method, streaming),
+        request_deserializer=handler.request_deserializer,
+        response_serializer=handler.response_serializer,
+    )
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """Records RPC metrics on the sync (thread pool) server."""
+
+    def __init__(self, registry, log):
+        self._metrics = _RpcMetrics(registry, log)
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        return _rebuild(handler, self._wrap, handler_call_details.method)
+
+    def _wrap(self, behavior, method, streaming):
+        metrics = self._metrics
+        if streaming:
+            def wrapper(request, context):
+                start = metrics.start()
+                error = None
+                try:
+                    yield from behavior(request, context)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    metrics.finish(method, start, context, error)
+        else:
+            def wrapper(request, context):
+                start = metrics.start()
+                error = None
+                try:
+                    return behavior(request, context)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    metrics.finish(method, start, context, error)
+        return wrapper
+
+
+class AsyncMetricsInterceptor(grpc.aio.ServerInterceptor):
+    """Records RPC metrics on the asyncio (grpc.aio) server."""
+
+    def __init__(self, registry, log):
+        self._metrics = _RpcMetrics(registry, log)
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        return _rebuild(handler, self._wrap, handler_call_details.method)
+
+    def _wrap(self, behavior, method, streaming):
+        metrics = self._metrics
+        if streaming:
+            async def wrapper(request, context):
+                start = metrics.start()
+                error = None
+                try:
+                    async for response in behavior(request, context):
+                        yield response
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    metrics.finish(method, start, context, error)
+        else:
+            async def wrapper(request, context):
+                start = metrics.start()
+                error = None
+                try:
+                    return await behavior(request, context)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    metrics.finish(method, start, context, error)
+        return wrapper
+
+
+class _Limit:
+    """Count of admitted RPCs that refuses to go past `limit` (None: no limit)."""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self.limit is not None and self.count >= self.limit:
+                return False
+            self.count += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.count -= 1
+
+
+class _Permit:
+    """
+    The limits one RPC holds, or why it was refused. Released when its
+    handler ends, or when gRPC drops a call it never ran (the client
+    cancelled while it was queued), whichever comes first.
+    """
+
+    def __init__(self, limits=(), reason=None):
+        self._limits = limits
+        self.reason = reason
+
+    def release(self):
+        limits, self._limits = self._limits, ()
+        for limit in limits:
+            limit.release()
+
+
+class _Admission:
+    """The limits and the shed counter both admission interceptors use."""
+
+    def __init__(self, registry, max_in_flight=None, method_limits=None, min_deadline=0.0):
+        self.min_deadline = min_deadline
+        self.admitted = _Limit(max_in_flight)
+        self.method_limits = {name: _Limit(limit) for name, limit in (method_limits or {}).items()}
+        self.shed = registry.counter(
+            "grpc_server_shed_total", "RPCs rejected before their handler ran", ["grpc_method", "reason"])
+        registry.gauge("grpc_server_admitted", "RPCs admitted and not finished, queued or running",
+                       function=lambda: self.admitted.count)
+
+    def admit(self, method):
+        """Take a slot for an RPC of `method` (its full name). Returns a _Permit."""
+        method_limit = self.method_limits.get(method.rpartition("/")[2])
+        if method_limit is not None and not method_limit.acquire():
+            return _Permit(reason="method_limit")
+        if not self.admitted.acquire():
+            if method_limit is not None:
+                method_limit.release()
+            return _Permit(reason="in_flight")
+        return _Permit((self.admitted, method_limit) if method_limit else (self.admitted,))
+
+    def refusal(self, method, permit, context):
+        """(code, details) to fail the RPC with before running it, or None to run it."""
+        if permit.reason is None:
+            remaining = context.time_remaining()
+            if remaining is None or remaining > self.min_deadline:
+                return None
+            permit.reason = "deadline"
+            code, details = grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline too close to start the call"
+        elif permit.reason == "in_flight":
+            code, details = grpc.StatusCode.RESOURCE_EXHAUSTED, "Server is at its in-flight RPC limit"
+        else:
+            code, details = grpc.StatusCode.RESOURCE_EXHAUSTED, "Method is at its concurrency limit"
+        self.shed.labels(method, permit.reason).inc()
+        return code, details
+
+    def intercept(self, handler, handler_call_details, wrap):
+        if handler is None:
+            return None
+        method = handler_call_details.method
+        permit = self.admit(method)
+        return _rebuild(handler, functools.partial(wrap, permit=permit), method)
+
+
+class AdmissionInterceptor(grpc.ServerInterceptor):
+    """
+    Deadline checks and in-flight limits on the sync (thread pool) server.
+
+    Slots are taken as RPCs arrive, before they wait for a thread, so
+    max_in_flight also bounds the thread pool queue. A rejected RPC still
+    goes through the pool, but it only sets its status there. gRPC itself
+    skips handlers of calls already cancelled at their deadline; the
+    deadline check catches the rest, and calls with too little time left.
+    """
+
+    def __init__(self, registry, max_in_flight=None, method_limits=None, min_deadline=0.0):
+        self._admission = _Admission(registry, max_in_flight, method_limits, min_deadline)
+
+    def intercept_service(self, continuation, handler_call_details):
+        return self._admission.intercept(continuation(handler_call_details), handler_call_details,
+                                         self._wrap)
+
+    def _wrap(self, behavior, method, streaming, permit):
+        admission = self._admission
+        if streaming:
+            def wrapper(request, context):
+                try:
+                    refusal = admission.refusal(method, permit, context)
+                    if refusal:
+                        context.abort(*refusal)
+                    yield from behavior(request, context)
+                finally:
+                    permit.release()
+        else:
+            def wrapper(request, context):
+                try:
+                    refusal = admission.refusal(method, permit, context)
+                    if refusal:
+                        context.abort(*refusal)
+                    return behavior(request, context)
+                finally:
+                    permit.release()
+        weakref.finalize(wrapper, permit.release)
+        return wrapper
+
+
+class AsyncAdmissionInterceptor(grpc.aio.ServerInterceptor):
+    """Deadline checks and in-flight limits on the asyncio (grpc.aio) server."""
+
+    def __init__(self, registry, max_in_flight=None, method_limits=None, min_deadline=0.0):
+        self._admission = _Admission(registry, max_in_flight, method_limits, min_deadline)
+
+    async def intercept_service(self, continuation, handler_call_details):
+        return self._admission.intercept(await continuation(handler_call_details),
+                                         handler_call_details, self._wrap)
+
+    def _wrap(self, behavior, method, streaming, permit):
+        admission = self._admission
+        if streaming:
+            async def wrapper(request, context):
+                try:
+                    refusal = admission.refusal(method, permit, context)
+                    if refusal:
+                        await context.abort(*refusal)
+                    async for response in behavior(request, context):
+                        yield response
+                finally:
+                    permit.release()
+        else:
+            async def wrapper(request, context):
+                try:
+                    refusal = admission.refusal(method, permit, context)
+                    if refusal:
+                        await context.abort(*refusal)
+                    return await behavior(request, context)
+                finally:
+                    permit.release()
+        weakref.finalize(wrapper, permit.release)
+        return wrapper
+
+
+class CompressionInterceptor(grpc.ServerInterceptor):
+    """Leaves response messages under `min_size` bytes uncompressed on the sync server."""
+
+    def __init__(self, min_size):
+        self.min_size = min_size
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        return _rebuild(handler, self._wrap, handler_call_details.method)
+
+    def _wrap(self, behavior, method, streaming):
+        min_size = self.min_size
+        if streaming:
+            def wrapper(request, context):
+                for response in behavior(request, context):
+                    if response.ByteSize() < min_size:
+                        context.disable_next_message_compression()
+                    yield response
+        else:
+            def wrapper(request, context):
+                response = behavior(request, context)
+                if response is not None and response.ByteSize() < min_size:
+                    context.disable_next_message_compression()
+                return response
+        return wrapper
+
+
+class AsyncCompressionInterceptor(grpc.aio.ServerInterceptor):
+    """Leaves response messages under `min_size` bytes uncompressed on the asyncio server."""
+
+    def __init__(self, min_size):
+        self.min_size = min_size
+
+    async def intercept_service(self, continuation, handler_call_details):
+        handler = await continuation(handler_call_details)
+        if handler is None:
+            return None
+        return _rebuild(handler, self._wrap, handler_call_details.method)
+
+    def _wrap(self, behavior, method, streaming):
+        min_size = self.min_size
+        if streaming:
+            async def wrapper(request, context):
+                async for response in behavior(request, context):
+                    if response.ByteSize() < min_size:
+                        context.disable_next_message_compression()
+                    yield response
+        else:
+            async def wrapper(request, context):
+                response = await behavior(request, context)
+                if response is not None and response.ByteSize() < min_size:
+                    context.disable_next_message_compression()
+                return response
+        return wrapper
@@ -0,0 +1,335 @@
+"""
+gRPC client calls with deadlines, retries and hedging.
+
+ResilientClient wraps the stubs of a ChannelPool so that every call has a
+deadline, idempotent methods are retried, and those methods can also be
+hedged:
+
+    pool = ChannelPool("localhost:50051")
+    client = ResilientClient(pool, user_service_pb2_grpc.UserServiceStub, timeout=1.0,
+                             max_attempts=3, hedge_delay=0.02)
+    user = client.GetUser(user_service_pb2.UserRequest(id="1"))
+    client.counters()   # {"calls": 1, "retries": 0, "hedges": 0, "hedge_wins": 0}
+
+deadlines   every call gets `timeout` seconds unless it passes its own;
+            without one, a stalled server makes a call wait forever
+retries     an idempotent call that fails with UNAVAILABLE is sent again,
+            on the next channel of the pool, up to `max_attempts` attempts
+            in all, after an exponential backoff (with jitter) from
+            `initial_backoff` up to `max_backoff` and within the deadline.
+            A RetryThrottle stops retries while most calls are failing
+hedging     with a `hedge_delay`, an idempotent unary call that has not
+            completed after that long is sent again (up to `max_hedges`
+            extra copies, `hedge_delay` apart, on the next channels of the
+            pool); the first response wins and the others are cancelled.
+            A hedged call is not retried as well: a retryable failure with
+            nothing else in flight is hedged at once instead
+
+Both follow gRPC's retry design (the service config's retryPolicy, with
+retryThrottling, and hedgingPolicy), but run in the client rather than in
+gRPC's C core, which does not implement hedging and does not report the
+attempts it makes. This way every attempt is counted, per client.
+
+Requests can also be compressed call by call: `compression` (a
+grpc.Compression) applies to every call made through the client, and a
+call can pass its own compression= instead; both override the channel's.
+
+Like the pool, this module does not import the generated code (nor the
+pool), so it works both from this directory and as python_grpc_lab.resilience:
+the pool and the stub class are passed in.
+"""
+
+import asyncio
+import queue
+import random
+import threading
+import time
+
+import grpc
+
+# Reads: safe to send more than once
+IDEMPOTENT_METHODS = ("GetUser", "GetUserByEmail", "BatchGetUsers")
+# Failures worth another attempt: the request may not have reached a server
+RETRYABLE_CODES = ("UNAVAILABLE",)
+
+
+class RetryThrottle:
+    """
+    gRPC's retryThrottling: each retryable failure takes a token and each
+    success gives back `token_ratio`; below half of `max_tokens`, retries
+    stop until calls succeed again.
+    """
+
+    def __init__(self, max_tokens=10, token_ratio=0.1):
+        self.max_tokens = max_tokens
+        self.token_ratio = token_ratio
+        self._tokens = float(max_tokens)
+        self._lock = threading.Lock()
+
+    def failure(self):
+        with self._lock:
+            self._tokens = max(self._tokens - 1, 0)
+
+    def success(self):
+        with self._lock:
+            self._tokens = min(self._tokens + self.token_ratio, self.max_tokens)
+
+    def allows_retry(self):
+        return self._tokens > self.max_tokens / 2
+
+
+class CallStats:
+    """Calls made through a client, the retries and hedges sent for them."""
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def add(self, calls=0, retries=0, hedges=0, hedge_wins=0):
+        with self._lock:
+            self.calls += calls
+            self.retries += retries
+            self.hedges += hedges
+            self.hedge_wins += hedge_wins
+
+
+class _ResilientBase:
+    def __init__(self, pool, stub_class, timeout=None, max_attempts=1, initial_backoff=0.05,
+                 max_backoff=1.0, hedge_delay=None, max_hedges=1, idempotent=IDEMPOTENT_METHODS,
+                 compression=None):
+        self.pool = pool
+        self.stub_class = stub_class
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.throttle = RetryThrottle()
+        self.hedge_delay = hedge_delay
+        self.max_hedges = max_hedges
+        self.idempotent = frozenset(idempotent)
+        self.compression = compression
+        self.stats = CallStats()
+
+    def _method(self, name):
+        return getattr(self.pool.stub(self.stub_class), name)
+
+    def _hedged(self, name):
+        return self.hedge_delay is not None and name in self.idempotent
+
+    def _retried(self, name):
+        return self.max_attempts > 1 and name in self.idempotent
+
+    def _retry_delay(self, error, attempt, now, deadline):
+        """
+        Seconds to wait before retrying after `attempt` failed with `error`,
+        or None if the call should fail with it.
+        """
+        if not isinstance(error, grpc.RpcError) or error.code().name not in RETRYABLE_CODES:
+            return None
+        self.throttle.failure()
+        if attempt >= self.max_attempts or not self.throttle.allows_retry():
+            return None
+        delay = random.uniform(0, min(self.initial_backoff * 2 ** (attempt - 1), self.max_backoff))
+        if deadline is not None and now + delay >= deadline:
+            return None
+        self.stats.add(retries=1)
+        return delay
+
+    def counters(self):
+        """Calls made, retries sent, hedges sent and hedges that won, by this client."""
+        return {
+            "calls": self.stats.calls,
+            "retries": self.stats.retries,
+            "hedges": self.stats.hedges,
+            "hedge_wins": self.stats.hedge_wins,
+        }
+
+
+class ResilientClient(_ResilientBase):
+    """
+    Blocking client (see module docstring). Thread-safe. Methods are looked
+    up on the stub class: client.GetUser(request, timeout=None,
+    compression=None) calls GetUser with `timeout` and `compression`, or the
+    client's defaults.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(request, timeout=None, compression=None):
+            return self.call(name, request, timeout, compression)
+        return call
+
+    def call(self, name, request, timeout=None, compression=None):
+        timeout = timeout if timeout is not None else self.timeout
+        compression = compression if compression is not None else self.compression
+        self.stats.add(calls=1)
+        if self._hedged(name):
+            return self._call_hedged(name, request, timeout, compression)
+        if self._retried(name):
+            return self._call_retried(name, request, timeout, compression)
+        return self._method(name)(request, timeout=timeout, compression=compression)
+
+    def _call_retried(self, name, request, timeout, compression):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        attempt = 1
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                response = self._method(name)(request, timeout=remaining, compression=compression)
+            except grpc.RpcError as error:
+                delay = self._retry_delay(error, attempt, time.monotonic(), deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.throttle.success()
+            return response
+
+    def _call_hedged(self, name, request, timeout, compression):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = queue.SimpleQueue()
+        attempts = []
+
+        def send():
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            future = self._method(name).future(request, timeout=remaining, compression=compression)
+            attempts.append(future)
+            future.add_done_callback(done.put)
+
+        send()
+        pending = 1
+        try:
+            while True:
+                can_hedge = len(attempts) <= self.max_hedges
+                try:
+                    future = done.get(timeout=self.hedge_delay if can_hedge else None)
+                except queue.Empty:
+                    self.stats.add(hedges=1)
+                    send()
+                    pending += 1
+                    continue
+                pending -= 1
+                error = future.exception()
+                if error is None:
+                    if future is not attempts[0]:
+                        self.stats.add(hedge_wins=1)
+                    return future.result()
+                if error.code().name not in RETRYABLE_CODES or (pending == 0 and not can_hedge):
+                    raise error
+                if pending == 0:
+                    # Nothing else in flight: hedge now instead of waiting
+                    self.stats.add(hedges=1)
+                    send()
+                    pending += 1
+        finally:
+            for future in attempts:
+                future.cancel()
+
+    def close(self):
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncResilientClient(_ResilientBase):
+    """
+    grpc.aio version of ResilientClient; create it inside the event loop.
+    Calls return what the stub does, so `await client.GetUser(request)` and
+    `async for page in client.ListUsers(request)` both work.
+    """
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        def call(request, timeout=None, compression=None):
+            return self.call(name, request, timeout, compression)
+        return call
+
+    def call(self, name, request, timeout=None, compression=None):
+        """The stub's call object, or a coroutine for a retried or hedged call."""
+        timeout = timeout if timeout is not None else self.timeout
+        compression = compression if compression is not None else self.compression
+        self.stats.add(calls=1)
+        if self._hedged(name):
+            return self._call_hedged(name, request, timeout, compression)
+        if self._retried(name):
+            return self._call_retried(name, request, timeout, compression)
+        return self._method(name)(request, timeout=timeout, compression=compression)
+
+    async def _call_retried(self, name, request, timeout, compression):
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        attempt = 1
+        while True:
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            try:
+                response = await self._method(name)(request, timeout=remaining, compression=compression)
+            except grpc.aio.AioRpcError as error:
+                delay = self._retry_delay(error, attempt, loop.time(), deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.throttle.success()
+            return response
+
+    async def _call_hedged(self, name, request, timeout, compression):
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        attempts = []
+
+        def send():
+            remaining = None if deadline is None else max(deadline - loop.time(), 0)
+            attempts.append(asyncio.ensure_future(
+                self._method(name)(request, timeout=remaining, compression=compression)))
+
+        send()
+        pending = set(attempts)
+        try:
+            while True:
+                can_hedge = len(attempts) <= self.max_hedges
+                done, pending = await asyncio.wait(pending, timeout=self.hedge_delay if can_hedge else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self.stats.add(hedges=1)
+                    send()
+                    pending.add(attempts[-1])
+                    continue
+                # A success wins even if another attempt failed at the same time
+                for task in sorted(done, key=lambda task: task.exception() is not None):
+                    error = task.exception()
+                    if error is None:
+                        if task is not attempts[0]:
+                            self.stats.add(hedge_wins=1)
+                        return task.result()
+                    if (not isinstance(error, grpc.aio.AioRpcError) or error.code().name not in RETRYABLE_CODES
+                            or (not pending and not can_hedge)):
+                        raise error
+                if not pending:
+                    self.stats.add(hedges=1)
+                    send()
+                    pending.add(attempts[-1])
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    async def close(self):
+        await self.pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
@@ -1,16 +1,47 @@
+import argparse
+import asyncio
+import os
+
 import grpc
 from concurrent import futures
 
 from generated import user_service_pb2, user_service_pb2_grpc 
+from channel_pool import COMPRESSION
+from interceptors import (AdmissionInterceptor, AsyncAdmissionInterceptor, AsyncCompressionInterceptor,
+                          AsyncMetricsInterceptor, CompressionInterceptor, MetricsInterceptor)
+from metrics import REGISTRY, InstrumentedStore, configure_logging, start_http_server
+from user_store import (DuplicateEmailError, DurableMemoryUserStore, RemoteUserStore, SQLiteUserStore,
+                        create_store)
+
+log = configure_logging("grpc")
 
-users = []
+# Shared storage engine (see user_store), the same one the REST service uses.
+# Ids are integers in the store and strings on the wire. Operation timings
+# and the store size are reported with the RPC metrics.
+backend = create_store()
+store = InstrumentedStore(backend, REGISTRY)
+
+def parse_id(user_id):
+    """Convert a wire id to a store id. Returns None for ids that cannot exist."""
+    try:
+        return int(user_id)
+    except ValueError:
+        return None
+
+def to_message(record):
+    """Convert a store UserRecord to a protobuf User."""
+    return user_service_pb2.User(id=str(record.id), name=record.name, email=record.email)
+
+# ListUsers page size when the client does not pick one, and the upper bound
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
 
 class UserService(user_service_pb2_grpc.UserServiceServicer):
     # Implement GetUser
     def GetUser(self, request, context):
-        for user in users:
-            if user.id == request.id:
-                return user
+        record = store.get(parse_id(request.id))
+        if record:
+            return to_message(record)
         context.set_code(grpc.StatusCode.NOT_FOUND)
         context.set_details("User not found")
         return
@@ -21,28 +52,32 @@ class UserService(user_service_pb2_grpc.UserServiceServicer):
             context.set_details("Name and email are required")
             return
         
-        new_user = user_service_pb2.User(
-            id=str(len(users) + 1),
-            name=request.name,
-            email=request.email
-        )
-
-        users.append(new_user)
+        try:
+            new_user = store.create(request.name, request.email)
+        except DuplicateEmailError:
+            context.set_code(grpc.StatusCode.ALREADY_EXISTS)
+            context.set_details("Email already exists")
+            return
 
-        return new_user
+        return to_message(new_user)
     
     def UpdateUser(self, request, context):
         if not request.id:
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
             context.set_details("Id are required")
             return
-        for user in users:
-            if user.id == request.id:
-                if request.name:
-                    user.name = request.name
-                if request.email:
-                    user.email = request.email
-                return user
+        try:
+            record = store.update(
+                parse_id(request.id),
+                name=request.name or None,
+                email=request.email or None
+            )
+        except DuplicateEmailError:
+            context.set_code(grpc.StatusCode.ALREADY_EXISTS)
+            context.set_details("Email already exists")
+            return
+        if record:
+            return to_message(record)
         
         #If not found
         context.set_code(grpc.StatusCode.NOT_FOUND)
@@ -54,28 +89,285 @@ class UserService(user_service_pb2_grpc.UserServiceServicer):
             context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
             context.set_details("Id are required")
             return
-        for user in users:
-            if user.id == request.id:
-                users.remove(user)
-                return user_service_pb2.Empty()
+        if store.delete(parse_id(request.id)):
+            return user_service_pb2.Empty()
         
         #If not found
         context.set_code(grpc.StatusCode.NOT_FOUND)
         context.set_details("User not found")
         return
+
+    def GetUserByEmail(self, request, context):
+        if not request.email:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Email is required")
+            return
+        record = store.get_by_email(request.email)
+        if record:
+            return to_message(record)
+        context.set_code(grpc.StatusCode.NOT_FOUND)
+        context.set_details("User not found")
+        return
+
+    def BatchCreateUsers(self, request, context):
+        # All or nothing: reject the batch if any entry is incomplete
+        if any(not user.name or not user.email for user in request.users):
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Name and email are required for every user")
+            return
+        try:
+            records = store.create_many([(user.name, user.email) for user in request.users])
+        except DuplicateEmailError as e:
+            context.set_code(grpc.StatusCode.ALREADY_EXISTS)
+            context.set_details(str(e))
+            return
+        return user_service_pb2.UserList(users=[to_message(record) for record in records])
+
+    def BatchGetUsers(self, request, context):
+        response = user_service_pb2.BatchGetUsersResponse()
+        for user_id in request.ids:
+            record = store.get(parse_id(user_id))
+            if record:
+                response.users.append(to_message(record))
+            else:
+                response.not_found_ids.append(user_id)
+        return response
+
+    def ListUsers(self, request, context):
+        if request.page_size < 0 or request.limit < 0:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("page_size and limit must not be negative")
+            return
+        page_size = min(request.page_size or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        # Read the store lazily so memory use stays at one page
+        page = []
+        for record in store.find_users(limit=request.limit or None):
+            page.append(to_message(record))
+            if len(page) == page_size:
+                yield user_service_pb2.UserList(users=page)
+                page = []
+        if page:
+            yield user_service_pb2.UserList(users=page)
+
+    def ImportUsers(self, request_iterator, context):
+        created = rejected = 0
+        for chunk in request_iterator:
+            chunk_created, chunk_rejected = self._import_chunk(chunk)
+            created += chunk_created
+            rejected += chunk_rejected
+        return user_service_pb2.ImportUsersResponse(created=created, rejected=rejected)
+
+    def _import_chunk(self, chunk):
+        """Create the valid users of one ImportUsers chunk. Returns (created, rejected)."""
+        valid = [(user.name, user.email) for user in chunk.users if user.name and user.email]
+        created = len(store.create_many(valid, skip_duplicates=True))
+        return created, len(chunk.users) - created
     
-def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+class AsyncUserService(UserService):
+    """
+    asyncio (grpc.aio) version of UserService.
+
+    Every RPC runs the same logic as the sync servicer. In-memory store calls
+    take microseconds, so they run directly on the event loop. Blocking
+    backends (SQLite, a write-ahead logged store, a store server over IPC)
+    are handed to a thread pool so a slow call does not stall every other
+    RPC on the loop.
+    """
+
+    def __init__(self, executor=None):
+        self._executor = executor
+
+    async def _call(self, fn, *args):
+        if self._executor is None:
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def GetUser(self, request, context):
+        return await self._call(UserService.GetUser, self, request, context)
+
+    async def CreateUser(self, request, context):
+        return await self._call(UserService.CreateUser, self, request, context)
+
+    async def UpdateUser(self, request, context):
+        return await self._call(UserService.UpdateUser, self, request, context)
+
+    async def DeleteUser(self, request, context):
+        return await self._call(UserService.DeleteUser, self, request, context)
+
+    async def GetUserByEmail(self, request, context):
+        return await self._call(UserService.GetUserByEmail, self, request, context)
+
+    async def BatchCreateUsers(self, request, context):
+        return await self._call(UserService.BatchCreateUsers, self, request, context)
+
+    async def BatchGetUsers(self, request, context):
+        return await self._call(UserService.BatchGetUsers, self, request, context)
+
+    async def ListUsers(self, request, context):
+        pages = UserService.ListUsers(self, request, context)
+        while True:
+            page = await self._call(next, pages, None)
+            if page is None:
+                return
+            yield page
+
+    async def ImportUsers(self, request_iterator, context):
+        created = rejected = 0
+        async for chunk in request_iterator:
+            chunk_created, chunk_rejected = await self._call(self._import_chunk, chunk)
+            created += chunk_created
+            rejected += chunk_rejected
+        return user_service_pb2.ImportUsersResponse(created=created, rejected=rejected)
+
+def parse_method_limits(spec):
+    """Parse "GetUser=50,ListUsers=2" into {"GetUser": 50, "ListUsers": 2}."""
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        method, _, limit = part.partition("=")
+        try:
+            limits[method.strip()] = int(limit)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected METHOD=LIMIT, got {part!r}")
+    return limits
+
+def parse_args(argv=None):
+    """
+    Server options. Every flag can also be set through an environment
+    variable, which is how docker-compose configures the container.
+    """
+    parser = argparse.ArgumentParser(description="gRPC user service")
+    parser.add_argument("--mode", choices=["sync", "aio"],
+                        default=os.getenv("GRPC_SERVER_MODE", "sync"),
+                        help="sync: ThreadPoolExecutor server, aio: asyncio (grpc.aio) server")
+    parser.add_argument("--port", type=int, default=int(os.getenv("GRPC_PORT", "50051")))
+    parser.add_argument("--max-workers", type=int, default=int(os.getenv("GRPC_MAX_WORKERS", "10")),
+                        help="sync: handler threads; aio: threads for blocking store backends")
+    parser.add_argument("--max-concurrent-rpcs", type=int,
+                        default=int(os.getenv("GRPC_MAX_CONCURRENT_RPCS", "0")) or None,
+                        help="reject RPCs beyond this many in flight with RESOURCE_EXHAUSTED (default: unlimited)")
+    parser.add_argument("--max-in-flight", type=int,
+                        default=int(os.getenv("GRPC_MAX_IN_FLIGHT", "0")) or None,
+                        help="admission interceptor: RPCs queued or running before new ones are "
+                             "shed with RESOURCE_EXHAUSTED (default: unlimited)")
+    parser.add_argument("--method-limits", type=parse_method_limits,
+                        default=parse_method_limits(os.getenv("GRPC_METHOD_LIMITS", "")),
+                        help='admission interceptor: per-method in-flight limits, e.g. "ListUsers=2,GetUser=50"')
+    parser.add_argument("--min-deadline-ms", type=float, default=float(os.getenv("GRPC_MIN_DEADLINE_MS", "0")),
+                        help="admission interceptor: fail RPCs with less time left than this before their "
+                             "handler starts with DEADLINE_EXCEEDED (default 0: only expired ones)")
+    parser.add_argument("--compression", choices=list(COMPRESSION),
+                        default=os.getenv("GRPC_COMPRESSION", "none"),
+                        help="compress responses with this algorithm, when the client accepts it")
+    parser.add_argument("--compress-min-bytes", type=int,
+                        default=int(os.getenv("GRPC_COMPRESS_MIN_BYTES", "1024")),
+                        help="with --compression: send smaller response messages uncompressed (0: compress all)")
+    parser.add_argument("--max-concurrent-streams", type=int,
+                        default=int(os.getenv("GRPC_MAX_CONCURRENT_STREAMS", "0")) or None,
+                        help="HTTP/2 streams one connection may have open (default: gRPC's limit)")
+    parser.add_argument("--keepalive-time-ms", type=int,
+                        default=int(os.getenv("GRPC_KEEPALIVE_TIME_MS", "0")) or None,
+                        help="send HTTP/2 keepalive pings after this much idle time")
+    parser.add_argument("--keepalive-timeout-ms", type=int,
+                        default=int(os.getenv("GRPC_KEEPALIVE_TIMEOUT_MS", "0")) or None,
+                        help="close the connection if a keepalive ping is not acked in time")
+    parser.add_argument("--keepalive-permit-without-calls", action="store_true",
+                        default=os.getenv("GRPC_KEEPALIVE_PERMIT_WITHOUT_CALLS") == "1",
+                        help="allow keepalive pings on connections with no active RPCs")
+    parser.add_argument("--metrics-port", type=int, default=int(os.getenv("GRPC_METRICS_PORT", "9464")),
+                        help="serve Prometheus metrics at http://host:PORT/metrics (0: off)")
+    return parser.parse_args(argv)
+
+def server_options(args):
+    """Build the channel arguments shared by the sync and aio servers."""
+    options = []
+    if args.max_concurrent_streams:
+        # Per connection: clients needing more parallelism open more channels
+        options.append(("grpc.max_concurrent_streams", args.max_concurrent_streams))
+    if args.keepalive_time_ms:
+        options.append(("grpc.keepalive_time_ms", args.keepalive_time_ms))
+    if args.keepalive_timeout_ms:
+        options.append(("grpc.keepalive_timeout_ms", args.keepalive_timeout_ms))
+    if args.keepalive_permit_without_calls:
+        options.append(("grpc.keepalive_permit_without_calls", 1))
+        # Let clients ping idle connections as often as we do
+        options.append(("grpc.http2.min_ping_interval_without_data_ms",
+                        args.keepalive_time_ms or 300000))
+    return options
+
+def interceptors(args, aio=False):
+    """The server's interceptors, in order: metrics, admission, then compression if enabled."""
+    metrics, admission, compression = (
+        (AsyncMetricsInterceptor, AsyncAdmissionInterceptor, AsyncCompressionInterceptor) if aio
+        else (MetricsInterceptor, AdmissionInterceptor, CompressionInterceptor))
+    chain = [metrics(REGISTRY, log),
+             admission(REGISTRY, args.max_in_flight, args.method_limits, args.min_deadline_ms / 1000)]
+    if args.compression != "none" and args.compress_min_bytes:
+        chain.append(compression(args.compress_min_bytes))
+    return chain
+
+def start_metrics(args):
+    # RPC and store metrics over plain HTTP, next to the gRPC port
+    if args.metrics_port:
+        start_http_server(args.metrics_port, REGISTRY)
+        log.info("Metrics at http://0.0.0.0:%d/metrics", args.metrics_port)
+
+def serve(args=None):
+    args = args or parse_args()
+    server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=args.max_workers),
+        interceptors=interceptors(args),
+        options=server_options(args),
+        compression=COMPRESSION[args.compression],
+        maximum_concurrent_rpcs=args.max_concurrent_rpcs
+    )
     user_service_pb2_grpc.add_UserServiceServicer_to_server(UserService(), server)
-    server.add_insecure_port('[::]:50051')
+    server.add_insecure_port(f'[::]:{args.port}')
     server.start()
-    print("gRPC server is running at port 50051")
+    start_metrics(args)
+    log.info("gRPC server is running at port %d (sync, %d workers)", args.port, args.max_workers)
     try:
         server.wait_for_termination()
     except KeyboardInterrupt:
-        print("\nKeyboardInterrupt detected — shutting down gracefully...")
+        log.info("KeyboardInterrupt detected — shutting down gracefully...")
         server.stop(0)  # terminate running
-        print("gRPC server stopped.")
+        log.info("gRPC server stopped.")
+
+async def _serve_aio(args):
+    executor = None
+    # Stores that block on disk I/O run off the event loop
+    if isinstance(backend, (SQLiteUserStore, DurableMemoryUserStore, RemoteUserStore)):
+        executor = futures.ThreadPoolExecutor(max_workers=args.max_workers)
+
+    server = grpc.aio.server(
+        interceptors=interceptors(args, aio=True),
+        options=server_options(args),
+        compression=COMPRESSION[args.compression],
+        maximum_concurrent_rpcs=args.max_concurrent_rpcs
+    )
+    user_service_pb2_grpc.add_UserServiceServicer_to_server(AsyncUserService(executor), server)
+    server.add_insecure_port(f'[::]:{args.port}')
+    await server.start()
+    start_metrics(args)
+    log.info("gRPC server is running at port %d (aio)", args.port)
+    try:
+        await server.wait_for_termination()
+    finally:
+        await server.stop(0)
+        if executor:
+            executor.shutdown(wait=False)
+
+def serve_aio(args=None):
+    args = args or parse_args()
+    try:
+        asyncio.run(_serve_aio(args))
+    except KeyboardInterrupt:
+        log.info("KeyboardInterrupt detected — shutting down gracefully...")
+        log.info("gRPC server stopped.")
 
 if __name__ == "__main__":
-    serve()
\ No newline at end of file
+    args = parse_args()
+    if args.mode == "aio":
+        serve_aio(args)
+    else:
+        serve(args)
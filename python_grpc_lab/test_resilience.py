@@ -0,0 +1,109 @@
+import asyncio
+from concurrent import futures
+
+import grpc
+import pytest
+
+from channel_pool import AsyncChannelPool, ChannelPool
+from generated import user_service_pb2, user_service_pb2_grpc
+from resilience import AsyncResilientClient, ResilientClient, RetryThrottle
+
+
+class FlakyService(user_service_pb2_grpc.UserServiceServicer):
+    """Fails the first `failures` calls of each method with UNAVAILABLE."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = {}
+
+    def _fail_first(self, name, context):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.calls[name] <= self.failures:
+            context.abort(grpc.StatusCode.UNAVAILABLE, "try again")
+
+    def GetUser(self, request, context):
+        self._fail_first("GetUser", context)
+        return user_service_pb2.User(id=request.id, name="alice", email="alice@example.com")
+
+    def CreateUser(self, request, context):
+        self._fail_first("CreateUser", context)
+        return user_service_pb2.User(id="1", name=request.name, email=request.email)
+
+
+@pytest.fixture
+def flaky():
+    service = FlakyService(failures=2)
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    user_service_pb2_grpc.add_UserServiceServicer_to_server(service, server)
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    yield service, f"127.0.0.1:{port}"
+    server.stop(None)
+
+
+def client_for(target, **kwargs):
+    return ResilientClient(ChannelPool(target), user_service_pb2_grpc.UserServiceStub, timeout=5,
+                           initial_backoff=0.001, **kwargs)
+
+
+def test_reads_are_retried_and_counted(flaky):
+    service, target = flaky
+    with client_for(target, max_attempts=3) as client:
+        user = client.GetUser(user_service_pb2.UserRequest(id="7"))
+        assert user.id == "7"
+        assert service.calls["GetUser"] == 3
+        assert client.counters() == {"calls": 1, "retries": 2, "hedges": 0, "hedge_wins": 0}
+
+
+def test_attempts_are_capped(flaky):
+    service, target = flaky
+    with client_for(target, max_attempts=2) as client:
+        with pytest.raises(grpc.RpcError) as error:
+            client.GetUser(user_service_pb2.UserRequest(id="7"))
+        assert error.value.code() == grpc.StatusCode.UNAVAILABLE
+        assert service.calls["GetUser"] == 2
+        assert client.counters()["retries"] == 1
+
+
+def test_writes_are_not_retried(flaky):
+    service, target = flaky
+    with client_for(target, max_attempts=3) as client:
+        with pytest.raises(grpc.RpcError):
+            client.CreateUser(user_service_pb2.CreateUserRequest(name="a", email="a@example.com"))
+        assert service.calls["CreateUser"] == 1
+        assert client.counters()["retries"] == 0
+
+
+def test_unreachable_target_is_throttled():
+    # Nothing listens on port 1: every attempt fails with UNAVAILABLE. The
+    # first call is retried twice; after that the throttle (10 tokens, one
+    # per failure) has fallen to half and stops further retries
+    with client_for("127.0.0.1:1", max_attempts=3) as client:
+        for _ in range(5):
+            with pytest.raises(grpc.RpcError):
+                client.GetUser(user_service_pb2.UserRequest(id="1"))
+        assert client.counters() == {"calls": 5, "retries": 3, "hedges": 0, "hedge_wins": 0}
+
+
+def test_throttle_recovers_with_successes():
+    throttle = RetryThrottle(max_tokens=10, token_ratio=0.5)
+    for _ in range(5):
+        throttle.failure()
+    assert not throttle.allows_retry()
+    throttle.success()
+    assert throttle.allows_retry()
+
+
+def test_async_reads_are_retried_and_counted(flaky):
+    service, target = flaky
+
+    async def main():
+        async with AsyncResilientClient(AsyncChannelPool(target), user_service_pb2_grpc.UserServiceStub,
+                                        timeout=5, max_attempts=3, initial_backoff=0.001) as client:
+            user = await client.GetUser(user_service_pb2.UserRequest(id="7"))
+            return user, client.counters()
+
+    user, counters = asyncio.run(main())
+    assert user.id == "7"
+    assert service.calls["GetUser"] == 3
+    assert counters["retries"] == 2
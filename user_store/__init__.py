@@ -0,0 +1,102 @@
+"""
+Storage engine shared by the REST and gRPC user services.
+
+Both services talk to a UserStore, so the REST vs gRPC benchmark compares
+the protocols against the same storage. The backend is chosen with the
+USER_STORE environment variable:
+
+    USER_STORE=memory://                    thread-safe in-memory dicts (default)
+    USER_STORE=memory://?stripes=64         ... with 64 lock stripes
+    USER_STORE=memory://?layout=compact     ... in typed columns: 22% of the memory per
+                                            user (at 10M users), reads about as fast
+    USER_STORE=memory://?wal=/data/wal      ... persisted to a write-ahead log and
+                                            snapshots in /data/wal; also fsync=
+                                            always|interval|never, fsync_interval=
+                                            (seconds), snapshot_every= (entries)
+    USER_STORE=ipc:///tmp/user-store.sock   a store server process shared by several
+                                            processes (see user_store.ipc)
+    USER_STORE=sqlite:///data/users.db      SQLite file in WAL mode
+    USER_STORE=sqlite:///data/users.db?batch_size=100
+                                            ... with batched commits
+"""
+
+import os
+from urllib.parse import parse_qs, urlsplit
+
+from .base import DuplicateEmailError, UserRecord, UserStore, normalize_email
+from .compact import CompactMemoryUserStore, EmailIndex, StringPool
+from .striped import ConcurrentMemoryUserStore, RWLock
+from .ipc import RemoteStoreError, RemoteUserStore
+from .memory import MemoryUserStore
+from .sqlite import SQLiteUserStore
+from .wal import DurableMemoryUserStore, WriteAheadLog
+
+DEFAULT_STORE_URL = "memory://"
+
+__all__ = [
+    "DuplicateEmailError",
+    "normalize_email",
+    "UserRecord",
+    "UserStore",
+    "MemoryUserStore",
+    "ConcurrentMemoryUserStore",
+    "CompactMemoryUserStore",
+    "EmailIndex",
+    "StringPool",
+    "DurableMemoryUserStore",
+    "WriteAheadLog",
+    "RWLock",
+    "RemoteUserStore",
+    "RemoteStoreError",
+    "SQLiteUserStore",
+    "create_store",
+]
+
+
+def create_store(url=None):
+    """
+    Build a UserStore from a store URL.
+
+    Args:
+        url (str): e.g. "memory://" or "sqlite:///path/to/users.db".
+            Defaults to the USER_STORE environment variable, then "memory://".
+
+    Returns:
+        UserStore: the configured backend.
+    """
+    url = url or os.getenv("USER_STORE") or DEFAULT_STORE_URL
+    parts = urlsplit(url)
+    options = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+
+    if parts.scheme == "memory":
+        layout = options.get("layout", "objects")
+        if layout == "compact":
+            if "wal" in options:
+                raise ValueError("layout=compact cannot be combined with wal=")
+            return CompactMemoryUserStore()
+        if layout != "objects":
+            raise ValueError(f"Unknown memory store layout: {layout!r}")
+        # Both servers handle requests on several threads, so the default
+        # in-memory backend is the lock-striped one
+        stripes = int(options.get("stripes", 16))
+        if "wal" in options:
+            return DurableMemoryUserStore(
+                options["wal"],
+                stripes=stripes,
+                fsync=options.get("fsync", "interval"),
+                fsync_interval=float(options.get("fsync_interval", 0.05)),
+                snapshot_every=int(options.get("snapshot_every", 100_000)),
+            )
+        return ConcurrentMemoryUserStore(stripes=stripes)
+    if parts.scheme == "ipc":
+        # ipc:///tmp/user-store.sock: the path of the store server's socket
+        return RemoteUserStore(parts.path)
+    if parts.scheme == "sqlite":
+        # sqlite:///relative.db and sqlite:////absolute.db, like SQLAlchemy
+        path = parts.path[1:] if parts.path.startswith("/") else parts.path
+        return SQLiteUserStore(
+            path or ":memory:",
+            batch_size=int(options.get("batch_size", 1)),
+            flush_interval=float(options.get("flush_interval", 0.05)),
+        )
+    raise ValueError(f"Unknown user store URL: {url!r}")
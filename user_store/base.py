@@ -0,0 +1,174 @@
+import itertools
+import uuid
+from abc import ABC, abstractmethod
+
+
+class DuplicateEmailError(ValueError):
+    """Raised when a create or update would give two users the same email."""
+
+    def __init__(self, email):
+        super().__init__(f"Email already exists: {email}")
+        self.email = email
+
+
+def normalize_email(email):
+    """Key used by the email index: emails are unique case-insensitively."""
+    return email.strip().casefold()
+
+
+def new_store_uid():
+    """Random token for UserStore.uid."""
+    return uuid.uuid4().hex[:8]
+
+
+class UserRecord:
+    """
+    A stored user. Ids are integers handed out by the store; the version
+    starts at 1 and goes up by one on every update.
+
+    Slotted, as the in-memory stores keep one per user. `_json` is where the
+    REST serializer caches the record's encoding.
+    """
+
+    __slots__ = ("id", "name", "email", "version", "_json")
+
+    def __init__(self, id, name, email, version=1):
+        self.id = id
+        self.name = name
+        self.email = email
+        self.version = version
+
+    def __repr__(self):
+        return f"id={self.id}, name={self.name}, email={self.email}"
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "email": self.email
+        }
+
+
+class UserStore(ABC):
+    """
+    Repository interface shared by the REST and gRPC user services.
+
+    Ids are positive integers from a monotonic counter and are never reused,
+    and list_users() returns users in insertion order, whatever the backend.
+    Emails are unique after normalize_email(), enforced through an index.
+
+    For caching, every record carries a version, and the store as a whole has
+    a version() that changes after every write. `uid` identifies the data the
+    versions count from: random for in-memory stores, which start empty on
+    every run, and saved in the database for SQLite.
+    """
+
+    uid = None
+
+    @abstractmethod
+    def create(self, name, email):
+        """Store a new user and return its UserRecord. Raises DuplicateEmailError."""
+
+    def create_many(self, users, skip_duplicates=False):
+        """
+        Store several (name, email) pairs and return their UserRecords.
+
+        By default the batch is all or nothing: DuplicateEmailError is raised,
+        and nothing is stored, if any email is taken or repeated in the batch.
+        With skip_duplicates=True those entries are skipped instead and only
+        the created records are returned.
+        """
+        users = list(users)
+        if not skip_duplicates:
+            seen = set()
+            for _, email in users:
+                key = normalize_email(email)
+                if key in seen or self.get_by_email(email) is not None:
+                    raise DuplicateEmailError(email)
+                seen.add(key)
+        records = []
+        for name, email in users:
+            try:
+                records.append(self.create(name, email))
+            except DuplicateEmailError:
+                if not skip_duplicates:
+                    raise
+        return records
+
+    @abstractmethod
+    def get(self, user_id):
+        """Return the UserRecord for user_id, or None if it does not exist."""
+
+    @abstractmethod
+    def get_by_email(self, email):
+        """Return the UserRecord with this email (case-insensitive), or None."""
+
+    @abstractmethod
+    def update(self, user_id, name=None, email=None):
+        """
+        Update the given fields and return the new UserRecord, or None if not
+        found. Raises DuplicateEmailError if the email belongs to another user.
+        """
+
+    @abstractmethod
+    def delete(self, user_id):
+        """Delete a user. Return True if it existed."""
+
+    def update_many(self, updates):
+        """
+        Apply (user_id, name, email) updates in order; None leaves a field as it is.
+
+        Each update stands on its own, so one result is returned per update:
+        the new UserRecord, None if the user does not exist, or the
+        DuplicateEmailError the update would have raised. Backends override
+        this to apply the whole batch in one transaction.
+        """
+        results = []
+        for user_id, name, email in updates:
+            try:
+                results.append(self.update(user_id, name=name, email=email))
+            except DuplicateEmailError as e:
+                results.append(e)
+        return results
+
+    def delete_many(self, user_ids):
+        """Delete several users. Returns one bool per id: True if it existed."""
+        return [self.delete(user_id) for user_id in user_ids]
+
+    @abstractmethod
+    def version(self):
+        """Collection version: an integer that changes after every write."""
+
+    @abstractmethod
+    def list_users(self):
+        """Return every UserRecord in insertion order."""
+
+    def iter_users(self, after=0):
+        """
+        Yield users with an id greater than `after`, in insertion order.
+
+        Backends override this to start at the cursor without scanning and to
+        read the store in chunks, so streaming every user needs constant memory.
+        """
+        for record in self.list_users():
+            if record.id > after:
+                yield record
+
+    def find_users(self, after=0, limit=None, name_prefix=None, email_prefix=None):
+        """
+        Yield up to `limit` users after the `after` cursor whose name and email
+        start with the given prefixes (case-sensitive).
+        """
+        matches = (
+            record for record in self.iter_users(after)
+            if (not name_prefix or record.name.startswith(name_prefix))
+            and (not email_prefix or record.email.startswith(email_prefix))
+        )
+        return itertools.islice(matches, limit)
+
+    @abstractmethod
+    def __len__(self):
+        """Return the number of stored users."""
+
+    def close(self):
+        """Release any resources held by the store."""
@@ -0,0 +1,336 @@
+"""
+Column-oriented in-memory backend for very large user sets.
+
+The default in-memory stores keep one UserRecord per user, plus a str for
+its name, its email and its normalized email, an int for its id and dict
+entries in two indexes: 409 bytes per user at 10M users, against 92 here
+(python -m user_store.memory_bench). Here a user is one row across a
+handful of typed arrays instead, and Python objects are only created at
+the API boundary, when a UserRecord is returned:
+
+    ids, versions             array('q'), array('I'); version 0 marks a deleted row
+    names                     array('I') of indexes into a StringPool
+    email_start, email_len    array('Q'), array('I') into one bytearray of UTF-8
+    row_of                    array('q'): id -> row, -1 once deleted
+    email index               EmailIndex: open addressing over arrays, no key strings
+
+Names are interned: repeated names are stored once. Emails are unique, so
+they are packed as bytes instead. Deleted rows and the bytes of replaced
+emails are reclaimed by compacting the columns once they make up more than
+half of them.
+"""
+
+import bisect
+import itertools
+from array import array
+
+from .base import DuplicateEmailError, UserRecord, UserStore, new_store_uid, normalize_email
+from .striped import RWLock
+from .memory import ITER_CHUNK
+
+# EmailIndex slot markers; live slots hold a user id (> 0)
+_EMPTY = 0
+_TOMBSTONE = -1
+# Compact when more than half of the rows (or email bytes) are dead, and at least this many
+_COMPACT_MIN_ROWS = 1024
+_COMPACT_MIN_BYTES = 64 * 1024
+
+
+class StringPool:
+    """
+    Interned strings: each distinct string is stored once and referred to by
+    its index. The pool only grows, so it suits low-cardinality columns
+    such as names; a column of unique strings would only gain the overhead.
+    """
+
+    def __init__(self):
+        self._strings = []
+        self._index = {}
+
+    def add(self, string):
+        """Return the index of `string`, adding it if it is new."""
+        index = self._index.get(string)
+        if index is None:
+            index = self._index[string] = len(self._strings)
+            self._strings.append(string)
+        return index
+
+    def __getitem__(self, index):
+        return self._strings[index]
+
+    def __len__(self):
+        return len(self._strings)
+
+
+class EmailIndex:
+    """
+    Hash table from a normalized email to a user id, with linear probing.
+
+    Slots are two arrays (key hash, user id), so an entry costs 16 bytes per
+    slot and no Python objects. Keys are not stored: a slot whose hash
+    matches is confirmed by comparing against key_of(user_id), the user's
+    current normalized email. The table is rebuilt once two thirds of its
+    slots are used (tombstones included), growing if needed so that live
+    entries fill at most half of it.
+    """
+
+    def __init__(self, key_of, capacity=1024):
+        self._key_of = key_of
+        self._reset(capacity)
+
+    def _reset(self, capacity):
+        self._hashes = array("q", bytes(8 * capacity))
+        self._ids = array("q", bytes(8 * capacity))
+        self._mask = capacity - 1
+        self._used = 0
+
+    def _slot(self, key, key_hash):
+        """Slot holding `key`, or -1."""
+        ids, hashes, mask = self._ids, self._hashes, self._mask
+        i = key_hash & mask
+        while True:
+            user_id = ids[i]
+            if user_id == _EMPTY:
+                return -1
+            if user_id > 0 and hashes[i] == key_hash and self._key_of(user_id) == key:
+                return i
+            i = (i + 1) & mask
+
+    def find(self, key):
+        """User id for `key`, or None."""
+        slot = self._slot(key, hash(key))
+        return None if slot < 0 else self._ids[slot]
+
+    def add(self, key, user_id):
+        """Map `key` to `user_id`. The key must not be in the table."""
+        if (self._used + 1) * 3 > (self._mask + 1) * 2:
+            self._rebuild()
+        self._insert(hash(key), user_id)
+
+    def _insert(self, key_hash, user_id):
+        ids, mask = self._ids, self._mask
+        i = key_hash & mask
+        while ids[i] > 0:
+            i = (i + 1) & mask
+        if ids[i] == _EMPTY:
+            self._used += 1
+        ids[i] = user_id
+        self._hashes[i] = key_hash
+
+    def remove(self, key):
+        slot = self._slot(key, hash(key))
+        if slot >= 0:
+            self._ids[slot] = _TOMBSTONE
+
+    def _rebuild(self):
+        live = [(h, i) for h, i in zip(self._hashes, self._ids) if i > 0]
+        # Grow until live entries fill at most half of the table; if it is
+        # mostly tombstones, this only clears them out
+        capacity = self._mask + 1
+        while len(live) * 2 > capacity:
+            capacity *= 2
+        self._reset(capacity)
+        for key_hash, user_id in live:
+            self._insert(key_hash, user_id)
+
+
+class CompactMemoryUserStore(UserStore):
+    """
+    Thread-safe in-memory backend that stores users in columns (see module docstring).
+
+    Lookups stay O(1): get() indexes row_of by id, and get_by_email() probes
+    the EmailIndex. Ids are handed out in order and rows are appended, so the
+    ids column is sorted and cursor iteration bisects it. One RWLock guards
+    everything: reads run in parallel, writes one at a time.
+
+    Every read builds a new UserRecord, so records are snapshots and never
+    change after they are returned.
+    """
+
+    def __init__(self):
+        self._lock = RWLock()
+        self._ids = array("q")
+        self._versions = array("I")
+        self._names = array("I")
+        self._email_start = array("Q")
+        self._email_len = array("I")
+        self._email_data = bytearray()
+        self._row_of = array("q", [-1])
+        self._name_pool = StringPool()
+        self._by_email = EmailIndex(self._email_key_of)
+        self._dead_rows = 0
+        self._dead_bytes = 0
+        self._versions_counter = itertools.count(1)
+        self._version = 0
+        self.uid = new_store_uid()
+
+    # -- columns ------------------------------------------------------------
+
+    def _row(self, user_id):
+        if isinstance(user_id, int) and 0 < user_id < len(self._row_of):
+            return self._row_of[user_id]
+        return -1
+
+    def _email(self, row):
+        start = self._email_start[row]
+        return self._email_data[start:start + self._email_len[row]].decode()
+
+    def _email_key_of(self, user_id):
+        return normalize_email(self._email(self._row_of[user_id]))
+
+    def _record(self, row):
+        return UserRecord(self._ids[row], self._name_pool[self._names[row]], self._email(row),
+                          self._versions[row])
+
+    def _set_email(self, row, email):
+        encoded = email.encode()
+        self._email_start[row] = len(self._email_data)
+        self._email_len[row] = len(encoded)
+        self._email_data += encoded
+
+    def _append(self, name, email):
+        """Add a row for a new user and return its id."""
+        user_id = len(self._row_of)
+        self._row_of.append(len(self._ids))
+        self._ids.append(user_id)
+        self._versions.append(1)
+        self._names.append(self._name_pool.add(name))
+        self._email_start.append(0)
+        self._email_len.append(0)
+        self._set_email(len(self._ids) - 1, email)
+        return user_id
+
+    def _maybe_compact(self):
+        rows, data = len(self._ids), len(self._email_data)
+        if ((self._dead_rows > _COMPACT_MIN_ROWS and self._dead_rows * 2 > rows)
+                or (self._dead_bytes > _COMPACT_MIN_BYTES and self._dead_bytes * 2 > data)):
+            self._compact()
+
+    def _compact(self):
+        """Drop deleted rows and unreferenced email bytes. Ids and the email index are unaffected."""
+        live = [row for row in range(len(self._ids)) if self._versions[row]]
+        ids, data = self._ids, self._email_data
+        starts, lengths = self._email_start, self._email_len
+        new_data = bytearray()
+        new_starts = array("Q")
+        for row in live:
+            new_starts.append(len(new_data))
+            new_data += data[starts[row]:starts[row] + lengths[row]]
+        self._ids = array("q", (ids[row] for row in live))
+        self._versions = array("I", (self._versions[row] for row in live))
+        self._names = array("I", (self._names[row] for row in live))
+        self._email_len = array("I", (lengths[row] for row in live))
+        self._email_start = new_starts
+        self._email_data = new_data
+        for row, user_id in enumerate(self._ids):
+            self._row_of[user_id] = row
+        self._dead_rows = 0
+        self._dead_bytes = 0
+
+    def _bump(self):
+        self._version = next(self._versions_counter)
+
+    # -- UserStore ----------------------------------------------------------
+
+    def create(self, name, email):
+        key = normalize_email(email)
+        with self._lock.writing():
+            if self._by_email.find(key) is not None:
+                raise DuplicateEmailError(email)
+            user_id = self._append(name, email)
+            self._by_email.add(key, user_id)
+            self._bump()
+            return self._record(self._row_of[user_id])
+
+    def create_many(self, users, skip_duplicates=False):
+        with self._lock.writing():
+            batch, seen = [], set()
+            for name, email in users:
+                key = normalize_email(email)
+                if key in seen or self._by_email.find(key) is not None:
+                    if skip_duplicates:
+                        continue
+                    raise DuplicateEmailError(email)
+                seen.add(key)
+                batch.append((key, name, email))
+            records = []
+            for key, name, email in batch:
+                user_id = self._append(name, email)
+                self._by_email.add(key, user_id)
+                records.append(self._record(self._row_of[user_id]))
+            if records:
+                self._bump()
+            return records
+
+    def get(self, user_id):
+        with self._lock.reading():
+            row = self._row(user_id)
+            return self._record(row) if row >= 0 else None
+
+    def get_by_email(self, email):
+        with self._lock.reading():
+            user_id = self._by_email.find(normalize_email(email))
+            return None if user_id is None else self._record(self._row_of[user_id])
+
+    def update(self, user_id, name=None, email=None):
+        with self._lock.writing():
+            row = self._row(user_id)
+            if row < 0:
+                return None
+            if email is not None:
+                new_key = normalize_email(email)
+                owner = self._by_email.find(new_key)
+                if owner is not None and owner != user_id:
+                    raise DuplicateEmailError(email)
+                old_key = normalize_email(self._email(row))
+                if old_key != new_key:
+                    self._by_email.remove(old_key)
+                self._dead_bytes += self._email_len[row]
+                self._set_email(row, email)
+                if old_key != new_key:
+                    self._by_email.add(new_key, user_id)
+            if name is not None:
+                self._names[row] = self._name_pool.add(name)
+            self._versions[row] += 1
+            record = self._record(row)
+            self._bump()
+            self._maybe_compact()
+            return record
+
+    def delete(self, user_id):
+        with self._lock.writing():
+            row = self._row(user_id)
+            if row < 0:
+                return False
+            self._by_email.remove(normalize_email(self._email(row)))
+            self._versions[row] = 0
+            self._row_of[user_id] = -1
+            self._dead_rows += 1
+            self._dead_bytes += self._email_len[row]
+            self._bump()
+            self._maybe_compact()
+            return True
+
+    def version(self):
+        return self._version
+
+    def list_users(self):
+        with self._lock.reading():
+            return [self._record(row) for row in range(len(self._ids)) if self._versions[row]]
+
+    def iter_users(self, after=0):
+        while True:
+            # Rows move when the columns are compacted, so every chunk
+            # finds its place again from the id cursor
+            with self._lock.reading():
+                row = bisect.bisect_right(self._ids, after)
+                end = min(row + ITER_CHUNK, len(self._ids))
+                chunk = [self._record(r) for r in range(row, end) if self._versions[r]]
+                if row < end:
+                    after = self._ids[end - 1]
+            if row >= end:
+                return
+            yield from chunk
+
+    def __len__(self):
+        return len(self._ids) - self._dead_rows
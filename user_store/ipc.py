@@ -0,0 +1,301 @@
+"""
+One store shared by several processes, over a Unix domain socket.
+
+gunicorn runs each REST worker in its own process, and a memory:// store is
+private to the process that created it: a user created through one worker
+would be missing from the others. With USER_STORE=ipc:///tmp/user-store.sock
+every worker gets a RemoteUserStore instead, which forwards each call to a
+single store server process that owns the data:
+
+    python -m user_store.store_server /tmp/user-store.sock [--store memory://]
+
+The server holds any other store (USER_STORE_BACKEND, default memory://)
+and runs one call at a time on an asyncio loop, so the backend needs no
+locking of its own. gunicorn.conf.py starts it before the workers.
+
+Wire format: a 4-byte big-endian length, then a marshal-encoded tuple.
+Requests are (method, *args). Replies are (OK, value), (DUPLICATE, email)
+or (ERROR, message), and records travel as (id, name, email, version)
+tuples. marshal is fast and only encodes plain values, but it is not meant
+for untrusted input: the socket file is created readable and writable by
+its owner only.
+"""
+
+import asyncio
+import marshal
+import os
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from .base import DuplicateEmailError, UserRecord, UserStore
+from .memory import ITER_CHUNK
+
+HEADER = struct.Struct("!I")
+OK, DUPLICATE, ERROR = 0, 1, 2
+
+
+class RemoteStoreError(RuntimeError):
+    """The store server failed to run a call (other than a duplicate email)."""
+
+
+def _pack(record):
+    return None if record is None else (record.id, record.name, record.email, record.version)
+
+
+def _unpack(values):
+    return None if values is None else UserRecord(*values)
+
+
+def _pack_update(result):
+    # update_many results: a record, None (not found) or the duplicate email
+    if isinstance(result, DuplicateEmailError):
+        return result.email
+    return _pack(result)
+
+
+class StoreServer(asyncio.Protocol):
+    """Serves one client connection: runs each request on `store` and replies in order."""
+
+    def __init__(self, store):
+        self.store = store
+        self.transport = None
+        self.buffer = bytearray()
+        self.methods = {
+            "uid": lambda: store.uid,
+            "create": lambda name, email: _pack(store.create(name, email)),
+            "create_many": lambda users, skip: [_pack(r) for r in store.create_many(users, skip)],
+            "get": lambda user_id: _pack(store.get(user_id)),
+            "get_by_email": lambda email: _pack(store.get_by_email(email)),
+            "update": lambda user_id, name, email: _pack(store.update(user_id, name, email)),
+            "update_many": lambda updates: [_pack_update(r) for r in store.update_many(updates)],
+            "delete": store.delete,
+            "delete_many": store.delete_many,
+            "version": store.version,
+            "list_users": lambda: [_pack(r) for r in store.list_users()],
+            "find_users": lambda after, limit, name_prefix, email_prefix: [
+                _pack(r) for r in store.find_users(after, limit, name_prefix, email_prefix)],
+            "len": lambda: len(store),
+        }
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        self.buffer += data
+        replies = []
+        while len(self.buffer) >= HEADER.size:
+            (length,) = HEADER.unpack_from(self.buffer)
+            if len(self.buffer) < HEADER.size + length:
+                break
+            request = marshal.loads(self.buffer[HEADER.size:HEADER.size + length])
+            del self.buffer[:HEADER.size + length]
+            reply = marshal.dumps(self.run(request))
+            replies.append(HEADER.pack(len(reply)) + reply)
+        if replies:
+            self.transport.write(b"".join(replies))
+
+    def run(self, request):
+        method, *args = request
+        try:
+            return OK, self.methods[method](*args)
+        except DuplicateEmailError as e:
+            return DUPLICATE, e.email
+        except Exception as e:
+            return ERROR, f"{type(e).__name__}: {e}"
+
+
+def serve(path, store):
+    """Serve `store` on the Unix socket `path` until interrupted (SIGINT or SIGTERM)."""
+    if os.path.exists(path):
+        if _listening(path):
+            raise RuntimeError(f"A store server is already listening on {path}")
+        os.unlink(path)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        old_umask = os.umask(0o177)
+        try:
+            server = await loop.create_unix_server(lambda: StoreServer(store), path)
+        finally:
+            os.umask(old_umask)
+        print(f"User store server on {path} ({type(store).__name__})", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    # Stopped by gunicorn (or docker) with SIGTERM: close the store cleanly,
+    # which matters for a write-ahead logged backend
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def _listening(path):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+def start_server(path, store_url, timeout=10.0):
+    """
+    Start `python -m user_store.store_server` for `path` unless a server is already
+    listening there, and wait until it accepts connections.
+
+    Returns:
+        subprocess.Popen: the new server process, or None if one was running.
+    """
+    if _listening(path):
+        return None
+    # The server imports this package, wherever the caller's working directory is
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.getenv("PYTHONPATH")])))
+    process = subprocess.Popen([sys.executable, "-m", "user_store.store_server", path, "--store", store_url],
+                               env=env)
+    deadline = time.monotonic() + timeout
+    while not _listening(path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError(f"User store server on {path} did not start")
+        time.sleep(0.05)
+    return process
+
+
+class RemoteUserStore(UserStore):
+    """
+    UserStore client for a store server (see module docstring).
+
+    Each thread gets its own connection, opened on its first call, and each
+    call is one request and one reply on it. Connections are reopened after
+    a fork, so a store created before gunicorn forks its workers still works.
+    A call that fails partway (the server restarted, or the connection broke
+    in the middle of a frame) raises, and drops the connection: it may be
+    out of step with the replies, so the thread's next call opens a new one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sockets = []
+        self.uid = self._call("uid")
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or conn[0] != os.getpid():
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.path)
+            with self._lock:
+                self._sockets.append(sock)
+            conn = self._local.conn = (os.getpid(), sock)
+        return conn[1]
+
+    def _drop_connection(self, sock):
+        self._local.conn = None
+        with self._lock:
+            if sock in self._sockets:
+                self._sockets.remove(sock)
+        sock.close()
+
+    def _call(self, method, *args):
+        sock = self._connection()
+        request = marshal.dumps((method,) + args)
+        try:
+            sock.sendall(HEADER.pack(len(request)) + request)
+            (length,) = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+            status, value = marshal.loads(_recv_exactly(sock, length))
+        except BaseException:
+            # Includes interruptions: a reply may still be on its way
+            self._drop_connection(sock)
+            raise
+        if status == DUPLICATE:
+            raise DuplicateEmailError(value)
+        if status == ERROR:
+            raise RemoteStoreError(value)
+        return value
+
+    def create(self, name, email):
+        return _unpack(self._call("create", name, email))
+
+    def create_many(self, users, skip_duplicates=False):
+        users = [(name, email) for name, email in users]
+        return [_unpack(r) for r in self._call("create_many", users, skip_duplicates)]
+
+    def get(self, user_id):
+        return _unpack(self._call("get", user_id))
+
+    def get_by_email(self, email):
+        return _unpack(self._call("get_by_email", email))
+
+    def update(self, user_id, name=None, email=None):
+        return _unpack(self._call("update", user_id, name, email))
+
+    def update_many(self, updates):
+        results = self._call("update_many", [tuple(update) for update in updates])
+        return [DuplicateEmailError(r) if isinstance(r, str) else _unpack(r) for r in results]
+
+    def delete(self, user_id):
+        return self._call("delete", user_id)
+
+    def delete_many(self, user_ids):
+        return self._call("delete_many", list(user_ids))
+
+    def version(self):
+        return self._call("version")
+
+    def list_users(self):
+        return [_unpack(r) for r in self._call("list_users")]
+
+    def iter_users(self, after=0):
+        return self.find_users(after)
+
+    def find_users(self, after=0, limit=None, name_prefix=None, email_prefix=None):
+        # The server filters; results come back a page at a time
+        while limit is None or limit > 0:
+            count = ITER_CHUNK if limit is None else min(ITER_CHUNK, limit)
+            page = self._call("find_users", after, count, name_prefix, email_prefix)
+            for values in page:
+                yield UserRecord(*values)
+            if len(page) < count:
+                return
+            after = page[-1][0]
+            if limit is not None:
+                limit -= len(page)
+
+    def __len__(self):
+        return self._call("len")
+
+    def close(self):
+        with self._lock:
+            for sock in self._sockets:
+                sock.close()
+            self._sockets.clear()
+
+
+def _recv_exactly(sock, size):
+    data = sock.recv(size)
+    if len(data) == size:
+        return data
+    buf = bytearray(data)
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("user store server closed the connection")
+        buf += chunk
+    return bytes(buf)
+
@@ -0,0 +1,120 @@
+import bisect
+import itertools
+
+from .base import DuplicateEmailError, UserRecord, UserStore, new_store_uid, normalize_email
+
+# Ids fetched per step when iterating, so iteration never copies the store
+ITER_CHUNK = 512
+
+
+class IdIndex:
+    """
+    Ascending list of ids for cursor pagination.
+
+    Ids are appended in increasing order, so the list stays sorted and
+    bisect finds the first id after a cursor in O(log n). Deletes are only
+    remembered; callers skip ids that no longer resolve, and the list is
+    compacted once more than half of it is deleted ids.
+    """
+
+    def __init__(self):
+        self._ids = []
+        self._deleted = set()
+
+    def append(self, user_id):
+        self._ids.append(user_id)
+
+    def discard(self, user_id):
+        self._deleted.add(user_id)
+        if len(self._deleted) > 1024 and len(self._deleted) * 2 > len(self._ids):
+            deleted = self._deleted
+            self._ids = [i for i in self._ids if i not in deleted]
+            self._deleted = set()
+
+    def after(self, cursor, count=ITER_CHUNK):
+        """Return up to `count` ids greater than `cursor` (may include deleted ids)."""
+        start = bisect.bisect_right(self._ids, cursor)
+        return self._ids[start:start + count]
+
+
+class MemoryUserStore(UserStore):
+    """
+    In-memory backend: a dict keyed by id, plus an email index.
+
+    dicts keep insertion order, so list_users() needs no sorting, and
+    get/get_by_email/update/delete are all O(1). Not thread-safe: threaded
+    servers should use ConcurrentMemoryUserStore.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._by_email = {}
+        self._ids = itertools.count(1)
+        self._order = IdIndex()
+        self._version = 0
+        self.uid = new_store_uid()
+
+    def create(self, name, email):
+        key = normalize_email(email)
+        if key in self._by_email:
+            raise DuplicateEmailError(email)
+        record = UserRecord(next(self._ids), name, email)
+        self._users[record.id] = record
+        self._by_email[key] = record.id
+        self._order.append(record.id)
+        self._version += 1
+        return record
+
+    def get(self, user_id):
+        return self._users.get(user_id)
+
+    def get_by_email(self, email):
+        user_id = self._by_email.get(normalize_email(email))
+        return None if user_id is None else self._users.get(user_id)
+
+    def update(self, user_id, name=None, email=None):
+        record = self._users.get(user_id)
+        if record is None:
+            return None
+        if email is not None:
+            old_key, new_key = normalize_email(record.email), normalize_email(email)
+            if new_key != old_key:
+                if new_key in self._by_email:
+                    raise DuplicateEmailError(email)
+                del self._by_email[old_key]
+                self._by_email[new_key] = user_id
+            record.email = email
+        if name is not None:
+            record.name = name
+        record.version += 1
+        self._version += 1
+        return record
+
+    def delete(self, user_id):
+        record = self._users.pop(user_id, None)
+        if record is None:
+            return False
+        del self._by_email[normalize_email(record.email)]
+        self._order.discard(user_id)
+        self._version += 1
+        return True
+
+    def version(self):
+        return self._version
+
+    def list_users(self):
+        return list(self._users.values())
+
+    def iter_users(self, after=0):
+        while True:
+            ids = self._order.after(after)
+            if not ids:
+                return
+            for user_id in ids:
+                record = self._users.get(user_id)
+                if record is not None:
+                    yield record
+            after = ids[-1]
+
+    def __len__(self):
+        return len(self._users)
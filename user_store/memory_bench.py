@@ -0,0 +1,110 @@
+"""
+Memory used per user by the in-memory stores.
+
+For each store URL and user count, a fresh Python process creates the users
+and reports how much its resident set grew, divided by the number of users.
+Running every measurement in its own process keeps one run's freed memory
+from hiding the next run's allocations. Names repeat, as real names do
+(10,000 distinct ones); emails are unique. The same process then times
+get() and get_by_email() on random users.
+
+Usage:
+    python -m user_store.memory_bench [--users 1000000,10000000]
+        [--stores "memory://,memory://?layout=compact"]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+from . import create_store
+
+FIRST_NAMES = [f"First{i}" for i in range(50)]
+LAST_NAMES = [f"Last{i}" for i in range(200)]
+CHUNK = 10_000
+LOOKUPS = 100_000
+
+
+def resident_bytes():
+    """Current resident set size of this process."""
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def generate_users(start, count):
+    for i in range(start, start + count):
+        # Build the name the way a decoded request would: a new string each time
+        yield (f"{FIRST_NAMES[i % 50]} {LAST_NAMES[i // 50 % 200]}", f"user{i}@example.com")
+
+
+def measure(url, users):
+    """Fill a store at `url` with `users` users. Returns a dict of results."""
+    gc.collect()
+    before = resident_bytes()
+    store = create_store(url)
+    start = time.perf_counter()
+    for first in range(0, users, CHUNK):
+        store.create_many(generate_users(first, min(CHUNK, users - first)))
+    fill = time.perf_counter() - start
+    gc.collect()
+    used = resident_bytes() - before
+
+    ids = random.sample(range(1, users + 1), min(LOOKUPS, users))
+    start = time.perf_counter()
+    for user_id in ids:
+        store.get(user_id)
+    get_us = (time.perf_counter() - start) / len(ids) * 1e6
+    start = time.perf_counter()
+    for user_id in ids:
+        store.get_by_email(f"user{user_id - 1}@example.com")
+    email_us = (time.perf_counter() - start) / len(ids) * 1e6
+    return {
+        "bytes_per_user": used / users,
+        "creates_per_sec": users / fill,
+        "get_us": get_us,
+        "get_by_email_us": email_us,
+    }
+
+
+def run_child(url, users):
+    """Measure in a new interpreter. Returns the result dict, or None if it failed."""
+    process = subprocess.run(
+        [sys.executable, "-m", "user_store.memory_bench", "--child", url, str(users)],
+        capture_output=True, text=True,
+    )
+    if process.returncode != 0:
+        return None
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="in-memory store memory benchmark")
+    parser.add_argument("--users", default="1000000,10000000", help="comma-separated user counts")
+    parser.add_argument("--stores", default="memory://,memory://?layout=compact",
+                        help="comma-separated store URLs")
+    parser.add_argument("--child", nargs=2, metavar=("URL", "USERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure(args.child[0], int(args.child[1]))))
+        return
+
+    print(f"{'store':<28} {'users':>10} {'bytes/user':>11} {'creates/sec':>12} "
+          f"{'get (us)':>9} {'by email (us)':>14}")
+    for users in (int(n) for n in args.users.split(",")):
+        for url in args.stores.split(","):
+            result = run_child(url, users)
+            if result is None:
+                print(f"{url:<28} {users:>10} {'failed (out of memory?)':>49}")
+                continue
+            print(f"{url:<28} {users:>10} {result['bytes_per_user']:>11.0f} "
+                  f"{result['creates_per_sec']:>12.0f} {result['get_us']:>9.2f} "
+                  f"{result['get_by_email_us']:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
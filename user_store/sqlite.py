@@ -0,0 +1,323 @@
+import atexit
+import sqlite3
+import threading
+import time
+
+from .base import DuplicateEmailError, UserRecord, UserStore, new_store_uid, normalize_email
+
+# Statements are module constants so sqlite3's statement cache reuses the
+# prepared statement for every call instead of re-parsing the SQL.
+# email_key holds normalize_email(email); its unique index is the email index
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL,
+    email_key TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+)
+"""
+# Store-wide settings: the uid and the collection version, which triggers
+# bump on every row written, so it changes with any write from any process
+_META = "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)"
+_META_DEFAULTS = "INSERT OR IGNORE INTO meta (key, value) VALUES ('uid', ?), ('version', 0)"
+_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS users_version_{event.lower()} AFTER {event} ON users
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'version'; END"""
+    for event in ("INSERT", "UPDATE", "DELETE")
+]
+_SELECT_META = "SELECT value FROM meta WHERE key = ?"
+_EMAIL_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS users_email_key ON users (email_key)"
+_SELECT_EMAIL_INDEX = "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'users_email_key'"
+_DUPLICATE_EMAIL_KEYS = """
+SELECT email_key, group_concat(id, ', ') FROM (SELECT email_key, id FROM users ORDER BY id)
+GROUP BY email_key HAVING COUNT(*) > 1 ORDER BY MIN(id)
+"""
+_INSERT = "INSERT INTO users (name, email, email_key) VALUES (?, ?, ?)"
+_INSERT_OR_IGNORE = "INSERT OR IGNORE INTO users (name, email, email_key) VALUES (?, ?, ?)"
+_SELECT_ONE = "SELECT id, name, email, version FROM users WHERE id = ?"
+_SELECT_BY_EMAIL = "SELECT id, name, email, version FROM users WHERE email_key = ?"
+_SELECT_ALL = "SELECT id, name, email, version FROM users ORDER BY id"
+_UPDATE = """
+UPDATE users SET name = COALESCE(?, name), email = COALESCE(?, email), email_key = COALESCE(?, email_key),
+    version = version + 1
+WHERE id = ?
+"""
+_DELETE = "DELETE FROM users WHERE id = ?"
+_COUNT = "SELECT COUNT(*) FROM users"
+# Keyset pagination: starts at the cursor through the primary key index
+_FIND = """
+SELECT id, name, email, version FROM users
+WHERE id > :after
+  AND (:name_prefix IS NULL OR substr(name, 1, length(:name_prefix)) = :name_prefix)
+  AND (:email_prefix IS NULL OR substr(email, 1, length(:email_prefix)) = :email_prefix)
+ORDER BY id LIMIT :limit
+"""
+
+# Rows fetched per query when iterating, so iteration never loads the table
+ITER_CHUNK = 512
+
+
+class SQLiteUserStore(UserStore):
+    """
+    SQLite backend, so data survives a restart without a reload step.
+
+    The database runs in WAL mode with synchronous=NORMAL. Writes are grouped
+    into batched commits: a transaction is committed once `batch_size` writes
+    are pending, or after `flush_interval` seconds, whichever comes first.
+    With batch_size=1 (the default) every write is committed before it returns.
+
+    A single connection is shared by all threads and guarded by a lock, which
+    is what lets the gRPC thread pool use it.
+    """
+
+    def __init__(self, path, batch_size=1, flush_interval=0.05):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._closed = False
+
+        # isolation_level=None: we issue BEGIN/COMMIT ourselves
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, cached_statements=32
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+        self._conn.execute(_META)
+        self._conn.execute(_META_DEFAULTS, (new_store_uid(),))
+        try:
+            self._migrate()
+        except Exception:
+            self._conn.close()
+            raise
+        self._conn.execute(_EMAIL_INDEX)
+        for trigger in _TRIGGERS:
+            self._conn.execute(trigger)
+        self.uid = self._conn.execute(_SELECT_META, ("uid",)).fetchone()[0]
+
+        # Commit whatever is still pending when the process exits
+        atexit.register(self.close)
+
+        if self.batch_size > 1:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _migrate(self):
+        """
+        Add columns missing from older databases, and fill email_key.
+
+        Databases from before the email index may hold emails that differ
+        only by case. Which of those users should keep the email is not
+        for the store to decide, so startup fails with a RuntimeError that
+        lists them, and the index is built once they are resolved.
+        """
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(users)")]
+        if "email_key" not in columns:
+            self._conn.execute("ALTER TABLE users ADD COLUMN email_key TEXT")
+        if "version" not in columns:
+            self._conn.execute("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        missing = self._conn.execute("SELECT id, email FROM users WHERE email_key IS NULL").fetchall()
+        if missing:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE users SET email_key = ? WHERE id = ?",
+                [(normalize_email(email), user_id) for user_id, email in missing],
+            )
+            self._conn.execute("COMMIT")
+        if self._conn.execute(_SELECT_EMAIL_INDEX).fetchone() is None:
+            duplicates = self._conn.execute(_DUPLICATE_EMAIL_KEYS).fetchall()
+            if duplicates:
+                groups = "; ".join(f"{key}: ids {ids}" for key, ids in duplicates[:20])
+                more = f" (and {len(duplicates) - 20} more)" if len(duplicates) > 20 else ""
+                raise RuntimeError(
+                    f"{self.path}: {len(duplicates)} email(s) belong to several users, up to case "
+                    f"({groups}{more}). Change or delete all but one user of each, then restart."
+                )
+
+    def _begin(self):
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN")
+
+    def _wrote(self, count=1):
+        """Record pending writes and commit once the batch is full. Caller holds the lock."""
+        self._pending += count
+        if self._pending >= self.batch_size:
+            self._commit()
+
+    def _nothing_written(self):
+        """End a transaction that turned out to write nothing. Caller holds the lock."""
+        if not self._pending:
+            self._commit()
+
+    def _commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+        self._pending = 0
+
+    def _flush_loop(self):
+        while not self._closed:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Commit any writes still waiting for their batch to fill."""
+        with self._lock:
+            if self._pending and not self._closed:
+                self._commit()
+
+    def create(self, name, email):
+        with self._lock:
+            self._begin()
+            try:
+                cursor = self._conn.execute(_INSERT, (name, email, normalize_email(email)))
+            except sqlite3.IntegrityError:
+                self._nothing_written()
+                raise DuplicateEmailError(email) from None
+            self._wrote()
+            return UserRecord(cursor.lastrowid, name, email)
+
+    def create_many(self, users, skip_duplicates=False):
+        users = list(users)
+        with self._lock:
+            # One transaction for the whole batch; the savepoint lets an
+            # all-or-nothing batch undo its own inserts on a duplicate
+            self._begin()
+            self._conn.execute("SAVEPOINT create_many")
+            records = []
+            try:
+                for name, email in users:
+                    if skip_duplicates:
+                        cursor = self._conn.execute(_INSERT_OR_IGNORE, (name, email, normalize_email(email)))
+                        if not cursor.rowcount:
+                            continue
+                    else:
+                        cursor = self._conn.execute(_INSERT, (name, email, normalize_email(email)))
+                    records.append(UserRecord(cursor.lastrowid, name, email))
+            except sqlite3.IntegrityError:
+                self._conn.execute("ROLLBACK TO create_many")
+                self._conn.execute("RELEASE create_many")
+                self._nothing_written()
+                raise DuplicateEmailError(email) from None
+            self._conn.execute("RELEASE create_many")
+            if records:
+                self._wrote(len(records))
+            else:
+                self._nothing_written()
+            return records
+
+    def get(self, user_id):
+        with self._lock:
+            row = self._conn.execute(_SELECT_ONE, (user_id,)).fetchone()
+        return UserRecord(*row) if row else None
+
+    def get_by_email(self, email):
+        with self._lock:
+            row = self._conn.execute(_SELECT_BY_EMAIL, (normalize_email(email),)).fetchone()
+        return UserRecord(*row) if row else None
+
+    def update(self, user_id, name=None, email=None):
+        email_key = None if email is None else normalize_email(email)
+        with self._lock:
+            self._begin()
+            try:
+                cursor = self._conn.execute(_UPDATE, (name, email, email_key, user_id))
+            except sqlite3.IntegrityError:
+                self._nothing_written()
+                raise DuplicateEmailError(email) from None
+            if cursor.rowcount == 0:
+                self._nothing_written()
+                return None
+            self._wrote()
+            row = self._conn.execute(_SELECT_ONE, (user_id,)).fetchone()
+        return UserRecord(*row)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._begin()
+            cursor = self._conn.execute(_DELETE, (user_id,))
+            if cursor.rowcount == 0:
+                self._nothing_written()
+                return False
+            self._wrote()
+            return True
+
+    def update_many(self, updates):
+        # One lock hold and one transaction for the batch; a failed UPDATE
+        # only rolls back its own statement
+        results = []
+        written = 0
+        with self._lock:
+            self._begin()
+            for user_id, name, email in updates:
+                email_key = None if email is None else normalize_email(email)
+                try:
+                    cursor = self._conn.execute(_UPDATE, (name, email, email_key, user_id))
+                except sqlite3.IntegrityError:
+                    results.append(DuplicateEmailError(email))
+                    continue
+                if cursor.rowcount == 0:
+                    results.append(None)
+                    continue
+                written += 1
+                results.append(UserRecord(*self._conn.execute(_SELECT_ONE, (user_id,)).fetchone()))
+            if written:
+                self._wrote(written)
+            else:
+                self._nothing_written()
+        return results
+
+    def delete_many(self, user_ids):
+        results = []
+        with self._lock:
+            self._begin()
+            for user_id in user_ids:
+                results.append(self._conn.execute(_DELETE, (user_id,)).rowcount > 0)
+            deleted = sum(results)
+            if deleted:
+                self._wrote(deleted)
+            else:
+                self._nothing_written()
+        return results
+
+    def version(self):
+        with self._lock:
+            return self._conn.execute(_SELECT_META, ("version",)).fetchone()[0]
+
+    def list_users(self):
+        with self._lock:
+            rows = self._conn.execute(_SELECT_ALL).fetchall()
+        return [UserRecord(*row) for row in rows]
+
+    def iter_users(self, after=0):
+        return self.find_users(after)
+
+    def find_users(self, after=0, limit=None, name_prefix=None, email_prefix=None):
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = ITER_CHUNK if remaining is None else min(remaining, ITER_CHUNK)
+            params = {"after": after, "name_prefix": name_prefix or None,
+                      "email_prefix": email_prefix or None, "limit": size}
+            with self._lock:
+                rows = self._conn.execute(_FIND, params).fetchall()
+            for row in rows:
+                yield UserRecord(*row)
+            if len(rows) < size:
+                return
+            after = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(_COUNT).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._commit()
+            self._closed = True
+            self._conn.close()
@@ -0,0 +1,25 @@
+"""
+Run a store server for ipc:// clients (see user_store.ipc).
+
+Usage:
+    python -m user_store.store_server /tmp/user-store.sock [--store memory://]
+"""
+
+import argparse
+import os
+
+from . import create_store
+from .ipc import serve
+
+
+def main():
+    parser = argparse.ArgumentParser(description="shared user store server")
+    parser.add_argument("path", help="Unix socket to listen on")
+    parser.add_argument("--store", default=os.getenv("USER_STORE_BACKEND", "memory://"),
+                        help="store URL to serve (default: USER_STORE_BACKEND, then memory://)")
+    args = parser.parse_args()
+    serve(args.path, create_store(args.store))
+
+
+if __name__ == "__main__":
+    main()
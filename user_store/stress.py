@@ -0,0 +1,109 @@
+"""
+Concurrency stress test for the user stores.
+
+Hammers a store from a growing number of threads with a mix of
+create/get/update/delete calls, then checks that:
+  - no id was handed out twice,
+  - the store size equals creates minus deletes,
+  - every surviving user can still be fetched.
+Prints throughput per worker count and exits non-zero on any violation.
+
+Usage:
+    python -m user_store.stress [--store memory://] [--workers 1,2,4,8,16,32] [--ops 20000]
+
+Each run expects an empty store, so point SQLite runs at "sqlite://" (an
+in-memory database) rather than an existing file.
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from . import create_store
+
+
+def worker(store, index, ops, created, deleted, errors, start_barrier):
+    """Run `ops` random operations, recording the ids this thread created and deleted."""
+    rng = random.Random()
+    mine = []
+    start_barrier.wait()
+    try:
+        for i in range(ops):
+            roll = rng.random()
+            if roll < 0.3 or not mine:
+                # Emails are unique, so tag them with the worker index
+                mine.append(store.create(f"user{index}-{i}", f"user{index}-{i}@example.com").id)
+            elif roll < 0.8:
+                # Reads go to any id, including ones other threads are writing
+                store.get(rng.randint(1, mine[-1]))
+            elif roll < 0.9:
+                store.update(rng.choice(mine), name=f"renamed{i}")
+            else:
+                user_id = mine.pop(rng.randrange(len(mine)))
+                if store.delete(user_id):
+                    deleted.append(user_id)
+                else:
+                    errors.append(f"delete of own id {user_id} failed")
+    except Exception as e:
+        errors.append(repr(e))
+    created.extend(mine)
+
+
+def run(store_url, workers, ops):
+    """Stress a fresh store with `workers` threads. Returns (ops/sec, list of errors)."""
+    store = create_store(store_url)
+    created, deleted, errors = [], [], []
+    start_barrier = threading.Barrier(workers + 1)
+    per_worker = ops // workers
+    threads = [
+        threading.Thread(target=worker, args=(store, index, per_worker, created, deleted, errors, start_barrier))
+        for index in range(workers)
+    ]
+    for t in threads:
+        t.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    all_ids = created + deleted
+    if len(all_ids) != len(set(all_ids)):
+        errors.append(f"duplicate ids: {len(all_ids) - len(set(all_ids))}")
+    if len(store) != len(created):
+        errors.append(f"store holds {len(store)} users, expected {len(created)}")
+    missing = [user_id for user_id in created if store.get(user_id) is None]
+    if missing:
+        errors.append(f"{len(missing)} surviving users cannot be fetched")
+    listed = [record.id for record in store.list_users()]
+    if listed != sorted(created):
+        errors.append("list_users() is not in insertion order")
+
+    store.close()
+    return per_worker * workers / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="user store concurrency stress test")
+    parser.add_argument("--store", default="memory://", help="store URL (see user_store.create_store)")
+    parser.add_argument("--workers", default="1,2,4,8,16,32", help="comma-separated thread counts")
+    parser.add_argument("--ops", type=int, default=20_000, help="total operations per run")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"Store: {args.store}")
+    print(f"{'workers':>8} {'ops/sec':>12}  result")
+    for workers in (int(w) for w in args.workers.split(",")):
+        throughput, errors = run(args.store, workers, args.ops)
+        print(f"{workers:>8} {throughput:>12.0f}  {'OK' if not errors else 'FAIL'}")
+        for error in errors[:5]:
+            print(f"           {error}")
+        failed = failed or bool(errors)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import threading
+
+from .base import DuplicateEmailError, UserRecord, UserStore, new_store_uid, normalize_email
+from .memory import IdIndex
+
+
+class RWLock:
+    """
+    Reader/writer lock: any number of readers, or a single writer.
+
+    Writers are preferred: once a writer is waiting, new readers queue behind
+    it, so a steady stream of GetUser calls cannot starve updates.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    def reading(self):
+        return _Held(self.acquire_read, self.release_read)
+
+    def writing(self):
+        return _Held(self.acquire_write, self.release_write)
+
+
+class _Held:
+    """Context manager returned by RWLock.reading() / RWLock.writing()."""
+
+    __slots__ = ("_release",)
+
+    def __init__(self, acquire, release):
+        acquire()
+        self._release = release
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._release()
+
+
+class ConcurrentMemoryUserStore(UserStore):
+    """
+    Thread-safe in-memory backend for threaded servers.
+
+    Users are spread over `stripes` dicts by id, each guarded by its own
+    RWLock, so reads run in parallel with each other and only contend with
+    writes to the same stripe. Ids come from a counter under its own lock,
+    so concurrent creates never hand out the same id. The same lock guards
+    the IdIndex used for cursor iteration, so ids enter it in order.
+
+    The email index has its own RWLock. A create checks and reserves its
+    email under that lock before the record is stored, so two concurrent
+    creates with the same email cannot both succeed. When both are needed,
+    the email lock is always taken before a stripe lock.
+
+    Records are never mutated in place: update() swaps in a new UserRecord,
+    so a reader never sees a half-applied update.
+
+    The collection version is bumped after each write has been applied, so a
+    reader that sees a version never gets data older than it.
+    """
+
+    def __init__(self, stripes=16):
+        self._stripes = [{} for _ in range(max(1, stripes))]
+        self._locks = [RWLock() for _ in self._stripes]
+        self._id_lock = threading.Lock()
+        self._last_id = 0
+        self._order = IdIndex()
+        self._by_email = {}
+        self._email_lock = RWLock()
+        # Bumped under _id_lock: writers finish in any order, and the
+        # version must never go back to one a client already saw
+        self._version = 0
+        self.uid = new_store_uid()
+
+    def _bump(self):
+        with self._id_lock:
+            self._version += 1
+
+    def _next_id(self):
+        with self._id_lock:
+            self._last_id += 1
+            self._order.append(self._last_id)
+            return self._last_id
+
+    def _stripe(self, user_id):
+        index = hash(user_id) % len(self._stripes)
+        return self._stripes[index], self._locks[index]
+
+    def create(self, name, email):
+        key = normalize_email(email)
+        with self._email_lock.writing():
+            if key in self._by_email:
+                raise DuplicateEmailError(email)
+            record = UserRecord(self._next_id(), name, email)
+            self._by_email[key] = record.id
+        users, lock = self._stripe(record.id)
+        with lock.writing():
+            users[record.id] = record
+        self._bump()
+        return record
+
+    def create_many(self, users, skip_duplicates=False):
+        # Check and reserve every email under one hold of the email lock,
+        # so an all-or-nothing batch cannot race with other creates
+        with self._email_lock.writing():
+            batch, seen = [], set()
+            for name, email in users:
+                key = normalize_email(email)
+                if key in self._by_email or key in seen:
+                    if skip_duplicates:
+                        continue
+                    raise DuplicateEmailError(email)
+                seen.add(key)
+                batch.append((key, name, email))
+            records = []
+            for key, name, email in batch:
+                record = UserRecord(self._next_id(), name, email)
+                self._by_email[key] = record.id
+                records.append(record)
+        for record in records:
+            stripe, lock = self._stripe(record.id)
+            with lock.writing():
+                stripe[record.id] = record
+        if records:
+            self._bump()
+        return records
+
+    def get(self, user_id):
+        users, lock = self._stripe(user_id)
+        with lock.reading():
+            return users.get(user_id)
+
+    def get_by_email(self, email):
+        with self._email_lock.reading():
+            user_id = self._by_email.get(normalize_email(email))
+        return None if user_id is None else self.get(user_id)
+
+    def update(self, user_id, name=None, email=None):
+        if email is None:
+            record = self._replace(user_id, name, None)[1]
+            if record is not None:
+                self._bump()
+            return record
+        new_key = normalize_email(email)
+        with self._email_lock.writing():
+            owner = self._by_email.get(new_key)
+            if owner is not None and owner != user_id:
+                raise DuplicateEmailError(email)
+            previous, record = self._replace(user_id, name, email)
+            if record is not None:
+                old_key = normalize_email(previous.email)
+                if old_key != new_key:
+                    del self._by_email[old_key]
+                    self._by_email[new_key] = user_id
+                self._bump()
+            return record
+
+    def _replace(self, user_id, name, email):
+        """Swap in an updated record. Returns (previous, updated), or (None, None)."""
+        users, lock = self._stripe(user_id)
+        with lock.writing():
+            previous = users.get(user_id)
+            if previous is None:
+                return None, None
+            record = UserRecord(
+                user_id,
+                previous.name if name is None else name,
+                previous.email if email is None else email,
+                previous.version + 1,
+            )
+            users[user_id] = record
+            return previous, record
+
+    def delete(self, user_id):
+        users, lock = self._stripe(user_id)
+        with lock.writing():
+            record = users.pop(user_id, None)
+        if record is None:
+            return False
+        with self._email_lock.writing():
+            key = normalize_email(record.email)
+            if self._by_email.get(key) == user_id:
+                del self._by_email[key]
+        with self._id_lock:
+            self._order.discard(user_id)
+        self._bump()
+        return True
+
+    def version(self):
+        return self._version
+
+    def list_users(self):
+        records = []
+        for users, lock in zip(self._stripes, self._locks):
+            with lock.reading():
+                records.extend(users.values())
+        # Ids are monotonic, so id order is insertion order
+        records.sort(key=lambda record: record.id)
+        return records
+
+    def iter_users(self, after=0):
+        while True:
+            with self._id_lock:
+                ids = self._order.after(after)
+            if not ids:
+                return
+            for user_id in ids:
+                record = self.get(user_id)
+                if record is not None:
+                    yield record
+            after = ids[-1]
+
+    def __len__(self):
+        total = 0
+        for users, lock in zip(self._stripes, self._locks):
+            with lock.reading():
+                total += len(users)
+        return total
@@ -0,0 +1,86 @@
+import marshal
+import socket
+import threading
+
+import pytest
+
+from .base import DuplicateEmailError
+from .ipc import HEADER, OK, RemoteUserStore, start_server
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "store.sock")
+
+
+def stop(process):
+    process.terminate()
+    process.wait(timeout=10)
+
+
+def test_calls_round_trip(path):
+    server = start_server(path, "memory://")
+    store = RemoteUserStore(path)
+    try:
+        user = store.create("alice", "alice@example.com")
+        assert store.get(user.id).name == "alice"
+        assert store.get_by_email("ALICE@example.com").id == user.id
+        with pytest.raises(DuplicateEmailError):
+            store.create("again", "alice@example.com")
+        assert [r.id for r in store.find_users(name_prefix="al")] == [user.id]
+        assert len(store) == 1
+    finally:
+        store.close()
+        stop(server)
+
+
+def test_reconnects_after_server_restart(path):
+    server = start_server(path, "memory://")
+    store = RemoteUserStore(path)
+    try:
+        store.create("alice", "alice@example.com")
+        stop(server)
+        server = start_server(path, "memory://")
+        # The old connection is dead: this call fails, and drops it
+        with pytest.raises(OSError):
+            store.create("bob", "bob@example.com")
+        assert store.create("bob", "bob@example.com").id == 1
+        assert len(store._sockets) == 1
+    finally:
+        store.close()
+        stop(server)
+
+
+def test_reconnects_after_short_reply(path):
+    # A fake server that answers 7 to everything, but breaks off its second
+    # reply halfway through the frame and closes that connection
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    reply = marshal.dumps((OK, 7))
+    frame = HEADER.pack(len(reply)) + reply
+    requests = []
+
+    def serve():
+        for _ in range(2):
+            conn, _ = listener.accept()
+            with conn:
+                while conn.recv(1024):
+                    requests.append(1)
+                    if len(requests) == 2:
+                        conn.sendall(frame[:HEADER.size + 2])
+                        break
+                    conn.sendall(frame)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        store = RemoteUserStore(path)
+        with pytest.raises(ConnectionError):
+            store.version()
+        assert store.version() == 7
+        store.close()
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+    finally:
+        listener.close()
@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+from . import DuplicateEmailError, create_store
+
+# The users table as the first SQLite backend created it: no email_key or
+# version column, and nothing stopping emails that differ only by case
+OLD_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL
+)
+"""
+
+
+@pytest.fixture
+def old_database(tmp_path):
+    path = str(tmp_path / "users.db")
+
+    def write(*users):
+        with sqlite3.connect(path) as conn:
+            conn.execute(OLD_SCHEMA)
+            conn.executemany("INSERT INTO users (name, email) VALUES (?, ?)", users)
+        conn.close()
+        return path
+    return write
+
+
+def test_old_database_is_upgraded(old_database):
+    path = old_database(("alice", "Alice@Example.com"), ("bob", "bob@example.com"))
+    store = create_store(f"sqlite:///{path}")
+    try:
+        assert store.get_by_email(" alice@example.COM").name == "alice"
+        assert store.get(2).version == 1
+        with pytest.raises(DuplicateEmailError):
+            store.create("alice2", "ALICE@example.com")
+    finally:
+        store.close()
+
+
+def test_emails_differing_by_case_stop_startup(old_database):
+    path = old_database(("a", "A@x.com"), ("b", "b@x.com"), ("c", "a@x.com"), ("d", "B@X.COM"))
+    with pytest.raises(RuntimeError) as error:
+        create_store(f"sqlite:///{path}")
+    message = str(error.value)
+    assert "a@x.com: ids 1, 3" in message
+    assert "b@x.com: ids 2, 4" in message
+
+    # Once the conflicts are resolved, the index is built and startup succeeds
+    with sqlite3.connect(path) as conn:
+        conn.execute("DELETE FROM users WHERE id IN (3, 4)")
+    conn.close()
+    store = create_store(f"sqlite:///{path}")
+    try:
+        assert [user.id for user in store.list_users()] == [1, 2]
+        assert store.get_by_email("a@x.com").id == 1
+    finally:
+        store.close()
@@ -0,0 +1,31 @@
+import threading
+
+from .striped import ConcurrentMemoryUserStore
+
+
+def test_version_counts_writes_and_never_goes_back():
+    store = ConcurrentMemoryUserStore(stripes=4)
+    writers, per_writer = 4, 500
+    seen, done = [], threading.Event()
+
+    def write(n):
+        for i in range(per_writer):
+            record = store.create(f"user{n}-{i}", f"user{n}-{i}@example.com")
+            store.update(record.id, name="renamed")
+
+    def read():
+        while not done.is_set():
+            seen.append(store.version())
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    reader.join()
+
+    assert store.version() == 2 * writers * per_writer
+    assert seen == sorted(seen)
@@ -0,0 +1,111 @@
+import os
+
+import pytest
+
+from .wal import DurableMemoryUserStore, _checksum
+
+
+def open_store(directory, **kwargs):
+    return DurableMemoryUserStore(str(directory), fsync="never", **kwargs)
+
+
+def users(store):
+    return [(r.id, r.name, r.email, r.version) for r in store.list_users()]
+
+
+def segment(directory, number=1):
+    return os.path.join(directory, f"wal-{number:08d}.log")
+
+
+def entry(payload):
+    return _checksum(payload) + b" " + payload + b"\n"
+
+
+def test_recovers_every_kind_of_write(tmp_path):
+    store = open_store(tmp_path)
+    alice = store.create("alice", "alice@example.com")
+    bob, carol = store.create_many([("bob", "bob@example.com"), ("carol", "carol@example.com")])
+    store.update(alice.id, name="alicia")
+    store.delete(bob.id)
+    expected = users(store)
+    store.close()
+
+    store = open_store(tmp_path)
+    try:
+        assert users(store) == expected == [(1, "alicia", "alice@example.com", 2),
+                                            (3, "carol", "carol@example.com", 1)]
+        assert store.recovered_users == 2
+        assert store.get_by_email("CAROL@example.com").id == carol.id
+        # Ids keep counting from the last one ever issued, even if deleted
+        assert store.create("dave", "dave@example.com").id == 4
+    finally:
+        store.close()
+
+
+@pytest.mark.parametrize("tail", [
+    b"1234abcd [\"c\",2,\"bo",           # write cut off mid-line
+    entry(b'["c",2,"bob","bob@example.com"]')[:-1] + b"x\n",  # complete line, bad checksum
+    b"\n",                               # stray newline
+])
+def test_torn_tail_is_cut_off(tmp_path, tail):
+    store = open_store(tmp_path)
+    store.create("alice", "alice@example.com")
+    store.close()
+    good = os.path.getsize(segment(tmp_path))
+    with open(segment(tmp_path), "ab") as f:
+        f.write(tail)
+
+    store = open_store(tmp_path)
+    assert users(store) == [(1, "alice", "alice@example.com", 1)]
+    assert os.path.getsize(segment(tmp_path)) == good
+    # New writes go after the last good entry and survive the next restart
+    store.create("bob", "bob@example.com")
+    store.close()
+
+    store = open_store(tmp_path)
+    try:
+        assert [name for _, name, _, _ in users(store)] == ["alice", "bob"]
+    finally:
+        store.close()
+
+
+def test_corruption_before_the_last_segment_is_an_error(tmp_path):
+    with open(segment(tmp_path, 1), "wb") as f:
+        f.write(entry(b'["c",1,"a","a@example.com"]') + b"garbage\n")
+    with open(segment(tmp_path, 2), "wb") as f:
+        f.write(entry(b'["c",2,"b","b@example.com"]'))
+    with pytest.raises(ValueError, match="Corrupt entry"):
+        open_store(tmp_path)
+
+
+def test_snapshot_replaces_older_segments(tmp_path):
+    store = open_store(tmp_path, snapshot_every=3)
+    for i in range(7):
+        store.create(f"user{i}", f"user{i}@example.com")
+    store.delete(2)
+    store.snapshot()
+    store.create("last", "last@example.com")
+    expected = users(store)
+    store.close()
+
+    # Only the newest snapshot, and the one segment written after it, are kept
+    names = os.listdir(tmp_path)
+    snapshots = [n for n in names if n.startswith("snapshot-")]
+    assert len(snapshots) == 1
+    number = snapshots[0][len("snapshot-"):-len(".jsonl")]
+    assert [n for n in names if n.startswith("wal-")] == [f"wal-{number}.log"]
+    store = open_store(tmp_path)
+    try:
+        assert users(store) == expected
+        assert len(store) == 7
+    finally:
+        store.close()
+
+
+def test_directory_is_locked_while_open(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        with pytest.raises(RuntimeError, match="already in use"):
+            open_store(tmp_path)
+    finally:
+        store.close()
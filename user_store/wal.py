@@ -0,0 +1,391 @@
+"""
+Write-ahead log and snapshots for the in-memory store.
+
+DurableMemoryUserStore is a ConcurrentMemoryUserStore that survives a
+restart. Each write is applied in memory and appended to a log segment
+(wal-NNNNNNNN.log), one line per write:
+
+    <crc32 hex> ["c", id, name, email]            create
+    <crc32 hex> ["u", id, name, email, version]   update (the new values)
+    <crc32 hex> ["d", id]                         delete
+
+Once `snapshot_every` entries have been logged, the store starts a new
+segment and writes every user to snapshot-NNNNNNNN.jsonl in the background.
+A snapshot holds everything logged before segment NNNNNNNN, so older segments
+and snapshots are deleted once it is complete. At startup the newest
+snapshot is loaded and the segments after it are replayed. A torn last line,
+left by a crash in the middle of a write, fails its checksum and is cut off.
+
+When a write reaches the disk depends on the fsync policy:
+
+    always    fsync before the write returns. Writers that arrive while an
+              fsync is running are covered by the next one, so concurrent
+              writers share fsyncs (group commit).
+    interval  a background thread fsyncs every `fsync_interval` seconds; a
+              power failure loses at most that window.
+    never     every write goes to the OS page cache but is never fsynced;
+              survives a crash of the process, not of the machine.
+"""
+
+import atexit
+import fcntl
+import gc
+import json
+import os
+import threading
+import time
+import zlib
+
+from .base import DuplicateEmailError, UserRecord, normalize_email
+from .striped import ConcurrentMemoryUserStore
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class WriteAheadLog:
+    """
+    One append-only log segment. append() must be serialized by the caller;
+    commit() may be called from any number of threads.
+    """
+
+    def __init__(self, path, fsync="interval", fsync_interval=0.05):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.fsync = fsync
+        self._file = open(path, "ab")
+        # Log sequence numbers: entries appended, and entries known to be on disk
+        self._written = 0
+        self._synced = 0
+        self._syncing = False
+        self._cond = threading.Condition()
+        # Held around flush+fsync and segment switches
+        self._io_lock = threading.Lock()
+        self._closed = False
+        if fsync == "interval":
+            self._syncer = threading.Thread(target=self._sync_loop, args=(fsync_interval,), daemon=True)
+            self._syncer.start()
+
+    def append(self, entry):
+        """Append one entry and return its log sequence number."""
+        payload = json.dumps(entry, separators=(",", ":")).encode()
+        self._file.write(_checksum(payload) + b" " + payload + b"\n")
+        if self.fsync == "never":
+            self._file.flush()
+        self._written += 1
+        return self._written
+
+    def commit(self, lsn):
+        """
+        Return once entry `lsn` is on disk. The first waiter fsyncs for
+        everyone; writers that arrive meanwhile wait for the next fsync,
+        which covers all of them.
+        """
+        with self._cond:
+            while self._synced < lsn:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                target = self._written
+                self._cond.release()
+                try:
+                    self._sync()
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    self._cond.notify_all()
+                self._synced = max(self._synced, target)
+
+    def _sync(self):
+        with self._io_lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def _sync_loop(self, interval):
+        while not self._closed:
+            time.sleep(interval)
+            if self._written > self._synced and not self._closed:
+                self.commit(self._written)
+
+    def rotate(self, path):
+        """Make the current segment durable and continue in a new one at `path`."""
+        with self._io_lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = open(path, "ab")
+        with self._cond:
+            self._synced = self._written
+
+    def close(self):
+        self._closed = True
+        with self._io_lock:
+            if not self._file.closed:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+        with self._cond:
+            self._synced = self._written
+
+
+def _checksum(payload):
+    return b"%08x" % zlib.crc32(payload)
+
+
+def _load_lines(payloads):
+    """Parse JSON lines with a single json.loads call, which is much faster than one per line."""
+    return json.loads(b"[" + b",".join(payloads) + b"]")
+
+
+def _fsync_directory(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class DurableMemoryUserStore(ConcurrentMemoryUserStore):
+    """
+    ConcurrentMemoryUserStore persisted to `directory` with a write-ahead log
+    and snapshots (see the module docstring).
+
+    Reads are served from memory as before. Writes additionally take a store
+    wide lock, so the log order is the order in which writes were applied;
+    with fsync="always" the fsync itself happens after that lock is released.
+    Only one process can open a directory at a time.
+
+    After startup, `recovered_users` and `recovery_time` (seconds) describe
+    the recovery.
+    """
+
+    def __init__(self, directory, stripes=16, fsync="interval", fsync_interval=0.05,
+                 snapshot_every=100_000):
+        super().__init__(stripes)
+        self.directory = directory
+        self.snapshot_every = max(1, snapshot_every)
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, "LOCK"), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise RuntimeError(f"{directory} is already in use by another process") from None
+
+        self._write_lock = threading.Lock()
+        self._snapshotter = None
+        started = time.perf_counter()
+        # Recovery allocates a few objects per user and frees none, so
+        # cyclic GC passes during it would only rescan the growing heap
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._segment, self._since_snapshot = self._recover()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        self.recovery_time = time.perf_counter() - started
+        self.recovered_users = len(self)
+        self._wal = WriteAheadLog(self._path("wal", self._segment), fsync, fsync_interval)
+        # Flush and fsync whatever is still buffered when the process exits
+        atexit.register(self.close)
+
+    def _path(self, kind, segment):
+        suffix = "log" if kind == "wal" else "jsonl"
+        return os.path.join(self.directory, f"{kind}-{segment:08d}.{suffix}")
+
+    def _files(self, kind):
+        """Segment numbers of the `kind` files in the directory, ascending."""
+        prefix = f"{kind}-"
+        return sorted(
+            int(name[len(prefix):len(prefix) + 8]) for name in os.listdir(self.directory)
+            if name.startswith(prefix) and not name.endswith(".tmp")
+        )
+
+    def _recover(self):
+        """Load the newest snapshot and replay the log after it. Returns (segment, entries replayed)."""
+        users = {}
+        last_id = 0
+        snapshots = self._files("snapshot")
+        first = snapshots[-1] if snapshots else 1
+        if snapshots:
+            with open(self._path("snapshot", first), "rb") as f:
+                last_id = json.loads(f.readline())["last_id"]
+                for user_id, name, email, version in _load_lines(f.read().splitlines()):
+                    users[user_id] = (name, email, version)
+
+        segments = [segment for segment in self._files("wal") if segment >= first] or [first]
+        replayed = 0
+        for segment in segments:
+            path = self._path("wal", segment)
+            if not os.path.exists(path):
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            payloads, offset = [], 0
+            # The last piece is whatever follows the final newline: empty
+            # unless the last write was torn
+            for line in data.split(b"\n")[:-1]:
+                crc, _, payload = line.partition(b" ")
+                if crc != _checksum(payload):
+                    break
+                payloads.append(payload)
+                offset += len(line) + 1
+            if offset < len(data):
+                if segment != segments[-1]:
+                    raise ValueError(f"Corrupt entry in {path} at byte {offset}")
+                # Torn write from a crash: drop it and append after the last good entry
+                with open(path, "r+b") as torn:
+                    torn.truncate(offset)
+            for entry in _load_lines(payloads):
+                if entry[0] == "c":
+                    users[entry[1]] = (entry[2], entry[3], 1)
+                    last_id = max(last_id, entry[1])
+                elif entry[0] == "u":
+                    users[entry[1]] = (entry[2], entry[3], entry[4])
+                else:
+                    users.pop(entry[1], None)
+            replayed += len(payloads)
+
+        by_email = self._by_email
+        for user_id in sorted(users):
+            name, email, version = users[user_id]
+            stripe, _ = self._stripe(user_id)
+            stripe[user_id] = UserRecord(user_id, name, email, version)
+            by_email[normalize_email(email)] = user_id
+            self._order.append(user_id)
+        self._last_id = last_id
+        return segments[-1], replayed
+
+    def _log(self, entry):
+        """Append an entry; the caller holds the write lock."""
+        lsn = self._wal.append(entry)
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every and self._snapshotter is None:
+            self._start_snapshot()
+        return lsn
+
+    def _commit(self, lsn):
+        if lsn is not None and self._wal.fsync == "always":
+            self._wal.commit(lsn)
+
+    def _start_snapshot(self):
+        """Switch to a new segment and snapshot the users in the background. Write lock held."""
+        segment = self._segment + 1
+        self._wal.rotate(self._path("wal", segment))
+        self._segment = segment
+        self._since_snapshot = 0
+        # Every write holds the write lock, so the stripes cannot change
+        # under us, and records are immutable, so the copy can be written
+        # out after the lock is released
+        records = [record for stripe in self._stripes for record in stripe.values()]
+        self._snapshotter = threading.Thread(
+            target=self._write_snapshot, args=(segment, self._last_id, records), daemon=True
+        )
+        self._snapshotter.start()
+
+    def _write_snapshot(self, segment, last_id, records):
+        try:
+            records.sort(key=lambda record: record.id)
+            path = self._path("snapshot", segment)
+            with open(path + ".tmp", "wb") as f:
+                f.write(json.dumps({"last_id": last_id, "users": len(records)}).encode() + b"\n")
+                f.writelines(
+                    json.dumps([r.id, r.name, r.email, r.version], separators=(",", ":")).encode() + b"\n"
+                    for r in records
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(path + ".tmp", path)
+            _fsync_directory(self.directory)
+            # Everything before `segment` is now in the snapshot
+            for old in self._files("wal"):
+                if old < segment:
+                    os.remove(self._path("wal", old))
+            for old in self._files("snapshot"):
+                if old < segment:
+                    os.remove(self._path("snapshot", old))
+        finally:
+            self._snapshotter = None
+
+    def snapshot(self):
+        """Take a snapshot now and wait for it to be written."""
+        with self._write_lock:
+            while self._snapshotter is not None:
+                self._snapshotter.join()
+            self._start_snapshot()
+            snapshotter = self._snapshotter
+        snapshotter.join()
+
+    def create(self, name, email):
+        with self._write_lock:
+            record = super().create(name, email)
+            lsn = self._log(["c", record.id, record.name, record.email])
+        self._commit(lsn)
+        return record
+
+    def create_many(self, users, skip_duplicates=False):
+        lsn = None
+        with self._write_lock:
+            records = super().create_many(users, skip_duplicates)
+            for record in records:
+                lsn = self._log(["c", record.id, record.name, record.email])
+        self._commit(lsn)
+        return records
+
+    def update(self, user_id, name=None, email=None):
+        with self._write_lock:
+            record = super().update(user_id, name, email)
+            if record is None:
+                return None
+            lsn = self._log(["u", record.id, record.name, record.email, record.version])
+        self._commit(lsn)
+        return record
+
+    def update_many(self, updates):
+        # One lock hold, and with fsync="always" one fsync, for the batch
+        results, lsn = [], None
+        with self._write_lock:
+            for user_id, name, email in updates:
+                try:
+                    record = super().update(user_id, name, email)
+                except DuplicateEmailError as e:
+                    results.append(e)
+                    continue
+                if record is not None:
+                    lsn = self._log(["u", record.id, record.name, record.email, record.version])
+                results.append(record)
+        self._commit(lsn)
+        return results
+
+    def delete(self, user_id):
+        with self._write_lock:
+            if not super().delete(user_id):
+                return False
+            lsn = self._log(["d", user_id])
+        self._commit(lsn)
+        return True
+
+    def delete_many(self, user_ids):
+        results, lsn = [], None
+        with self._write_lock:
+            for user_id in user_ids:
+                deleted = super().delete(user_id)
+                if deleted:
+                    lsn = self._log(["d", user_id])
+                results.append(deleted)
+        self._commit(lsn)
+        return results
+
+    def close(self):
+        with self._write_lock:
+            snapshotter = self._snapshotter
+            self._wal.close()
+        if snapshotter is not None:
+            snapshotter.join()
+        if not self._lock_file.closed:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+        atexit.unregister(self.close)
@@ -0,0 +1,89 @@
+"""
+Write throughput and startup time of the durable in-memory store.
+
+For each fsync policy (see user_store.wal), creates `--users` users from
+each thread count in `--threads` and reports writes/sec. It then measures
+startup (recovery) time for the same users twice: replaying the whole
+write-ahead log, and loading a snapshot. The plain in-memory store is
+included as the no-durability baseline.
+
+Usage:
+    python -m user_store.wal_bench [--users 100000] [--threads 1,16] [--dir /tmp]
+"""
+
+import argparse
+import shutil
+import tempfile
+import threading
+import time
+
+from . import create_store
+from .wal import FSYNC_POLICIES
+
+
+def write_throughput(url, users, threads):
+    """Create `users` users from `threads` threads. Returns writes/sec."""
+    store = create_store(url)
+    per_thread = users // threads
+    start_barrier = threading.Barrier(threads + 1)
+
+    def work(index):
+        start_barrier.wait()
+        for i in range(per_thread):
+            store.create(f"user{index}-{i}", f"user{index}-{i}@example.com")
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    store.close()
+    return per_thread * threads / elapsed
+
+
+def startup_time(url):
+    """Open the store at `url` and return (seconds spent recovering, users recovered)."""
+    store = create_store(url)
+    result = store.recovery_time, store.recovered_users
+    store.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="write-ahead log benchmark")
+    parser.add_argument("--users", type=int, default=100_000, help="users created per run")
+    parser.add_argument("--threads", default="1,16", help="comma-separated writer thread counts")
+    parser.add_argument("--dir", help="parent directory for the logs (default: the system temp dir)")
+    args = parser.parse_args()
+    thread_counts = [int(t) for t in args.threads.split(",")]
+
+    print(f"{args.users} creates per run")
+    print(f"{'fsync':>9} {'threads':>8} {'writes/sec':>12} {'replay log (s)':>15} {'load snapshot (s)':>18}")
+    for threads in thread_counts:
+        rate = write_throughput("memory://", args.users, threads)
+        print(f"{'(none)':>9} {threads:>8} {rate:>12.0f} {'-':>15} {'-':>18}")
+    for policy in FSYNC_POLICIES:
+        for threads in thread_counts:
+            directory = tempfile.mkdtemp(prefix="wal-bench-", dir=args.dir)
+            try:
+                # Never snapshot during the run, so startup replays the whole log
+                url = f"memory://?wal={directory}&fsync={policy}&snapshot_every={args.users + 1}"
+                rate = write_throughput(url, args.users, threads)
+                replay, recovered = startup_time(url)
+
+                store = create_store(url)
+                store.snapshot()
+                store.close()
+                load, _ = startup_time(url)
+            finally:
+                shutil.rmtree(directory)
+            print(f"{policy:>9} {threads:>8} {rate:>12.0f} {replay:>15.3f} {load:>18.3f}")
+            if recovered != args.users // threads * threads:
+                print(f"          recovered {recovered} users")
+
+
+if __name__ == "__main__":
+    main()